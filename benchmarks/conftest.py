@@ -0,0 +1,194 @@
+"""Timing harness for the benchmarks.
+
+Each benchmark measures a duration (or a CPU fraction) with the ``benchmark``
+fixture, which compares it to the value stored in ``baselines.json`` and fails
+if it is more than ``--tolerance`` times slower. Baselines depend on the
+machine: record them with ``--save-baselines`` (``make bench-save``) before
+making changes, then run ``make bench`` to compare.
+
+The timings of ``baselines.json`` were measured on one machine. Along with
+them, the time of a fixed workload (``_calibration``) is stored, and measured
+again by each run: baselines are scaled by the ratio of the two, so that a
+slower or faster machine compares to them roughly, instead of failing
+everywhere or hiding regressions. Save the baselines again for exact numbers.
+
+The ``make_module`` fixture is shared with the tests, see ``conftest.py``.
+"""
+import gc
+import json
+import statistics
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import matplotlib
+import pytest
+
+matplotlib.use("agg")
+
+BASELINES = Path(__file__).parent / "baselines.json"
+# Key of the time of the fixed workload in the baselines
+CALIBRATION = "_calibration"
+
+# Measurements of the session, by benchmark name
+RESULTS: Dict[str, float] = {}
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("liveplot benchmarks")
+    group.addoption(
+        "--save-baselines",
+        action="store_true",
+        default=False,
+        help=f"Store the measurements in {BASELINES.name} instead of comparing",
+    )
+    group.addoption(
+        "--tolerance",
+        type=float,
+        default=1.5,
+        help="Fail if a measurement is more than this times its baseline",
+    )
+
+
+def _load_baselines() -> Dict[str, float]:
+    if not BASELINES.exists():
+        return {}
+    with open(BASELINES, encoding="utf8") as file:
+        return json.load(file)
+
+
+def _calibrate() -> float:
+    """The median time of a fixed workload, to compare the speed of machines."""
+    durations = []
+    for _ in range(5):
+        start = time.perf_counter()
+        sorted(str(i * 7919 % 10007) for i in range(100_000))
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+class Benchmark:
+    """Measure one benchmark and compare it to its baseline.
+
+    Args:
+        name: The name of the benchmark, the key of its baseline
+        baseline: The stored value, if any
+        tolerance: How many times slower than the baseline is a regression
+        save: Whether the value is recorded as the new baseline
+        scale: How many times slower this machine is than the one of the
+            baseline
+    """
+
+    def __init__(
+        self,
+        name: str,
+        baseline: Optional[float],
+        tolerance: float,
+        save: bool,
+        scale: float = 1.0,
+    ):
+        self.name = name
+        self.baseline = baseline
+        self.tolerance = tolerance
+        self.save = save
+        self.scale = scale
+
+    def time(
+        self,
+        func: Callable,
+        setup: Optional[Callable] = None,
+        repeat: int = 5,
+        budget: float = 2.0,
+    ) -> float:
+        """The median wall time of ``func()``, checked against the baseline.
+
+        Args:
+            func: What to time
+            setup: Called (untimed) before each call to ``func``
+            repeat: Maximum number of calls
+            budget: Stop repeating once this many seconds were spent in ``func``,
+                after at least one call
+        """
+        durations = []
+        while len(durations) < repeat and sum(durations) < budget:
+            if setup is not None:
+                setup()
+            gc.collect()
+            start = time.perf_counter()
+            func()
+            durations.append(time.perf_counter() - start)
+        return self.check(statistics.median(durations))
+
+    def check(self, value: float, slack: float = 0.002) -> float:
+        """Record ``value`` and fail if it regressed.
+
+        Args:
+            value: The measurement, lower is better
+            slack: Absolute margin added to the allowed value, so that
+                measurements close to the timer resolution do not fail
+        """
+        RESULTS[self.name] = value
+        if self.save or self.baseline is None:
+            return value
+        allowed = self.baseline * self.scale * self.tolerance + slack
+        if value > allowed:
+            pytest.fail(
+                f"{self.name} regressed: {value:.4f} > {allowed:.4f} "
+                f"(baseline {self.baseline:.4f}, machine {self.scale:.2f}x slower)"
+            )
+        return value
+
+
+@pytest.fixture(scope="session")
+def baselines():
+    return _load_baselines()
+
+
+@pytest.fixture(scope="session")
+def machine_scale(baselines):  # pylint: disable=redefined-outer-name
+    """How many times slower this machine is than the one of the baselines."""
+    RESULTS[CALIBRATION] = _calibrate()
+    if CALIBRATION not in baselines:
+        return 1.0
+    return RESULTS[CALIBRATION] / baselines[CALIBRATION]
+
+
+@pytest.fixture
+def benchmark(
+    request, baselines, machine_scale
+):  # pylint: disable=redefined-outer-name
+    name = request.node.name
+    return Benchmark(
+        name,
+        baselines.get(name),
+        request.config.getoption("tolerance"),
+        request.config.getoption("save_baselines"),
+        machine_scale,
+    )
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    if not RESULTS:
+        return
+    baselines = _load_baselines()
+    terminalreporter.section("liveplot benchmarks")
+    scale = 1.0
+    if CALIBRATION in baselines:
+        scale = RESULTS[CALIBRATION] / baselines[CALIBRATION]
+        terminalreporter.write_line(
+            f"This machine is {scale:.2f}x slower than the one of the baselines, "
+            "the ratios are scaled accordingly"
+        )
+    for name, value in sorted(RESULTS.items()):
+        if name == CALIBRATION:
+            continue
+        baseline = baselines.get(name)
+        ratio = f"{value / (baseline * scale):6.2f}x" if baseline else "   new"
+        terminalreporter.write_line(f"{name:<50}{value:>10.4f} {ratio}")
+
+    if config.getoption("save_baselines"):
+        baselines.update(RESULTS)
+        with open(BASELINES, "w", encoding="utf8") as file:
+            json.dump(dict(sorted(baselines.items())), file, indent=2)
+            file.write("\n")
+        terminalreporter.write_line(f"Saved the baselines to {BASELINES}")
@@ -0,0 +1,69 @@
+"""Synthetic plotting scripts of growing size for the benchmarks."""
+import textwrap
+
+# Number of points of the data, on a single axes
+POINTS = [10**3, 10**5, 10**7]
+# Number of axes, with a small dataset
+AXES = [1, 10, 100]
+# Number of helper functions make_figure depends on
+HELPERS = [1, 10, 100]
+
+_HELPER = textwrap.dedent(
+    """
+    def helper_{i}(ax, x, y):
+        scale = {i} + 1
+        return ax.plot(x, y * scale, linewidth=0.5)
+    """
+)
+
+_SCRIPT = textwrap.dedent(
+    """
+    import numpy as np
+
+    N_POINTS = {n_points}
+    N_AXES = {n_axes}
+
+    {helpers}
+
+    def load_data():
+        rng = np.random.default_rng(0)
+        x = np.linspace(0, 1, N_POINTS)
+        return x, np.cumsum(rng.standard_normal(N_POINTS))
+
+    def postprocess(data):
+        x, y = data
+        return x, y - y.mean()
+
+    def make_figure(fig, data):
+        x, y = data
+        axes = fig.subplots(N_AXES, 1, squeeze=False)[:, 0]
+        for i, ax in enumerate(axes):
+            {calls}
+            ax.set_title(f"{{i}} (v{version})")
+    """
+)
+
+
+def synthetic_script(
+    n_points: int = 1000, n_axes: int = 1, n_helpers: int = 1, version: int = 0
+) -> str:
+    """The source of a plotting script.
+
+    Args:
+        n_points: The number of points returned by ``load_data``
+        n_axes: The number of axes created by ``make_figure``, each showing all
+            the points
+        n_helpers: The number of helper functions ``make_figure`` calls, to
+            grow the code that has to be hashed
+        version: Shown in the titles, changing it simulates an edit of
+            ``make_figure``
+    """
+    helpers = "".join(_HELPER.format(i=i) for i in range(n_helpers))
+    calls = "\n        ".join(f"helper_{i}(ax, x, y)" for i in range(n_helpers))
+    return _SCRIPT.format(
+        n_points=n_points,
+        n_axes=n_axes,
+        version=version,
+        helpers=helpers,
+        calls=calls,
+    )
@@ -0,0 +1,66 @@
+"""Time taken to export a figure in several formats and resolutions."""
+import os
+
+import numpy as np
+import pytest
+from matplotlib.figure import Figure
+
+from liveplot.export import POOL_MIN_RENDERINGS, Exporter, group_formats, parse_formats
+
+# pylint: disable=missing-docstring
+
+FORMATS = "png@150,png@300,jpg@300,pdf,svg"
+
+# Below and above the number of renderings where the pool of workers pays off
+BATCHES = {
+    "renderings=2": "png@150,pdf",
+    "renderings=5": "png@150,png@300,jpg@300,pdf,svg,eps",
+}
+
+
+def busy_figure() -> Figure:
+    fig = Figure(figsize=(8, 6))
+    rng = np.random.default_rng(0)
+    for index in range(4):
+        ax = fig.add_subplot(2, 2, index + 1)
+        ax.plot(rng.standard_normal((2000, 10)).cumsum(axis=0))
+        ax.scatter(*rng.standard_normal((2, 2000)), s=2)
+    return fig
+
+
+def test_savefig_each_format(benchmark, tmp_path):
+    """The figure saved with one savefig per format, as a script would."""
+    fig = busy_figure()
+
+    def export():
+        for export_format in parse_formats(FORMATS):
+            fig.savefig(
+                tmp_path / export_format.file_name("plot"),
+                dpi=export_format.dpi or "figure",
+            )
+
+    benchmark.time(export, budget=10.0)
+
+
+@pytest.mark.parametrize("batch", list(BATCHES))
+@pytest.mark.parametrize("pool", [False, True], ids=["in_process", "workers"])
+def test_exporter(benchmark, tmp_path, pool, batch):
+    """The pool is used from POOL_MIN_RENDERINGS on, where it must be faster."""
+    formats = parse_formats(BATCHES[batch])
+    uses_pool = len(group_formats(formats)) >= POOL_MIN_RENDERINGS
+    if pool and (not uses_pool or (os.cpu_count() or 1) < 2):
+        pytest.skip("Rendered in process, or the workers cannot run in parallel")
+    workers = min(4, os.cpu_count() or 1) if pool else 1
+    fig = busy_figure()
+    exporter = Exporter(tmp_path, formats, workers=workers)
+    try:
+        exporter.export(fig, "warmup")
+        exporter.wait()
+
+        def export():
+            exporter.export(fig, "plot")
+            exporter.wait()
+
+        benchmark.time(export, budget=10.0)
+    finally:
+        exporter.close()
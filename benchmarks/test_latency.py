@@ -0,0 +1,80 @@
+"""End-to-end latency between saving a script and the figure being redrawn."""
+import itertools
+import time
+from pathlib import Path
+
+import pytest
+from matplotlib import pyplot as plt
+from synthetic import synthetic_script
+
+from liveplot import cli
+from liveplot.file_watcher import _Inotify, make_file_watcher
+from liveplot.plot_watcher import PlotWatcher
+from liveplot.plt_interface import HeadlessInterface
+
+# pylint: disable=missing-docstring
+
+SCRIPTS = [(1000, 1), (10**5, 1), (10**7, 1), (1000, 100)]
+BACKENDS = ["poll"] + (["inotify"] if _Inotify.is_available() else [])
+
+
+def script_id(case):
+    n_points, n_axes = case
+    return f"points={n_points}-axes={n_axes}"
+
+
+@pytest.fixture
+def output(tmp_path):
+    yield tmp_path / "figure.png"
+    plt.close("all")
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("case", SCRIPTS, ids=script_id)
+def test_save_to_redraw(
+    benchmark, make_module, output, case, backend
+):  # pylint: disable=redefined-outer-name
+    """From writing a new make_figure to the figure being rendered again."""
+    n_points, n_axes = case
+    filepath = make_module(synthetic_script(n_points, n_axes))
+    watcher = PlotWatcher.from_path(filepath, HeadlessInterface(output))
+    watcher.refresh()
+    file_watcher = make_file_watcher([filepath], backend=backend)
+    versions = itertools.count(1)
+
+    def save_and_wait():
+        make_module(
+            synthetic_script(n_points, n_axes, version=next(versions)), filepath
+        )
+        while not file_watcher.poll(timeout=cli.gui_tick):
+            pass
+        watcher.refresh()
+
+    try:
+        benchmark.time(save_and_wait, budget=5.0)
+    finally:
+        file_watcher.close()
+    assert watcher.plt_interface.fig.axes[0].get_title().startswith("0 (v")
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_idle_cpu(
+    benchmark, make_module, output, backend
+):  # pylint: disable=redefined-outer-name
+    """Fraction of a CPU used by the event loop while nothing changes."""
+    filepath = make_module(synthetic_script())
+    watcher = PlotWatcher.from_path(filepath, HeadlessInterface(Path(output)))
+    watcher.refresh()
+    file_watcher = make_file_watcher([filepath], backend=backend)
+
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    try:
+        while time.perf_counter() - start_wall < 2.0:
+            watcher.refresh()
+            watcher.poll_background()
+            watcher.plt_interface.pause(cli.gui_tick)
+            assert not file_watcher.poll()
+    finally:
+        file_watcher.close()
+    cpu = time.process_time() - start_cpu
+    benchmark.check(cpu / (time.perf_counter() - start_wall), slack=0.01)
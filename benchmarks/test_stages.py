@@ -0,0 +1,221 @@
+"""Overhead of the stages of a refresh, for scripts of growing size."""
+import itertools
+import textwrap
+
+import pytest
+from matplotlib import pyplot as plt
+from synthetic import AXES, HELPERS, POINTS, synthetic_script
+
+from liveplot.module_loader import ModuleLoader
+from liveplot.plot_watcher import PlotWatcher
+from liveplot.plt_interface import PltInterface
+
+# pylint: disable=missing-docstring
+
+# Growing data on one axes, then growing number of axes
+FIGURES = list(
+    dict.fromkeys([(n_points, 1) for n_points in POINTS] + [(1000, n) for n in AXES])
+)
+
+
+def figure_id(case):
+    n_points, n_axes = case
+    return f"points={n_points}-axes={n_axes}"
+
+
+@pytest.fixture
+def interface():
+    plt_interface = PltInterface()
+    plt_interface.new_figure()
+    yield plt_interface
+    plt.close("all")
+
+
+@pytest.mark.parametrize("n_helpers", HELPERS)
+def test_func_has_changed(benchmark, make_module, n_helpers):
+    loader = ModuleLoader(make_module(synthetic_script(n_helpers=n_helpers)))
+    loader.load_module()
+    loader.mark_executed("make_figure")
+
+    benchmark.time(lambda: loader.func_has_changed("make_figure"), repeat=20)
+
+
+@pytest.mark.parametrize("n_helpers", HELPERS)
+def test_import_module(benchmark, make_module, n_helpers):
+    """The first load of a script."""
+    filepath = make_module(synthetic_script(n_helpers=n_helpers))
+
+    benchmark.time(lambda: ModuleLoader(filepath).load_module(), repeat=20)
+
+
+@pytest.mark.parametrize("n_helpers", HELPERS)
+def test_load_module(benchmark, make_module, n_helpers):
+    """Loading the script again after an edit of make_figure."""
+    filepath = make_module(synthetic_script(n_helpers=n_helpers))
+    loader = ModuleLoader(filepath)
+    loader.load_module()
+    versions = itertools.count(1)
+
+    def edit():
+        make_module(
+            synthetic_script(n_helpers=n_helpers, version=next(versions)), filepath
+        )
+
+    benchmark.time(loader.load_module, setup=edit, repeat=20)
+
+
+@pytest.mark.parametrize("case", FIGURES, ids=figure_id)
+def test_clear(benchmark, make_module, interface, case):
+    n_points, n_axes = case
+    loader = ModuleLoader(make_module(synthetic_script(n_points, n_axes)))
+    loader.load_module()
+    data = loader.call("load_data")
+
+    def make_figure():
+        loader.call("make_figure", interface.fig, data)
+
+    benchmark.time(interface.clear, setup=make_figure)
+
+
+@pytest.mark.parametrize("case", FIGURES, ids=figure_id)
+def test_draw(benchmark, make_module, interface, case):
+    n_points, n_axes = case
+    loader = ModuleLoader(make_module(synthetic_script(n_points, n_axes)))
+    loader.load_module()
+    loader.call("make_figure", interface.fig, loader.call("load_data"))
+
+    benchmark.time(lambda: interface.draw(sync=True))
+
+
+LOADERS = textwrap.dedent(
+    """
+    import time
+
+    import numpy as np
+
+    from liveplot import stage
+
+    def read(seed):
+        time.sleep(0.1)  # Waiting for the file system
+        return np.random.default_rng(seed).standard_normal(10**6)
+
+    @stage
+    def first():
+        return read(1)
+
+    @stage
+    def second():
+        return read(2)
+
+    @stage
+    def third():
+        return read(3)
+
+    @stage
+    def fourth():
+        return read(4)
+
+    def make_figure(fig, data):
+        fig.add_subplot(111).plot([x[:1000].mean() for x in data.values()])
+    """
+)
+
+
+@pytest.mark.parametrize("workers", [1, 4], ids=["sequential", "concurrent"])
+def test_first_render_of_loaders(benchmark, make_module, interface, workers):
+    """First refresh of a script with four independent loading stages."""
+    filepath = make_module(LOADERS)
+    watchers = []
+
+    def new_watcher():
+        watchers[:] = [PlotWatcher.from_path(filepath, interface, workers=workers)]
+
+    benchmark.time(lambda: watchers[0].refresh(), setup=new_watcher, repeat=3)
+
+
+GROWING_LOG = textwrap.dedent(
+    """
+    import numpy as np
+
+    from liveplot import tail
+
+    def {loader}:
+        {body}
+
+    def make_figure(fig, data):
+        fig.add_subplot(111).plot(data[-1000:, 0], data[-1000:, 1])
+    """
+)
+
+FULL = "return np.loadtxt({log!r}, delimiter=',', ndmin=2)"
+INCREMENTAL = (
+    "lines, offset = tail.read_lines({log!r}, offset)\n"
+    "    rows = np.loadtxt(lines, delimiter=',', ndmin=2)\n"
+    "    return tail.extend(data, rows), offset"
+)
+
+
+@pytest.mark.parametrize("mode", ["full", "incremental"])
+def test_appended_log(benchmark, make_module, interface, tmp_path, mode):
+    """Refresh after 10 lines are appended to a log of 10^6 lines."""
+    log = tmp_path / "train.log"
+    log.write_text("".join(f"{i},{i % 7}\n" for i in range(10**6)))
+    if mode == "full":
+        loader, body = "load_data()", FULL.format(log=str(log))
+    else:
+        loader = "load_data_incremental(data, offset)"
+        body = INCREMENTAL.format(log=str(log))
+    filepath = make_module(GROWING_LOG.format(loader=loader, body=body))
+    watcher = PlotWatcher.from_path(filepath, interface)
+    watcher.refresh()
+
+    def append():
+        with open(log, "a", encoding="utf8") as file:
+            file.write("".join(f"{i},{i % 7}\n" for i in range(10)))
+
+    benchmark.time(watcher.refresh, setup=append, repeat=10)
+
+
+UPDATABLE = textwrap.dedent(
+    """
+    import numpy as np
+
+    def load_data(seed=0):
+        return np.random.default_rng(seed).standard_normal((10, 1000))
+
+    def make_figure(fig, data):
+        axes = fig.subplots(5, 2).flat
+        for ax in axes:
+            ax.set_ylim(-5, 5)
+        return [ax.plot(row)[0] for ax, row in zip(axes, data)]
+
+    def update_figure(fig, data, lines):
+        for line, row in zip(lines, data):
+            line.set_ydata(row)
+    """
+)
+
+
+@pytest.mark.parametrize("mode", ["rebuild", "update"])
+def test_data_change(benchmark, make_module, interface, mode):
+    """Drawing new data on a figure of 10 axes, built again or updated."""
+    loader = ModuleLoader(make_module(UPDATABLE))
+    loader.load_module()
+    lines = loader.call("make_figure", interface.fig, loader.call("load_data"))
+    interface.draw(sync=True)
+    seeds = itertools.count(1)
+    datasets = []
+
+    def new_data():
+        datasets[:] = [loader.call("load_data", next(seeds))]
+
+    def rebuild():
+        interface.clear()
+        loader.call("make_figure", interface.fig, datasets[0])
+        interface.draw(sync=True)
+
+    def update():
+        loader.call("update_figure", interface.fig, datasets[0], lines)
+        interface.draw(sync=True)
+
+    benchmark.time(rebuild if mode == "rebuild" else update, setup=new_data)
@@ -0,0 +1,52 @@
+"""Time taken by the CLI to start, and to render the first figure."""
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from synthetic import synthetic_script
+
+import liveplot
+
+# pylint: disable=missing-docstring
+
+
+def run_liveplot(*args: str, **kwargs) -> subprocess.Popen:
+    env = dict(os.environ)
+    src = str(Path(liveplot.__file__).parent.parent)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [src] + env.get("PYTHONPATH", "").split(os.pathsep)
+    )
+    return subprocess.Popen(
+        [sys.executable, "-m", "liveplot", *args],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        **kwargs,
+    )
+
+
+def test_help(benchmark):
+    benchmark.time(lambda: run_liveplot("--help").wait())
+
+
+def test_first_figure(benchmark, make_module, tmp_path):
+    """From starting the CLI to the first figure of a script with slow data."""
+    script = make_module(synthetic_script(n_points=10**7))
+    output = tmp_path / "figure.png"
+    args = [str(script), "--output", str(output), "--no-cache"]
+
+    def first_figure():
+        process = run_liveplot(*args)
+        try:
+            while not output.exists():
+                assert process.poll() is None, "liveplot exited"
+                time.sleep(0.005)
+        finally:
+            process.kill()
+            process.wait()
+            if output.exists():
+                output.unlink()
+
+    benchmark.time(first_figure, budget=10.0)
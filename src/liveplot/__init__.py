@@ -0,0 +1,4 @@
+from liveplot.data_files import watch
+from liveplot.pipeline import stage
+
+__all__ = ["stage", "watch"]
@@ -0,0 +1,695 @@
+"""Run ``load_data`` and ``postprocess`` away from the GUI event loop.
+
+A :class:`DataRunner` starts a :class:`Job` computing ``(data, data_post)``
+and returns immediately. :class:`~liveplot.plot_watcher.PlotWatcher` checks on
+the job from the event loop and swaps in the result once it is ready, so the
+figure stays interactive during slow reloads.
+
+Three runners are available. :class:`ThreadRunner` runs the stages in a
+thread of the liveplot process. Threads cannot be interrupted, so a superseded
+job runs to completion and its result is discarded. :class:`ProcessRunner` runs
+the stages in a child process that re-imports the script, and superseded jobs
+are terminated. The child is not forked from the liveplot process, whose GUI
+backend and threads it must not inherit, but started by a fork server (or
+spawned), and the data is sent to it when only ``postprocess`` runs.
+
+:class:`WorkerRunner` sends the jobs to a long-lived worker process, which
+keeps the result of ``load_data`` of each script and runs each job in a child
+process of its own, forked from the worker so that it inherits the data. The
+worker is started like the child of :class:`ProcessRunner`. The liveplot
+process only receives ``data_post``, and a crash of the user code (segfault,
+``sys.exit``, ...) only loses the job that crashed, not the data. Results are
+passed between processes as files in shared memory (``/dev/shm`` if
+available), written with :func:`liveplot.cache.dump` and memory-mapped by the
+receiver.
+"""
+import atexit
+import functools
+import glob
+import itertools
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import threading
+import traceback
+from pathlib import Path
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+from liveplot import cache as disk
+from liveplot.cache import DataCache, hash_source
+from liveplot.module_loader import ModuleLoader, PlottingModuleError
+from liveplot.streaming import consume, is_stream
+
+logger = logging.getLogger("liveplot.background")
+
+BACKGROUND_MODES = ("thread", "process")
+
+
+class _Unchanged:
+    """Marker for "data was not recomputed", to avoid sending it back."""
+
+    def __reduce__(self):
+        return "UNCHANGED"
+
+
+UNCHANGED = _Unchanged()
+
+
+class DataFunctions(NamedTuple):
+    """The user functions involved in computing ``(data, data_post)``."""
+
+    load_data: Callable
+    postprocess: Callable
+    postprocess_chunk: Callable
+    combine: Callable
+
+
+# The functions building the data of a ``load_data`` yielding chunks
+CHUNK_FUNCTIONS = ("postprocess_chunk", "combine")
+
+# The functions computing ``(data, data_post)``, see :func:`data_hashes`
+DATA_FUNCTIONS = ("load_data", "load_data_incremental", *CHUNK_FUNCTIONS, "postprocess")
+
+
+def bind_data_functions(
+    loader: ModuleLoader,
+    load_params: Optional[Dict[str, Any]] = None,
+    post_params: Optional[Dict[str, Any]] = None,
+) -> DataFunctions:
+    """The data functions of ``loader``, see :meth:`ModuleLoader.bind`.
+
+    Args:
+        loader: The module to take the functions from
+        load_params: Keyword arguments of ``load_data``, if any
+        post_params: Keyword arguments of ``postprocess``, if any
+    """
+    functions = DataFunctions(
+        *(loader.bind(f_name) for f_name in DataFunctions._fields)
+    )
+    return functions._replace(
+        load_data=functools.partial(functions.load_data, **(load_params or {})),
+        postprocess=functools.partial(functions.postprocess, **(post_params or {})),
+    )
+
+
+def load_key(loader: ModuleLoader, f_name: str = "load_data") -> str:
+    """The key of the result of ``f_name``, in the caches and the stores.
+
+    Covers the :data:`CHUNK_FUNCTIONS`, which build the data of a
+    ``load_data`` yielding chunks.
+    """
+    return hash_source(*(loader.func_hash(name) for name in (f_name, *CHUNK_FUNCTIONS)))
+
+
+def mark_loaded(loader: ModuleLoader, f_name: str = "load_data"):
+    """Consider ``f_name`` called, when its result is restored."""
+    for name in (f_name, *CHUNK_FUNCTIONS):
+        loader.mark_executed(name)
+
+
+def data_hashes(loader: ModuleLoader) -> Dict[str, str]:
+    """The hashes of the :data:`DATA_FUNCTIONS` as of their last call."""
+    hashes = loader.executed_hashes()
+    return {f_name: hashes[f_name] for f_name in DATA_FUNCTIONS if f_name in hashes}
+
+
+def compute_data(
+    functions: DataFunctions,
+    run_load: bool,
+    data: Any,
+    cache: Optional[DataCache] = None,
+    cache_key: Optional[str] = None,
+    report: Optional[Callable[[Any], None]] = None,
+) -> Tuple[Any, Any]:
+    """Run ``load_data`` (if ``run_load``) and ``postprocess``.
+
+    If ``load_data`` was cached under ``cache_key``, the data is restored
+    instead. If ``load_data`` yields chunks, ``report`` is called regularly with the
+    result of ``postprocess`` on the data loaded so far.
+
+    Returns:
+        ``(data, data_post)``, where ``data`` is :data:`UNCHANGED` if
+        ``load_data`` was not called.
+    """
+    if run_load and cache is not None and cache_key is not None and cache_key in cache:
+        try:
+            data = cache.load(cache_key)
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.warning(f"Could not restore load_data from cache: {exc}")
+        else:
+            return data, functions.postprocess(data)
+    if run_load:
+        data = functions.load_data()
+        if is_stream(data):
+            on_partial = None
+            if report is not None:
+
+                def on_partial(partial):
+                    report(functions.postprocess(partial))
+
+            data = consume(
+                data, functions.postprocess_chunk, functions.combine, on_partial
+            )
+        if cache is not None and cache_key is not None:
+            cache.save(cache_key, data)
+    data_post = functions.postprocess(data)
+    return (data if run_load else UNCHANGED), data_post
+
+
+class Job:
+    """A computation running in the background."""
+
+    def done(self) -> bool:
+        raise NotImplementedError
+
+    def result(self) -> Any:
+        """The result of the computation. Only valid if :meth:`done`.
+
+        Raises:
+            PlottingModuleError if the user code raised an exception.
+        """
+        raise NotImplementedError
+
+    def cancel(self) -> None:
+        """Stop the computation, or at least make sure its result is not used."""
+        raise NotImplementedError
+
+    def partial(self) -> Tuple[bool, Any]:
+        """The latest partial ``data_post`` reported since the last call, if any.
+
+        Returns:
+            Whether there was a new partial result, and the result
+        """
+        raise NotImplementedError
+
+
+class ThreadJob(Job):
+    def __init__(self, func: Callable, *args):
+        self._result: Any = None
+        self._exception: Optional[BaseException] = None
+        self._partial: Tuple[bool, Any] = (False, None)
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, args=(func, *args), daemon=True
+        )
+        self._thread.start()
+
+    def _run(self, func: Callable, *args):
+        try:
+            self._result = func(*args, report=self._report)
+        except BaseException as exc:  # pylint: disable=broad-except
+            self._exception = exc
+        self._done.set()
+
+    def _report(self, data_post: Any):
+        with self._lock:
+            self._partial = (True, data_post)
+
+    def partial(self) -> Tuple[bool, Any]:
+        with self._lock:
+            partial, self._partial = self._partial, (False, None)
+        return partial
+
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self) -> None:
+        """Block until the job is done."""
+        self._done.wait()
+
+    def result(self) -> Any:
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def cancel(self) -> None:
+        # Threads cannot be stopped, the caller drops the reference instead
+        pass
+
+
+def _shared_dir() -> str:
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        return "/dev/shm"
+    return tempfile.gettempdir()
+
+
+def _to_shared(obj: Any, prefix: str) -> str:
+    """Write ``obj`` to shared memory, returns the path to pass to the reader."""
+    path = tempfile.mkdtemp(prefix=prefix, dir=_shared_dir())
+    disk.dump(obj, Path(path))
+    return path
+
+
+def _from_shared(path: str) -> Any:
+    """Read and remove an object written by :func:`_to_shared`.
+
+    The arrays stay mapped in memory after the files are removed.
+    """
+    try:
+        return disk.load(Path(path))
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def _run_in_process(
+    file_path, run_load, data, cache, cache_key, connection, prefix=None
+):
+    """Entry point of the child process of :class:`ProcessJob`.
+
+    If ``prefix`` is given, the results are sent as paths to shared memory
+    (see :func:`_to_shared`) instead of through the pipe.
+    """
+
+    def pack(obj):
+        return obj if prefix is None or obj is UNCHANGED else _to_shared(obj, prefix)
+
+    try:
+        loader = ModuleLoader(file_path)
+        loader.load_module()
+        data, data_post = compute_data(
+            bind_data_functions(loader),
+            run_load,
+            data,
+            cache,
+            cache_key,
+            report=lambda data_post: connection.send(("partial", pack(data_post))),
+        )
+        connection.send(("ok", (pack(data), pack(data_post))))
+    except PlottingModuleError as exc:
+        connection.send(("error", (str(exc), _format(exc.__cause__))))
+    except BaseException as exc:  # pylint: disable=broad-except
+        connection.send(("error", (f"Background process failed: {exc}", _format(exc))))
+    finally:
+        connection.close()
+
+
+def _call_in_process(file_path, f_name, args, prefix, connection):
+    """Entry point of the child process of :func:`call_in_process`."""
+    try:
+        loader = ModuleLoader(file_path)
+        loader.load_module()
+        connection.send(("ok", _to_shared(loader.call(f_name, *args), prefix)))
+    except PlottingModuleError as exc:
+        connection.send(("error", (str(exc), _format(exc.__cause__))))
+    except BaseException as exc:  # pylint: disable=broad-except
+        connection.send(("error", (f"Background process failed: {exc}", _format(exc))))
+    finally:
+        connection.close()
+
+
+def _format(exc: Optional[BaseException]) -> str:
+    if exc is None:
+        return ""
+    return "".join(traceback.format_exception(type(exc), exc, exc.__traceback__))
+
+
+class BackgroundError(Exception):
+    """Exception raised in another process, with its formatted traceback."""
+
+
+def mp_context():
+    """The start method of the child processes of liveplot.
+
+    ``fork`` where available, so that the children inherit the loaded data
+    without copies, the default start method otherwise.
+    """
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context()
+
+
+def _thread_safe_context():
+    """A start method that does not fork the calling process.
+
+    Forking a process with several threads can deadlock the child, on a lock
+    held by another thread at the time of the fork.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+class ProcessJob(Job):
+    def __init__(self, *args, target: Callable = _run_in_process, context=None):
+        context = context if context is not None else _thread_safe_context()
+        self._connection, child_connection = context.Pipe(duplex=False)
+        self._process = context.Process(
+            target=target, args=(*args, child_connection), daemon=True
+        )
+        self._process.start()
+        child_connection.close()
+        self._message: Optional[Tuple[str, Any]] = None
+        self._partial: Tuple[bool, Any] = (False, None)
+
+    def _receive(self):
+        try:
+            while self._message is None and self._connection.poll():
+                status, payload = self._connection.recv()
+                if status == "partial":
+                    self._partial = (True, payload)
+                else:
+                    self._message = (status, payload)
+        except EOFError:
+            self._message = ("error", ("Background process exited unexpectedly", ""))
+
+    def partial(self) -> Tuple[bool, Any]:
+        self._receive()
+        partial, self._partial = self._partial, (False, None)
+        return partial
+
+    def done(self) -> bool:
+        if self._message is not None:
+            return True
+        self._receive()
+        if self._message is None and not self._process.is_alive():
+            self._receive()
+            if self._message is None:
+                self._message = (
+                    "error",
+                    (
+                        "Background process exited unexpectedly "
+                        f"(exit code {self._process.exitcode})",
+                        "",
+                    ),
+                )
+        if self._message is not None:
+            self._process.join()
+        return self._message is not None
+
+    def wait(self) -> None:
+        """Block until the job is done."""
+        while not self.done():
+            multiprocessing.connection.wait([self._connection, self._process.sentinel])
+
+    def result(self) -> Any:
+        assert self._message is not None
+        status, payload = self._message
+        if status == "ok":
+            return payload
+        message, formatted = payload
+        raise PlottingModuleError(message) from BackgroundError(formatted)
+
+    def cancel(self) -> None:
+        if self._process.is_alive():
+            logger.debug("Terminating background process")
+            self._process.terminate()
+            self._process.join()
+        self._connection.close()
+
+
+def call_in_process(file_path: Path, f_name: str, *args) -> Any:
+    """Call the function ``f_name`` of the script in a child process.
+
+    The child imports the script again. As it is called from the threads
+    running the stages, the child is not forked from this process but started
+    by a fork server (or spawned), and the arguments are pickled to it. The
+    result is passed back in shared memory.
+
+    Raises:
+        PlottingModuleError if the function raised an exception or the child
+        process crashed
+    """
+    job = ProcessJob(
+        file_path,
+        f_name,
+        args,
+        f"liveplot-{os.getpid()}-",
+        target=_call_in_process,
+    )
+    try:
+        job.wait()
+        return _from_shared(job.result())
+    finally:
+        job.cancel()
+
+
+class DataRunner:
+    """Starts the computation of ``load_data`` and ``postprocess``."""
+
+    # Whether the runner keeps the data itself, in which case the jobs only
+    # return ``data_post`` and do not need the data
+    holds_data = False
+
+    def submit(
+        self,
+        loader: ModuleLoader,
+        run_load: bool,
+        data: Any,
+        cache: Optional[DataCache] = None,
+        cache_key: Optional[str] = None,
+    ) -> Job:
+        """Start computing ``(data, data_post)`` with the loaded module.
+
+        Args:
+            loader: The module to take ``load_data`` and ``postprocess`` from
+            run_load: Whether to call ``load_data`` or use ``data``
+            data: The input of ``postprocess`` if not ``run_load``
+            cache: Where to save the result of ``load_data``, if given
+            cache_key: Key under which to save the result of ``load_data``
+        """
+        raise NotImplementedError
+
+
+class ThreadRunner(DataRunner):
+    def submit(self, loader, run_load, data, cache=None, cache_key=None) -> Job:
+        return ThreadJob(
+            compute_data,
+            bind_data_functions(loader),
+            run_load,
+            data,
+            cache,
+            cache_key,
+        )
+
+
+class ProcessRunner(DataRunner):
+    def submit(self, loader, run_load, data, cache=None, cache_key=None) -> Job:
+        for f_name in DataFunctions._fields:
+            loader.mark_executed(f_name)
+        return ProcessJob(loader.file_path, run_load, data, cache, cache_key)
+
+
+def _stop_child(child: Optional[Tuple]):
+    if child is not None:
+        process, connection, _ = child
+        process.terminate()
+        process.join()
+        connection.close()
+
+
+def _worker_main(connection):
+    """Entry point of the worker process of :class:`WorkerRunner`.
+
+    Receives ``("run", job_id, file_path, run_load, cache, cache_key)``,
+    ``("cancel", job_id)`` and ``("stop",)`` messages, and sends back
+    ``(job_id, status, payload)`` messages as :class:`ProcessJob` does, with
+    ``data_post`` in shared memory.
+    """
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit())
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Stopped by the main process
+    # Forked, the worker has no GUI and the children inherit its data
+    context = mp_context()
+    prefix = f"liveplot-{os.getpid()}-"
+    resident: Dict[Path, Any] = {}
+    children: Dict[int, Tuple] = {}
+
+    def start(job_id, file_path, run_load, cache, cache_key):
+        run_load = run_load or file_path not in resident
+        receiver, sender = context.Pipe(duplex=False)
+        data = None if run_load else resident[file_path]
+        process = context.Process(
+            target=_run_in_process,
+            args=(file_path, run_load, data, cache, cache_key, sender, prefix),
+            daemon=True,
+        )
+        process.start()
+        sender.close()
+        children[job_id] = (process, receiver, file_path)
+
+    def handle(job_id):
+        process, receiver, file_path = children[job_id]
+        try:
+            status, payload = receiver.recv()
+        except EOFError:
+            process.join()
+            status, payload = "error", (
+                f"Background process exited unexpectedly (exit code {process.exitcode})",
+                "",
+            )
+        if status == "ok":
+            data, data_post = payload
+            if data is not UNCHANGED:
+                resident[file_path] = _from_shared(data)
+            payload = data_post
+        if status != "partial":
+            del children[job_id]
+            process.join()
+            receiver.close()
+        connection.send((job_id, status, payload))
+
+    try:
+        while True:
+            receivers = {child[1]: job_id for job_id, child in children.items()}
+            for ready in multiprocessing.connection.wait([connection, *receivers]):
+                if ready is not connection:
+                    handle(receivers[ready])
+                    continue
+                message = connection.recv()
+                if message[0] == "run":
+                    start(*message[1:])
+                elif message[0] == "cancel":
+                    _stop_child(children.pop(message[1], None))
+                else:
+                    return
+    except EOFError:
+        return
+    finally:
+        for job_id in list(children):
+            _stop_child(children.pop(job_id))
+        for path in glob.glob(os.path.join(_shared_dir(), prefix + "*")):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+class WorkerJob(Job):
+    def __init__(self, runner: "WorkerRunner", job_id: int):
+        self._runner = runner
+        self.job_id = job_id
+        self._message: Optional[Tuple[str, Any]] = None
+        self._partial: Optional[str] = None
+
+    def set_partial(self, path: Optional[str]):
+        """Replace the pending partial result, removing the previous one."""
+        if self._partial is not None:
+            shutil.rmtree(self._partial, ignore_errors=True)
+        self._partial = path
+
+    def partial(self) -> Tuple[bool, Any]:
+        self._runner.receive()
+        if self._partial is None:
+            return False, None
+        path, self._partial = self._partial, None
+        return True, _from_shared(path)
+
+    def done(self) -> bool:
+        self._runner.receive()
+        return self._message is not None
+
+    def result(self) -> Any:
+        assert self._message is not None
+        status, payload = self._message
+        if status == "ok":
+            return UNCHANGED, _from_shared(payload)
+        message, formatted = payload
+        raise PlottingModuleError(message) from BackgroundError(formatted)
+
+    def finish(self, status: str, payload: Any):
+        self._message = (status, payload)
+
+    def cancel(self) -> None:
+        self._runner.cancel(self.job_id)
+        self.set_partial(None)
+        if self._message is not None and self._message[0] == "ok":
+            shutil.rmtree(self._message[1], ignore_errors=True)
+
+
+class WorkerRunner(DataRunner):
+    """Runs the jobs in a persistent worker process that keeps the data.
+
+    The worker is started on the first job, and again if it dies.
+    """
+
+    holds_data = True
+
+    def __init__(self):
+        self._process = None
+        self._connection = None
+        self._jobs: Dict[int, WorkerJob] = {}
+        self._ids = itertools.count()
+
+    def _ensure_worker(self):
+        if self._process is not None and self._process.is_alive():
+            return
+        logger.debug("Starting the data worker")
+        context = _thread_safe_context()
+        self._connection, worker_connection = context.Pipe()
+        # Not a daemon, so it can start processes. Stopped at exit by close
+        self._process = context.Process(target=_worker_main, args=(worker_connection,))
+        self._process.start()
+        worker_connection.close()
+        atexit.register(self.close)
+
+    def submit(self, loader, run_load, data, cache=None, cache_key=None) -> Job:
+        for f_name in DataFunctions._fields:
+            loader.mark_executed(f_name)
+        self._ensure_worker()
+        job = WorkerJob(self, next(self._ids))
+        self._jobs[job.job_id] = job
+        self._connection.send(
+            ("run", job.job_id, loader.file_path, run_load, cache, cache_key)
+        )
+        return job
+
+    def receive(self):
+        """Dispatch the messages of the worker to the jobs."""
+        if self._connection is None:
+            return
+        try:
+            while self._connection.poll():
+                job_id, status, payload = self._connection.recv()
+                job = self._jobs.get(job_id)
+                if job is None:  # Cancelled
+                    if status != "error":
+                        shutil.rmtree(payload, ignore_errors=True)
+                elif status == "partial":
+                    job.set_partial(payload)
+                else:
+                    job.finish(status, payload)
+                    del self._jobs[job_id]
+        except (EOFError, OSError):
+            self._worker_died()
+            return
+        if self._jobs and not self._process.is_alive():
+            self._worker_died()
+
+    def _worker_died(self):
+        logger.warning("The data worker exited, it will be restarted")
+        for job in self._jobs.values():
+            job.finish("error", ("Data worker exited unexpectedly", ""))
+        self._jobs = {}
+        self._connection.close()
+        self._connection = None
+        self._process = None
+
+    def cancel(self, job_id: int):
+        if self._jobs.pop(job_id, None) is not None and self._connection is not None:
+            self._connection.send(("cancel", job_id))
+
+    def close(self):
+        """Stop the worker."""
+        if self._connection is not None:
+            try:
+                self._connection.send(("stop",))
+            except OSError:
+                pass
+            self._process.join()
+            self._connection.close()
+            self._connection = None
+
+
+def make_runner(mode: str) -> DataRunner:
+    """Create the runner for ``mode``, one of :data:`BACKGROUND_MODES`.
+
+    Raises:
+        ValueError if the mode is unknown
+    """
+    if mode == "thread":
+        return ThreadRunner()
+    if mode == "process":
+        return ProcessRunner()
+    raise ValueError(f"Unknown background mode {mode}, use {BACKGROUND_MODES}")
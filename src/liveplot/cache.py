@@ -0,0 +1,255 @@
+"""Persistent on-disk cache for the results of ``load_data``.
+
+Entries are keyed by a hash of the source of the function that produced them
+(see :meth:`~liveplot.module_loader.ModuleLoader.func_hash`), so a new session
+on an unchanged script can restore the data instead of recomputing it. The
+same code can read other data when the script is elsewhere (``__file__``) or
+run from another directory (relative paths), so the entries of each script are
+in their own scope (see :func:`script_scope`).
+
+NumPy arrays are stored as separate ``.npy`` files and memory-mapped on load,
+so restoring large arrays is close to free until the data is touched.
+Everything else is pickled. The cache is bounded in size and evicts the least
+recently used entries first.
+"""
+import hashlib
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("liveplot.cache")
+
+DEFAULT_CACHE_SIZE_MB = 4096
+
+_PICKLE_FILE = "data.pkl"
+
+
+def default_cache_dir() -> Path:
+    """The cache directory, from ``$LIVEPLOT_CACHE_DIR`` or ``$XDG_CACHE_HOME``.
+
+    Defaults to ``~/.cache/liveplot``.
+    """
+    if "LIVEPLOT_CACHE_DIR" in os.environ:
+        return Path(os.environ["LIVEPLOT_CACHE_DIR"])
+    xdg_cache = os.environ.get("XDG_CACHE_HOME", os.path.join("~", ".cache"))
+    return Path(xdg_cache).expanduser() / "liveplot"
+
+
+def hash_source(*sources: str) -> str:
+    """Hex digest identifying the given source code."""
+    digest = hashlib.sha256()
+    for source in sources:
+        digest.update(source.encode("utf8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def script_scope(file_path: Path) -> str:
+    """The scope of the cache entries of the script ``file_path``.
+
+    Identifies the resolved path of the script and the working directory.
+    """
+    return hash_source(str(Path(file_path).resolve()), os.getcwd())
+
+
+def _is_mappable(obj: Any) -> bool:
+    return isinstance(obj, np.ndarray) and not obj.dtype.hasobject
+
+
+class _ArrayPickler(pickle.Pickler):
+    """Pickler that writes NumPy arrays to ``.npy`` files next to the pickle.
+
+    An array referenced several times is written once. With ``compress``,
+    arrays are written to compressed ``.npz`` files instead, which are smaller
+    but read into memory rather than memory-mapped.
+    """
+
+    def __init__(self, file, directory: Path, compress: bool = False):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._directory = directory
+        self._compress = compress
+        self._saved: Dict[int, Tuple[str, str]] = {}
+
+    def persistent_id(self, obj):
+        if not _is_mappable(obj):
+            return None
+        if id(obj) not in self._saved:
+            if self._compress:
+                name = f"{len(self._saved)}.npz"
+                np.savez_compressed(self._directory / name, array=obj)
+                self._saved[id(obj)] = ("npz", name)
+            else:
+                name = f"{len(self._saved)}.npy"
+                np.save(self._directory / name, obj, allow_pickle=False)
+                self._saved[id(obj)] = ("npy", name)
+        return self._saved[id(obj)]
+
+
+class _ArrayUnpickler(pickle.Unpickler):
+    """Unpickler that memory-maps the arrays saved by :class:`_ArrayPickler`.
+
+    Arrays are mapped copy-on-write: they can be modified in memory without
+    changing the files on disk.
+    """
+
+    def __init__(self, file, directory: Path):
+        super().__init__(file)
+        self._directory = directory
+
+    def persistent_load(self, pid):
+        kind, name = pid
+        if kind == "npy":
+            return np.load(self._directory / name, mmap_mode="c", allow_pickle=False)
+        if kind == "npz":
+            with np.load(self._directory / name, allow_pickle=False) as arrays:
+                return arrays["array"]
+        raise pickle.UnpicklingError(f"Unknown persistent id {pid}")
+
+
+def dump(obj: Any, directory: Path, compress: bool = False) -> None:
+    """Write ``obj`` to ``directory``, storing arrays as ``.npy`` files.
+
+    Args:
+        obj: The object to write
+        directory: An existing directory
+        compress: Whether to compress the arrays, see :class:`_ArrayPickler`
+
+    Raises:
+        Exception (any) raised by pickle if ``obj`` cannot be pickled.
+    """
+    with open(directory / _PICKLE_FILE, "wb") as file:
+        _ArrayPickler(file, directory, compress).dump(obj)
+
+
+def load(directory: Path) -> Any:
+    """Read an object written by :func:`dump`, memory-mapping its arrays."""
+    with open(directory / _PICKLE_FILE, "rb") as file:
+        return _ArrayUnpickler(file, directory).load()
+
+
+def _dir_size(directory: Path) -> int:
+    return sum(f.stat().st_size for f in directory.iterdir() if f.is_file())
+
+
+class DataCache:
+    """Size-bounded cache of Python objects in a directory.
+
+    Args:
+        directory: Where to store the entries. Created if needed.
+        max_size: Maximum total size of the entries, in bytes.
+        scope: The keys are in this scope, the same key in another scope is
+            another entry. The size is bounded over all scopes.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[Path] = None,
+        max_size: int = DEFAULT_CACHE_SIZE_MB * 2**20,
+        scope: str = "",
+    ):
+        if directory is None:
+            directory = default_cache_dir()
+        self.directory = Path(directory)
+        self.max_size = max_size
+        self.scope = scope
+        logger.debug(f"Using cache in {self.directory}")
+
+    def scoped(self, scope: str) -> "DataCache":
+        """The same cache, with its keys in ``scope``."""
+        return DataCache(self.directory, self.max_size, scope=scope)
+
+    def _entry(self, key: str) -> Path:
+        if self.scope:
+            return self.directory / hash_source(self.scope, key)
+        return self.directory / key
+
+    def __contains__(self, key: str) -> bool:
+        return (self._entry(key) / _PICKLE_FILE).is_file()
+
+    def load(self, key: str) -> Any:
+        """Load the object saved under ``key``.
+
+        Raises:
+            KeyError if there is no entry for ``key``.
+        """
+        if key not in self:
+            raise KeyError(key)
+        entry = self._entry(key)
+        os.utime(entry)
+        return load(entry)
+
+    def save(self, key: str, obj: Any) -> bool:
+        """Save ``obj`` under ``key`` and evict old entries if over budget.
+
+        Returns whether the object could be saved.
+        Objects that cannot be pickled are skipped with a warning.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_entry = Path(tempfile.mkdtemp(prefix=".tmp-", dir=self.directory))
+        try:
+            dump(obj, tmp_entry)
+        except Exception as exc:  # pylint: disable=broad-except
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+            logger.warning(f"Could not cache the data: {exc}")
+            return False
+
+        if _dir_size(tmp_entry) > self.max_size:
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+            logger.warning("Not caching the data, larger than the cache size")
+            return False
+
+        entry = self._entry(key)
+        if entry.exists():
+            shutil.rmtree(entry, ignore_errors=True)
+        try:
+            os.replace(tmp_entry, entry)
+        except OSError:
+            # Another process saved the same entry concurrently
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+        self.evict(keep=key)
+        return True
+
+    def entries(self) -> List[Tuple[float, int, Path]]:
+        """The entries as ``(last access, size in bytes, path)``, oldest first."""
+        if not self.directory.is_dir():
+            return []
+        entries = [
+            (entry.stat().st_mtime, _dir_size(entry), entry)
+            for entry in self.directory.iterdir()
+            if entry.is_dir() and not entry.name.startswith(".")
+        ]
+        return sorted(entries)
+
+    def size(self) -> int:
+        """Total size of the entries, in bytes."""
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, keep: Optional[str] = None) -> None:
+        """Remove the least recently used entries until under ``max_size``."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        kept = self._entry(keep) if keep is not None else None
+        for _, size, entry in entries:
+            if total <= self.max_size:
+                break
+            if entry == kept:
+                continue
+            logger.debug(f"Evicting cache entry {entry.name}")
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+    def discard(self, key: str) -> None:
+        """Remove the entry saved under ``key``, if any."""
+        shutil.rmtree(self._entry(key), ignore_errors=True)
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        if self.directory.is_dir():
+            shutil.rmtree(self.directory, ignore_errors=True)
+            logger.info(f"Cleared cache {self.directory}")
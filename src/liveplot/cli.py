@@ -1,15 +1,51 @@
 import argparse
+import atexit
+import contextlib
+import glob
 import importlib.resources
 import logging
+import os
 import sys
 import textwrap
+import time
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence
 
-from liveplot.plot_watcher import PlotWatcher
+from liveplot.background import (
+    BACKGROUND_MODES,
+    DataRunner,
+    WorkerRunner,
+    make_runner,
+)
+from liveplot.cache import DEFAULT_CACHE_SIZE_MB, DataCache, default_cache_dir
+from liveplot.decimation import DECIMATION_METHODS
+from liveplot.file_watcher import (
+    DEFAULT_DEBOUNCE,
+    WATCHER_BACKENDS,
+    make_file_watcher,
+)
+from liveplot.profiling import Profiler
+
+# The image formats of liveplot.server, not imported here as it imports matplotlib
+SERVE_FORMATS = ("png", "svg")
+
+# The default formats of liveplot.export
+DEFAULT_EXPORT_FORMATS = "png,pdf,svg"
+
+# The modules that import matplotlib are imported when a figure is needed,
+# so that --help and --new do not wait for them
+if TYPE_CHECKING:
+    from liveplot.export import Exporter
+    from liveplot.memory import MemoryBudget
+    from liveplot.plot_watcher import PlotWatcher
+    from liveplot.plt_interface import PltInterface
+    from liveplot.server import FigureServer
 
 default_new_template_file = "new_liveplot.py"
 
+# Time (s) spent in the GUI event loop between two checks for file changes
+gui_tick = 0.05
+
 
 def create_template(filepath: Optional[Path]) -> Path:
     if filepath is None:
@@ -54,6 +90,65 @@ def make_parser() -> argparse.ArgumentParser:
                 def postprocess(data): return data
                 def make_figure(fig, data): pass
             
+            If load_data yields chunks, they are combined as they arrive and 
+            the figure is updated with the data loaded so far:
+            
+                def postprocess_chunk(chunk): return chunk
+                def combine(data, chunk): return [chunk] if data is None else data + [chunk]
+            
+            Instead of load_data and postprocess, any number of stages can be
+            declared with the stage decorator. The parameters of a stage name
+            the stages it takes as input, make_figure gets a dict of results,
+            and an edit only re-runs the stages downstream of it:
+            
+                from liveplot import stage
+                
+                @stage
+                def runs(): return load_runs()
+                @stage
+                def fit(runs): return fit_curve(runs)
+            
+            The files read by load_data and the stages are watched too: when
+            they change, the data is loaded again. Declare the files opened
+            outside of Python's open (h5py, ...) with liveplot.watch(path).
+            To read only what was appended to them, define instead of load_data:
+            
+                def load_data_incremental(data, offset): return data, offset
+            
+            which is called with (None, None) first (see liveplot.tail).
+            
+            Stages that do not depend on each other run at the same time, in
+            threads. Use @stage(process=True) for a stage running Python code
+            that holds the GIL, to run it in a child process instead.
+            
+            With --incremental, when only the data changed, the figure is not
+            built again but given to update_figure, with what make_figure
+            returned:
+            
+                def make_figure(fig, data): return fig.add_subplot(111).plot(data)
+                def update_figure(fig, data, lines): lines[0].set_ydata(data)
+            
+            With --serve PORT, the figures are rendered without a window and
+            shown in a browser at http://localhost:PORT/, which only downloads
+            the figures that changed.
+            
+            With --sweep PATH, the figure is rendered for each parameter set
+            returned by a sweep function, and the functions get the parameters
+            they name (see liveplot.sweep):
+            
+                def sweep(): return {"seed": [0, 1, 2], "lr": [0.1, 0.01]}
+                def load_data(seed): return load_run(seed)
+                def make_figure(fig, data, lr): pass
+            
+            With --snapshot PATH, the results are saved on exit, and a later
+            liveplot --restore PATH resumes without running the functions and
+            stages whose code did not change.
+            
+            With --export DIR, each figure is written to DIR in several formats
+            and resolutions whenever it is redrawn (by --jobs processes if given):
+            
+                liveplot script.py --export paper/ --export-formats png@300,pdf --once
+            
             Find the documentation and examples at https://github.com/fkunstner/liveplot
             """
         ),
@@ -73,12 +168,241 @@ def make_parser() -> argparse.ArgumentParser:
         default=None,
         help="The plotting file to update on change",
     )
+    parser.add_argument(
+        "more_scripts",
+        nargs="*",
+        type=Path,
+        default=[],
+        metavar="script",
+        help="More plotting files, each in its own figure. "
+        "Glob patterns such as 'figures/*.py' are expanded",
+    )
     parser.add_argument(
         "--debug",
         action="store_true",
         default=False,
         help="Enable debug logs",
     )
+    parser.add_argument(
+        "--watcher",
+        choices=WATCHER_BACKENDS,
+        default="auto",
+        help="How to detect changes to the script (default: auto, "
+        "inotify if available and polling otherwise)",
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=DEFAULT_DEBOUNCE,
+        metavar="SECONDS",
+        help="Wait for the files to be quiet for this long before refreshing, "
+        "so that bursts of saves (auto-formatters, ...) give a single refresh "
+        f"(default: {DEFAULT_DEBOUNCE})",
+    )
+    parser.add_argument(
+        "--max-fps",
+        type=float,
+        default=None,
+        metavar="N",
+        help="Redraw each figure at most N times per second, the changes "
+        "arriving faster are drawn together (default: no limit)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        default=False,
+        help="Do not save or restore the result of load_data on disk",
+    )
+    parser.add_argument(
+        "--clear-cache",
+        action="store_true",
+        default=False,
+        help="Remove all saved results of load_data",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=None,
+        help="Where to save the results of load_data "
+        f"(default: {default_cache_dir()})",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=DEFAULT_CACHE_SIZE_MB,
+        help=f"Maximum size of the cache in MB (default: {DEFAULT_CACHE_SIZE_MB})",
+    )
+    parser.add_argument(
+        "--memory-budget",
+        type=int,
+        default=None,
+        metavar="MB",
+        help="Keep at most this many MB of arrays in memory per script. Beyond "
+        "that, the results of load_data, postprocess and the stages are moved to "
+        "memory-mapped files next to the cache and read back when used",
+    )
+    parser.add_argument(
+        "--background",
+        choices=BACKGROUND_MODES,
+        default=None,
+        help="Run load_data and postprocess in a thread or a process, "
+        "so that the figure stays responsive while they run",
+    )
+    parser.add_argument(
+        "--worker",
+        action="store_true",
+        default=False,
+        help="Run load_data and postprocess in a persistent worker process "
+        "that keeps the data, so crashes in the script do not lose it. "
+        "Takes precedence over --background",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Run up to N independent stages at the same time "
+        "(default: the number of CPUs, 1 to run one at a time)",
+    )
+    parser.add_argument(
+        "--overlap-settings",
+        action="store_true",
+        default=False,
+        help="When settings and the data both changed, load the data while "
+        "settings runs instead of before. The data must not depend on settings",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        default=False,
+        help="When only the data changed, update the figure with the "
+        "update_figure(fig, data, artists) function of the script, given what "
+        "make_figure returned, instead of building it again",
+    )
+    parser.add_argument(
+        "--blit",
+        action="store_true",
+        default=False,
+        help="With --incremental, redraw only the data over a cached background "
+        "when the axes do not change. Implies --incremental",
+    )
+    parser.add_argument(
+        "--output",
+        "-o",
+        type=Path,
+        default=None,
+        help="Render the figure to this file (png, pdf, svg, ...) on every change "
+        "instead of showing it in a window. Does not need a display. "
+        "With several scripts, {stem} is replaced by the name of each script",
+    )
+    parser.add_argument(
+        "--sweep",
+        type=Path,
+        default=None,
+        metavar="PATH",
+        help="Render the figure for each parameter set returned by the sweep "
+        "function of the script, in --jobs processes, to images in the directory "
+        "PATH, or to a contact sheet if PATH is an image (png, pdf, ...). "
+        "With several scripts, {stem} is replaced by the name of each script",
+    )
+    parser.add_argument(
+        "--serve",
+        type=int,
+        default=None,
+        metavar="PORT",
+        help="Render the figures without a window and serve them to a browser "
+        "at http://localhost:PORT/, which is updated when they change",
+    )
+    parser.add_argument(
+        "--serve-host",
+        default="127.0.0.1",
+        metavar="HOST",
+        help="The address to serve the figures on (default: 127.0.0.1, "
+        "0.0.0.0 for all interfaces, without authentication)",
+    )
+    parser.add_argument(
+        "--serve-format",
+        choices=SERVE_FORMATS,
+        default="png",
+        help="The image format of the served figures (default: png)",
+    )
+    parser.add_argument(
+        "--export",
+        type=Path,
+        default=None,
+        metavar="DIR",
+        help="Write each figure to the directory DIR in each of --export-formats "
+        "whenever it is redrawn, in --jobs processes if given and there are at "
+        "least 4 renderings, in this process otherwise",
+    )
+    parser.add_argument(
+        "--export-formats",
+        default=DEFAULT_EXPORT_FORMATS,
+        metavar="LIST",
+        help="The formats of --export, separated by commas, each with an optional "
+        f"dpi such as png@300 (default: {DEFAULT_EXPORT_FORMATS})",
+    )
+    parser.add_argument(
+        "--once",
+        action="store_true",
+        default=False,
+        help="Exit once the figures are drawn and exported rather than watching "
+        "the scripts, for example with --export or --output",
+    )
+    parser.add_argument(
+        "--snapshot",
+        type=Path,
+        default=None,
+        metavar="PATH",
+        help="On exit, save the results of load_data, postprocess and the stages "
+        "with the hashes of their code to the directory PATH, to resume with "
+        "--restore. Arrays are memory-mapped when restored",
+    )
+    parser.add_argument(
+        "--snapshot-compress",
+        action="store_true",
+        default=False,
+        help="Compress the arrays of --snapshot, which are then read in memory "
+        "when restored rather than memory-mapped",
+    )
+    parser.add_argument(
+        "--restore",
+        type=Path,
+        default=None,
+        metavar="PATH",
+        help="Resume the session saved with --snapshot PATH, only running the "
+        "functions and stages whose code changed since",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        default=False,
+        help="Log the wall time of each stage of each refresh, "
+        "and print a summary with CPU time and peak memory on exit",
+    )
+    parser.add_argument(
+        "--stats-file",
+        type=Path,
+        default=None,
+        help="Append the measurements of each refresh to this file, "
+        "as one JSON object per line. Implies --stats",
+    )
+    parser.add_argument(
+        "--profile-dir",
+        type=Path,
+        default=None,
+        help="Save a cProfile dump of the slowest stage of each refresh "
+        "in this directory. Implies --stats",
+    )
+    parser.add_argument(
+        "--decimate",
+        choices=DECIMATION_METHODS,
+        default=None,
+        help="Downsample lines and scatter plots with many more points than "
+        "pixels, and again on zoom. minmax draws the same picture, "
+        "lttb keeps fewer points",
+    )
     return parser
 
 
@@ -96,11 +420,176 @@ def configure_logs(debug: bool = False):
     logger.addHandler(handler)
 
 
-def launch_liveplot(filepath: Path):
-    figure_watcher = PlotWatcher.from_path(filepath)
+def expand_scripts(patterns: Sequence[Path]) -> List[Path]:
+    """The scripts matching ``patterns``, in order and without duplicates.
+
+    Glob patterns are expanded, for shells that do not (or quoted patterns).
+    """
+    scripts: List[Path] = []
+    for pattern in patterns:
+        if glob.has_magic(str(pattern)):
+            scripts.extend(Path(path) for path in sorted(glob.glob(str(pattern))))
+        else:
+            scripts.append(pattern)
+    return list(dict.fromkeys(scripts))
+
+
+def output_path(output: Path, script: Path) -> Path:
+    """Where to render ``script``, replacing ``{stem}`` in ``output`` by its name."""
+    return Path(str(output).replace("{stem}", script.stem))
+
+
+def launch_liveplot(
+    filepaths: Sequence[Path],
+    watcher_backend: str = "auto",
+    cache: Optional[DataCache] = None,
+    runner: Optional[DataRunner] = None,
+    incremental: bool = False,
+    blit: bool = False,
+    decimate: Optional[str] = None,
+    output: Optional[Path] = None,
+    profiler: Optional[Profiler] = None,
+    memory_budget: Optional["MemoryBudget"] = None,
+    workers: int = 1,
+    server: Optional["FigureServer"] = None,
+    serve_format: str = "png",
+    debounce: float = DEFAULT_DEBOUNCE,
+    max_fps: Optional[float] = None,
+    snapshot: Optional[Path] = None,
+    snapshot_compress: bool = False,
+    restore: Optional[Path] = None,
+    exporter: Optional["Exporter"] = None,
+    once: bool = False,
+    overlap_settings: bool = False,
+):
+    """Watch the scripts and update their figures until all windows are closed.
+
+    Each script gets its own :class:`PlotWatcher` and figure. With several
+    scripts, the rcParams set by the settings of a script are only active
+    while its figure is updated, and the results of identical stages are
+    shared through a :class:`DataStore`. All scripts share the event loop.
+
+    Up to ``workers`` independent stages of a script run at the same time,
+    and with ``overlap_settings``, while its settings run.
+    With a ``server``, the figures are rendered in ``serve_format`` and
+    published to it rather than shown (see :mod:`liveplot.server`).
+    The changes are debounced by ``debounce`` seconds and the figures are
+    refreshed by a :class:`Scheduler`, redrawing each at most ``max_fps``
+    times per second. The session is resumed from the snapshot ``restore``
+    and saved to ``snapshot`` on exit, if given (see :mod:`liveplot.snapshot`).
+    The figures are exported by ``exporter`` when redrawn, if given (see
+    :mod:`liveplot.export`). With ``once``, returns once the figures are drawn
+    and exported instead of watching the scripts.
+    """
+    # pylint: disable=import-outside-toplevel
+    import matplotlib
+
+    from liveplot.data_store import DataStore
+    from liveplot.plot_watcher import PlotWatcher
+    from liveplot.plt_interface import HeadlessInterface, PltInterface
+    from liveplot.scheduler import Scheduler
+    from liveplot.server import ServedInterface
+    from liveplot.snapshot import restore_snapshot, save_snapshot
+
+    figure_watchers: Dict[Path, "PlotWatcher"] = {}
+    isolated = len(filepaths) > 1
+    store = DataStore() if isolated else None
+
+    def make_interface(filepath: Path) -> "PltInterface":
+        if server is not None:
+            return ServedInterface(server, filepath.stem, serve_format)
+        if output is not None:
+            return HeadlessInterface(output_path(output, filepath))
+        if not isolated:
+            return PltInterface(blit=blit)
+
+        def on_close():
+            if filepath in figure_watchers:
+                figure_watchers.pop(filepath).close()
+
+        return PltInterface(blit=blit, on_close=on_close)
+
+    for filepath in filepaths:
+        figure_watchers[filepath] = PlotWatcher.from_path(
+            filepath,
+            plt_interface=make_interface(filepath),
+            cache=cache,
+            runner=runner,
+            incremental=incremental or blit,
+            decimate=decimate,
+            store=store,
+            profiler=profiler,
+            memory_budget=memory_budget,
+            workers=workers,
+            exporter=exporter,
+            overlap_settings=overlap_settings,
+        )
+    # Including the scripts whose window gets closed
+    snapshot_watchers = list(figure_watchers.values())
+    if restore is not None:
+        restore_snapshot(restore, snapshot_watchers)
+    if snapshot is not None:
+        atexit.register(
+            save_snapshot, snapshot, snapshot_watchers, compress=snapshot_compress
+        )
+
+    file_watcher = make_file_watcher(
+        filepaths, backend=watcher_backend, debounce=debounce
+    )
+
+    def context(figure_watcher: "PlotWatcher"):
+        if not isolated:
+            return contextlib.nullcontext()
+        return matplotlib.rc_context(figure_watcher.plt_interface.rc_params)
+
+    scheduler = Scheduler(file_watcher, max_fps=max_fps, context=context)
+    while figure_watchers:
+        scheduler.step(figure_watchers.values())
+        if once and not scheduler.pending:
+            if not any(watcher.busy for watcher in figure_watchers.values()):
+                break
+        if figure_watchers:
+            next(iter(figure_watchers.values())).plt_interface.pause(gui_tick)
+    if exporter is not None:
+        exporter.close()
+    sys.exit()
+
+
+def launch_sweep(
+    filepaths: Sequence[Path],
+    output: Path,
+    watcher_backend: str = "auto",
+    cache: Optional[DataCache] = None,
+    workers: int = 1,
+    debounce: float = DEFAULT_DEBOUNCE,
+):
+    """Render the variants of the scripts again whenever they change.
+
+    See :mod:`liveplot.sweep`. The variants of all scripts are rendered by a
+    pool of ``workers`` processes.
+    """
+    # pylint: disable-next=import-outside-toplevel
+    from liveplot.sweep import SweepWatcher, make_executor
+
+    executor = make_executor(workers)
+    atexit.register(executor.shutdown, wait=False)
+    sweep_watchers = [
+        SweepWatcher(filepath, output_path(output, filepath), executor, cache=cache)
+        for filepath in filepaths
+    ]
+    file_watcher = make_file_watcher(
+        filepaths, backend=watcher_backend, debounce=debounce
+    )
+
+    changed = True
     while True:
-        figure_watcher.refresh()
-        figure_watcher.plt_interface.pause(2)
+        for sweep_watcher in sweep_watchers:
+            if changed:
+                sweep_watcher.refresh()
+            for path in sweep_watcher.plt_module.dependency_files():
+                file_watcher.add_path(path)
+        time.sleep(gui_tick)
+        changed = file_watcher.poll()
 
 
 def main():
@@ -108,12 +597,146 @@ def main():
     cli_args = parser.parse_args()
     configure_logs(cli_args.debug)
 
+    scripts = expand_scripts(
+        ([cli_args.script] if cli_args.script is not None else [])
+        + cli_args.more_scripts
+    )
+
+    if cli_args.clear_cache:
+        DataCache(cli_args.cache_dir).clear()
+        if cli_args.script is None:
+            sys.exit()
+
     no_args = cli_args.new is False and cli_args.script is None
     if no_args:
         parser.print_help()
         sys.exit()
 
     if cli_args.new is True:
-        cli_args.script = create_template(cli_args.script)
+        scripts = [create_template(cli_args.script)]
+
+    if not scripts:
+        parser.error(f"No script matches {cli_args.script}")
 
-    launch_liveplot(cli_args.script)
+    workers = cli_args.jobs if cli_args.jobs is not None else os.cpu_count() or 1
+    if workers < 1:
+        parser.error("--jobs must be at least 1")
+    if cli_args.debounce < 0:
+        parser.error("--debounce must not be negative")
+    if cli_args.max_fps is not None and cli_args.max_fps <= 0:
+        parser.error("--max-fps must be positive")
+
+    if cli_args.output is not None:
+        # pylint: disable-next=import-outside-toplevel
+        from matplotlib.backend_bases import FigureCanvasBase
+
+        if len(scripts) > 1 and "{stem}" not in str(cli_args.output):
+            parser.error("With several scripts, --output must contain {stem}")
+        output_format = cli_args.output.suffix[1:].lower()
+        if output_format not in FigureCanvasBase.get_supported_filetypes():
+            parser.error(f"Unsupported output format '{output_format}'")
+
+    if cli_args.sweep is not None:
+        if cli_args.output is not None or cli_args.serve is not None:
+            parser.error("--sweep cannot be used with --output or --serve")
+        if cli_args.export is not None or cli_args.once:
+            parser.error("--sweep cannot be used with --export or --once")
+        if len(scripts) > 1 and "{stem}" not in str(cli_args.sweep):
+            parser.error("With several scripts, --sweep must contain {stem}")
+        sheet_format = cli_args.sweep.suffix[1:].lower()
+        if sheet_format:
+            # pylint: disable-next=import-outside-toplevel
+            from matplotlib.backend_bases import FigureCanvasBase
+
+            if sheet_format not in FigureCanvasBase.get_supported_filetypes():
+                parser.error(f"Unsupported contact sheet format '{sheet_format}'")
+
+    exporter = None
+    if cli_args.export is not None:
+        from liveplot.export import (  # pylint: disable=import-outside-toplevel
+            Exporter,
+            parse_formats,
+        )
+
+        try:
+            export_formats = parse_formats(cli_args.export_formats)
+        except ValueError as exc:
+            parser.error(str(exc))
+        # The pool only pays off when asked for, see liveplot.export
+        exporter = Exporter(cli_args.export, export_formats, workers=cli_args.jobs or 1)
+
+    server = None
+    if cli_args.serve is not None:
+        if cli_args.output is not None:
+            parser.error("--serve and --output cannot be used together")
+        from liveplot.server import (  # pylint: disable=import-outside-toplevel
+            FigureServer,
+        )
+
+        try:
+            server = FigureServer(cli_args.serve, host=cli_args.serve_host)
+        except OSError as exc:
+            parser.error(
+                f"Cannot serve on {cli_args.serve_host}:{cli_args.serve}: {exc}"
+            )
+        server.start()
+
+    cache = None
+    if not cli_args.no_cache:
+        cache = DataCache(cli_args.cache_dir, max_size=cli_args.cache_size * 2**20)
+
+    memory_budget = None
+    if cli_args.memory_budget is not None:
+        from liveplot.memory import (  # pylint: disable=import-outside-toplevel
+            MemoryBudget,
+        )
+
+        memory_budget = MemoryBudget(
+            cli_args.memory_budget * 2**20,
+            directory=cache.directory if cache is not None else None,
+        )
+
+    runner: Optional[DataRunner] = None
+    if cli_args.worker:
+        runner = WorkerRunner()
+    elif cli_args.background is not None:
+        runner = make_runner(cli_args.background)
+
+    profiler = None
+    if cli_args.stats or cli_args.stats_file or cli_args.profile_dir:
+        profiler = Profiler(cli_args.stats_file, cli_args.profile_dir)
+        atexit.register(lambda: print(profiler.summary(), file=sys.stderr))
+
+    if cli_args.sweep is not None:
+        launch_sweep(
+            scripts,
+            cli_args.sweep,
+            watcher_backend=cli_args.watcher,
+            cache=cache,
+            workers=workers,
+            debounce=cli_args.debounce,
+        )
+
+    launch_liveplot(
+        scripts,
+        watcher_backend=cli_args.watcher,
+        cache=cache,
+        runner=runner,
+        incremental=cli_args.incremental,
+        blit=cli_args.blit,
+        decimate=cli_args.decimate,
+        output=cli_args.output,
+        profiler=profiler,
+        memory_budget=memory_budget,
+        workers=workers,
+        server=server,
+        serve_format=cli_args.serve_format,
+        debounce=cli_args.debounce,
+        max_fps=cli_args.max_fps,
+        snapshot=cli_args.snapshot,
+        snapshot_compress=cli_args.snapshot_compress,
+        restore=cli_args.restore,
+        exporter=exporter,
+        once=cli_args.once,
+        overlap_settings=cli_args.overlap_settings,
+    )
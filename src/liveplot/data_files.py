@@ -0,0 +1,163 @@
+"""Find the files read by ``load_data``, to load the data again when they change.
+
+While ``load_data`` (or a stage without inputs) runs, the files it opens for
+reading are recorded, whether through ``open``, ``np.load``, ``np.loadtxt``,
+pandas readers, ... Files opened by code that does not go through Python's
+``open`` (for example HDF5 files opened by h5py) can be declared with
+:func:`watch`::
+
+    from liveplot import watch
+
+    def load_data():
+        with h5py.File(watch("results.h5")) as file:
+            return file["losses"][:]
+
+The recorded files are watched like the script. When one of them changes, only
+the data is loaded again, the script is not imported again.
+
+Files are recorded with :func:`sys.addaudithook` (Python 3.8+), only when the
+data is loaded in the liveplot process: with ``--background process`` or
+``--worker``, or on Python 3.7, only the files declared with :func:`watch` in
+the liveplot process are watched.
+
+For each file, the inode, size and modification time are kept (see
+:func:`signature`), which tells whether data was only appended to the file
+(see :func:`only_appended`).
+"""
+import contextlib
+import logging
+import os
+import sys
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple, TypeVar, Union
+
+logger = logging.getLogger("liveplot.data_files")
+
+# Inode, size and modification time of a file, None if it does not exist
+Signature = Optional[Tuple[int, int, int]]
+
+PathType = TypeVar("PathType", bound=Union[str, os.PathLike])
+
+# Files opened by Python and its libraries, not data
+_CODE_SUFFIXES = (".py", ".pyc", ".pyd", ".so", ".dll", ".dylib", ".pth")
+
+_local = threading.local()
+_hook_installed = False
+_hook_lock = threading.Lock()
+
+
+def signature(path: Path) -> Signature:
+    """The inode, size and modification time of ``path``."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def signatures(paths) -> Dict[Path, Signature]:
+    """The :func:`signature` of each of ``paths``."""
+    return {Path(path): signature(path) for path in paths}
+
+
+def only_appended(old: Dict[Path, Signature], new: Dict[Path, Signature]) -> bool:
+    """Whether the files of ``old`` are the same files, grown or unchanged.
+
+    Files that were replaced (another inode), truncated, or rewritten without
+    growing are not appended to.
+    """
+    if set(old) != set(new):
+        return False
+    for path, before in old.items():
+        after = new[path]
+        if before is None or after is None or before[0] != after[0]:
+            return False
+        if after[1] < before[1] or (after[1] == before[1] and after != before):
+            return False
+    return True
+
+
+def _system_dirs() -> Tuple[str, ...]:
+    dirs = {sys.prefix, sys.base_prefix, sys.exec_prefix, sys.base_exec_prefix}
+    return tuple(os.path.join(os.path.realpath(d), "") for d in dirs)
+
+
+def _is_data_file(path: str) -> bool:
+    return (
+        not path.endswith(_CODE_SUFFIXES)
+        and not os.path.realpath(path).startswith(_system_dirs())
+        and os.path.isfile(path)
+    )
+
+
+def _reads_only(mode: Optional[str], flags: int) -> bool:
+    if mode is None:  # os.open
+        return flags & (os.O_WRONLY | os.O_RDWR) == 0
+    return not any(char in mode for char in "wax+")
+
+
+def _record(files: Dict[Path, Signature], path) -> None:
+    path = Path(os.fsdecode(path)).absolute()
+    if path not in files:
+        files[path] = signature(path)
+
+
+def _audit(event: str, args: tuple) -> None:
+    if event != "open":
+        return
+    files = getattr(_local, "files", None)
+    if files is None:
+        return
+    try:
+        path, mode, flags = args
+        if isinstance(path, int) or not _reads_only(mode, flags):
+            return
+        path = os.fsdecode(path)
+        if _is_data_file(path):
+            _record(files, path)
+    except Exception:  # pylint: disable=broad-except
+        # Raising here would make the open fail in the user code
+        pass
+
+
+def _install_hook() -> None:
+    global _hook_installed  # pylint: disable=global-statement
+    with _hook_lock:
+        if _hook_installed or not hasattr(sys, "addaudithook"):
+            return
+        # Audit hooks cannot be removed, it only records while _local.files is set
+        sys.addaudithook(_audit)
+        _hook_installed = True
+
+
+@contextlib.contextmanager
+def recording() -> Iterator[Dict[Path, Signature]]:
+    """Record the data files read in this thread within the block.
+
+    Yields:
+        The :func:`signature` of each file, as of when it was first opened
+    """
+    _install_hook()
+    previous = getattr(_local, "files", None)
+    files: Dict[Path, Signature] = {}
+    _local.files = files
+    try:
+        yield files
+    finally:
+        _local.files = previous
+        if previous is not None:
+            for path, file_signature in files.items():
+                previous.setdefault(path, file_signature)
+
+
+def watch(path: PathType) -> PathType:
+    """Declare ``path`` as a data file of the function calling it.
+
+    Returns:
+        ``path``, to be used in place, as in ``h5py.File(watch(path))``
+    """
+    files = getattr(_local, "files", None)
+    if files is not None:
+        _record(files, path)
+    return path
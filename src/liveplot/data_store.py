@@ -0,0 +1,123 @@
+"""Share the results of identical stages between the scripts of a session.
+
+When several scripts are watched by the same process, the results of
+``load_data`` and ``postprocess`` are kept in a :class:`DataStore`, keyed by
+the hash of the code that produced them (see
+:meth:`~liveplot.module_loader.ModuleLoader.func_hash`). A script whose
+``load_data`` has the same code as the one of another script reuses its
+result instead of loading the data again, so memory grows with the number of
+distinct datasets rather than the number of figures.
+
+Shared results are handed out as is, without copies. NumPy arrays in them are
+made read-only, so a script modifying its data in place gets an error instead
+of silently changing the data of the other scripts.
+
+Across processes, the results are shared through the memory-mapped files of
+the on-disk cache (see :mod:`liveplot.cache`).
+"""
+import logging
+import threading
+from typing import Any, Dict, Hashable, Optional, Set
+
+import numpy as np
+
+logger = logging.getLogger("liveplot.data_store")
+
+
+def freeze(value: Any) -> Any:
+    """Make the NumPy arrays in ``value`` read-only, in place.
+
+    Looks into lists, tuples and dict values. Returns ``value``.
+    """
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            freeze(item)
+    elif isinstance(value, dict):
+        for item in value.values():
+            freeze(item)
+    return value
+
+
+class DataStore:
+    """Results of stages, keyed by the hash of their code and inputs.
+
+    Each entry is held by owners (for example a script and a stage). An owner
+    holds at most one entry: storing or acquiring another one releases the
+    previous one, and entries held by nobody are dropped.
+
+    Stages running in other threads can store and acquire entries.
+    """
+
+    def __init__(self):
+        self._values: Dict[str, Any] = {}
+        self._owners: Dict[str, Set[Hashable]] = {}
+        self._held: Dict[Hashable, str] = {}
+        self._lock = threading.RLock()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._values
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def put(self, owner: Hashable, key: str, value: Any) -> Any:
+        """Store ``value`` under ``key`` and hold it for ``owner``.
+
+        Returns:
+            The stored value, which is the value already stored under ``key``
+            if there is one, so that identical results are kept only once.
+        """
+        with self._lock:
+            if key not in self._values:
+                self._values[key] = freeze(value)
+                self._owners[key] = set()
+            return self.acquire(owner, key)
+
+    def acquire(self, owner: Hashable, key: str) -> Any:
+        """Hold the value stored under ``key`` for ``owner`` and return it.
+
+        Raises:
+            KeyError if nothing is stored under ``key``
+        """
+        with self._lock:
+            value = self._values[key]
+            if self._held.get(owner) != key:
+                self.release(owner)
+                self._owners[key].add(owner)
+                self._held[owner] = key
+            return value
+
+    def held(self, owner: Hashable) -> Optional[str]:
+        """The key of the entry held by ``owner``, if any."""
+        with self._lock:
+            return self._held.get(owner)
+
+    def is_shared(self, key: str) -> bool:
+        """Whether the entry under ``key`` is held by several owners."""
+        with self._lock:
+            return len(self._owners.get(key, ())) > 1
+
+    def replace(self, key: str, value: Any):
+        """Store ``value`` under ``key`` instead, such as a memory-mapped copy.
+
+        Raises:
+            KeyError if nothing is stored under ``key``
+        """
+        with self._lock:
+            if key not in self._values:
+                raise KeyError(key)
+            self._values[key] = freeze(value)
+
+    def release(self, owner: Hashable):
+        """Stop holding the entry held by ``owner``, dropping it if unused."""
+        with self._lock:
+            key = self._held.pop(owner, None)
+            if key is None:
+                return
+            self._owners[key].discard(owner)
+            if not self._owners[key]:
+                logger.debug(f"Dropping unused data {key[:8]}")
+                del self._owners[key]
+                del self._values[key]
@@ -0,0 +1,314 @@
+"""Downsample large lines and scatter plots to what the screen can show.
+
+While ``make_figure`` runs in :func:`decimating`, the lines returned by
+``Axes.plot`` and the collections returned by ``Axes.scatter`` that have many
+more points than the axes have pixel columns are decimated. The full data is
+kept on the artist, and the artist is decimated again for the visible range
+whenever the limits change, so zooming in shows the data at full resolution.
+
+Two methods are available for lines:
+
+- ``"minmax"`` keeps the first, last, smallest and largest point of each pixel
+  column, which draws the same picture as the full line.
+- ``"lttb"`` (Largest Triangle Three Buckets) keeps a fixed number of points
+  that preserve the shape of the line, with fewer points than ``"minmax"``.
+
+Scatter plots keep the topmost point of each pixel. Lines whose x values are
+not sorted, or contain NaNs, are left untouched.
+"""
+import contextlib
+import logging
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:  # Imported when used, so that the CLI starts fast
+    from matplotlib.artist import Artist
+    from matplotlib.axes import Axes
+    from matplotlib.collections import PathCollection
+    from matplotlib.lines import Line2D
+
+logger = logging.getLogger("liveplot.decimation")
+
+DECIMATION_METHODS = ("minmax", "lttb")
+
+# Artists with fewer points than this times the width of the axes in pixels
+# are drawn as is
+POINTS_PER_PIXEL = 4
+
+# Attribute holding the method and full data of a decimated artist
+_DECIMATION = "_liveplot_decimation"
+# Attribute holding the callback ids of an axes watched for zoom
+_CALLBACKS = "_liveplot_decimation_cids"
+
+
+def _bins(x: np.ndarray, lo: float, hi: float, n_bins: int) -> np.ndarray:
+    if hi <= lo:
+        return np.zeros(len(x), dtype=np.intp)
+    bins = np.floor((x - lo) / (hi - lo) * n_bins).astype(np.intp)
+    return np.clip(bins, 0, n_bins - 1)
+
+
+def minmax(x: np.ndarray, y: np.ndarray, n_bins: int) -> np.ndarray:
+    """Indices of the first, last, min and max points of each of ``n_bins``.
+
+    The bins split ``[x[0], x[-1]]`` in equal parts.
+
+    Args:
+        x: Sorted x values
+        y: y values, without NaNs
+        n_bins: Number of bins, typically the width of the axes in pixels
+
+    Returns:
+        The sorted indices of the points to keep
+    """
+    if len(x) <= 4 * n_bins:
+        return np.arange(len(x))
+    bins = _bins(x, x[0], x[-1], n_bins)
+    starts = np.flatnonzero(np.diff(bins, prepend=-1))
+    ends = np.append(starts[1:], len(x)) - 1
+    counts = ends - starts + 1
+    keep = [starts, ends]
+    for reduce in (np.minimum, np.maximum):
+        extremes = np.repeat(reduce.reduceat(y, starts), counts)
+        candidates = np.flatnonzero(y == extremes)
+        _, first = np.unique(bins[candidates], return_index=True)
+        keep.append(candidates[first])
+    return np.unique(np.concatenate(keep))
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Indices of the ``n_out`` points selected by Largest Triangle Three Buckets.
+
+    The first and last points are always kept. The other points are split in
+    ``n_out - 2`` buckets of equal size, and the point of each bucket forming
+    the largest triangle with the point kept in the previous bucket and the
+    average of the next bucket is kept.
+
+    Args:
+        x: Sorted x values
+        y: y values, without NaNs
+        n_out: Number of points to keep
+
+    Returns:
+        The sorted indices of the points to keep
+    """
+    n = len(x)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.intp)
+    sizes = np.diff(edges)
+    next_x = np.append(np.add.reduceat(x[1:-1], edges[:-1] - 1) / sizes, x[-1])
+    next_y = np.append(np.add.reduceat(y[1:-1], edges[:-1] - 1) / sizes, y[-1])
+
+    keep = np.empty(n_out, dtype=np.intp)
+    keep[0], keep[-1] = 0, n - 1
+    previous = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        xa, ya = x[previous], y[previous]
+        xc, yc = next_x[i + 1], next_y[i + 1]
+        area = np.abs((xa - xc) * (y[start:end] - ya) - (xa - x[start:end]) * (yc - ya))
+        previous = start + int(np.argmax(area))
+        keep[i + 1] = previous
+    return keep
+
+
+_LINE_METHODS: Dict[str, Callable[[np.ndarray, np.ndarray, int], np.ndarray]] = {
+    "minmax": minmax,
+    "lttb": lambda x, y, n_bins: lttb(x, y, 2 * n_bins),
+}
+
+
+def thin_points(
+    offsets: np.ndarray, xlim: Tuple, ylim: Tuple, shape: Tuple[int, int]
+) -> np.ndarray:
+    """Indices of the topmost (last) point of each pixel of the axes.
+
+    Points outside of the limits are grouped in cells along the border.
+
+    Args:
+        offsets: The (N, 2) positions of the points
+        xlim: The x limits of the axes
+        ylim: The y limits of the axes
+        shape: The width and height of the axes in pixels
+
+    Returns:
+        The sorted indices of the points to keep
+    """
+    width, height = shape
+    if len(offsets) <= POINTS_PER_PIXEL * width:
+        return np.arange(len(offsets))
+    columns = _bins(offsets[:, 0], min(xlim), max(xlim), width + 2)
+    rows = _bins(offsets[:, 1], min(ylim), max(ylim), height + 2)
+    cells = columns * (height + 2) + rows
+    _, last = np.unique(cells[::-1], return_index=True)
+    return np.sort(len(offsets) - 1 - last)
+
+
+def _pixels(ax: "Axes") -> Tuple[int, int]:
+    return max(int(ax.bbox.width), 1), max(int(ax.bbox.height), 1)
+
+
+def _decimate_line(line: "Line2D", method: str, x: np.ndarray, y: np.ndarray):
+    lo, hi = sorted(line.axes.get_xlim())
+    # Keep one point on each side of the view so the line reaches the border
+    start = max(int(np.searchsorted(x, lo)) - 1, 0)
+    end = int(np.searchsorted(x, hi, side="right")) + 1
+    x, y = x[start:end], y[start:end]
+    # Bin in screen space, for example on log scales
+    scaled = line.axes.xaxis.get_transform().transform(x)
+    keep = _LINE_METHODS[method](scaled, y, _pixels(line.axes)[0])
+    line.set_data(x[keep], y[keep])
+
+
+def _decimate_scatter(collection: "PathCollection", offsets: np.ndarray, per_point):
+    ax = collection.axes
+    keep = thin_points(offsets, ax.get_xlim(), ax.get_ylim(), _pixels(ax))
+    collection.set_offsets(offsets[keep])
+    for name, values in per_point.items():
+        getattr(collection, f"set_{name}")(values[keep])
+
+
+def _update(artist: "Artist"):
+    from matplotlib.lines import Line2D  # pylint: disable=import-outside-toplevel
+
+    method, full_data = getattr(artist, _DECIMATION)
+    if isinstance(artist, Line2D):
+        _decimate_line(artist, method, *full_data)
+    else:
+        _decimate_scatter(artist, *full_data)
+
+
+def _on_limits_changed(ax: "Axes"):
+    for artist in list(ax.lines) + list(ax.collections):
+        if getattr(artist, _DECIMATION, None) is not None:
+            _update(artist)
+
+
+def _watch(ax: "Axes"):
+    """Decimate the artists of ``ax`` again when its limits change."""
+    if getattr(ax, _CALLBACKS, None) is None:
+        setattr(
+            ax,
+            _CALLBACKS,
+            [
+                ax.callbacks.connect("xlim_changed", _on_limits_changed),
+                ax.callbacks.connect("ylim_changed", _on_limits_changed),
+            ],
+        )
+
+
+def decimate_line(line: "Line2D", method: str = "minmax") -> bool:
+    """Replace the data of ``line`` by a decimated version if it is large.
+
+    Returns:
+        Whether the line is decimated
+    """
+    xy = line.get_xydata()
+    x, y = np.array(xy[:, 0]), np.array(xy[:, 1])
+    if len(x) <= POINTS_PER_PIXEL * _pixels(line.axes)[0]:
+        return False
+    if not np.all(np.isfinite(y)) or np.any(np.diff(x) < 0):
+        logger.debug("Not decimating a line with NaNs or unsorted x values")
+        return False
+    setattr(line, _DECIMATION, (method, (x, y)))
+    _watch(line.axes)
+    _update(line)
+    return True
+
+
+def decimate_scatter(collection: "PathCollection") -> bool:
+    """Keep only the topmost point of each pixel of ``collection``.
+
+    Returns:
+        Whether the collection is decimated
+    """
+    offsets = np.asarray(collection.get_offsets())
+    if len(offsets) <= POINTS_PER_PIXEL * _pixels(collection.axes)[0]:
+        return False
+    per_point = {
+        name: np.asarray(values)
+        for name, values in (
+            ("array", collection.get_array()),
+            ("sizes", collection.get_sizes()),
+            ("facecolor", collection.get_facecolor()),
+            ("edgecolor", collection.get_edgecolor()),
+            ("linewidth", collection.get_linewidth()),
+        )
+        if values is not None and len(values) == len(offsets)
+    }
+    setattr(collection, _DECIMATION, (None, (offsets, per_point)))
+    _watch(collection.axes)
+    _update(collection)
+    return True
+
+
+@contextlib.contextmanager
+def decimating(method: str = "minmax") -> Iterator[None]:
+    """Decimate the artists created by ``Axes.plot`` and ``Axes.scatter``.
+
+    Args:
+        method: How to decimate lines, one of :data:`DECIMATION_METHODS`
+
+    Raises:
+        ValueError if the method is unknown
+    """
+    from matplotlib.axes import Axes  # pylint: disable=import-outside-toplevel
+
+    if method not in DECIMATION_METHODS:
+        raise ValueError(f"Unknown decimation {method}, use {DECIMATION_METHODS}")
+
+    plot, scatter = Axes.plot, Axes.scatter
+
+    def decimated_plot(self, *args, **kwargs):
+        lines = plot(self, *args, **kwargs)
+        for line in lines:
+            decimate_line(line, method)
+        return lines
+
+    def decimated_scatter(self, *args, **kwargs):
+        collection = scatter(self, *args, **kwargs)
+        decimate_scatter(collection)
+        return collection
+
+    Axes.plot, Axes.scatter = decimated_plot, decimated_scatter
+    try:
+        yield
+    finally:
+        Axes.plot, Axes.scatter = plot, scatter
+
+
+@contextlib.contextmanager
+def undecimated(fig) -> Iterator[None]:
+    """Give the decimated artists of ``fig`` their full data back in the block.
+
+    So that ``update_figure`` reads and replaces the full data of the artists.
+    They are decimated again after the block, with the data they have then.
+    """
+    from matplotlib.lines import Line2D  # pylint: disable=import-outside-toplevel
+
+    decimated = [
+        (artist, getattr(artist, _DECIMATION))
+        for ax in fig.axes
+        for artist in list(ax.lines) + list(ax.collections)
+        if getattr(artist, _DECIMATION, None) is not None
+    ]
+    for artist, (_, full_data) in decimated:
+        setattr(artist, _DECIMATION, None)
+        if isinstance(artist, Line2D):
+            artist.set_data(*full_data)
+        else:
+            offsets, per_point = full_data
+            artist.set_offsets(offsets)
+            for name, values in per_point.items():
+                getattr(artist, f"set_{name}")(values)
+    try:
+        yield
+    finally:
+        for artist, (method, _) in decimated:
+            if isinstance(artist, Line2D):
+                decimate_line(artist, method)
+            else:
+                decimate_scatter(artist)
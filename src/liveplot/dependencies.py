@@ -0,0 +1,347 @@
+"""Static analysis of the dependencies of the user functions.
+
+:class:`DependencyAnalyzer` parses the plotting script and finds, for each
+function, the transitive set of top-level definitions it refers to: helper
+functions, classes, constants and imports. Imports of sibling modules (files
+next to the script) are followed, at the function level for
+``from helper import f`` and at the module level for ``import helper``,
+including the imports made inside functions to keep the startup fast.
+
+The hash of a function (see :meth:`DependencyAnalyzer.hash`) covers all those
+definitions, so editing a helper invalidates exactly the functions that use it.
+Definitions are compared through their AST, so comments and formatting
+changes do not count as changes.
+
+The hashes do not depend on where the script is, so that identical functions
+of different scripts share their results, unless the function uses the
+identity of its module (``__file__``, ``__name__``, ...), for example to read
+``Path(__file__).parent / "data.txt"``: its hash then covers the path of the
+module too.
+"""
+
+import ast
+import hashlib
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger("liveplot.dependencies")
+
+# Names whose value depends on where the module is
+_MODULE_IDENTITY = frozenset(
+    [
+        "__file__",
+        "__name__",
+        "__spec__",
+        "__loader__",
+        "__path__",
+        "__cached__",
+        "__package__",
+    ]
+)
+
+
+def _referenced_names(node: ast.AST) -> Set[str]:
+    """Names read anywhere in ``node``, an over-approximation of its free names."""
+    names = set()
+    for child in ast.walk(node):
+        if isinstance(child, ast.Name) and isinstance(child.ctx, ast.Load):
+            names.add(child.id)
+        elif isinstance(child, ast.Attribute) and isinstance(child.value, ast.Name):
+            names.add(child.value.id)
+    return names
+
+
+def _eager_names(stmt: ast.stmt) -> Set[str]:
+    """Names read when ``stmt`` is executed, outside of the function bodies.
+
+    The decorators and default values of functions, and the bases and body
+    of classes, are evaluated when they are defined.
+    """
+    if isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        evaluated: List[ast.AST] = [*stmt.decorator_list, *stmt.args.defaults]
+        evaluated.extend(node for node in stmt.args.kw_defaults if node is not None)
+        return set().union(*(_referenced_names(node) for node in evaluated))
+    if isinstance(stmt, ast.ClassDef):
+        names = set().union(
+            *(
+                _referenced_names(node)
+                for node in [*stmt.decorator_list, *stmt.bases, *stmt.keywords]
+            )
+        )
+        for child in stmt.body:
+            names.update(_eager_names(child))
+        return names
+    return _referenced_names(stmt)
+
+
+def _bound_names(stmt: ast.stmt) -> Set[str]:
+    """Top-level names bound by the statement ``stmt``."""
+    if isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        return {stmt.name}
+    if isinstance(stmt, (ast.Import, ast.ImportFrom)):
+        return {
+            alias.asname if alias.asname else alias.name.split(".")[0]
+            for alias in stmt.names
+            if alias.name != "*"
+        }
+
+    names = set()
+    for child in ast.walk(stmt):
+        if isinstance(child, ast.Name) and isinstance(child.ctx, ast.Store):
+            names.add(child.id)
+        elif isinstance(
+            child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+        ) and (child is not stmt):
+            names.add(child.name)
+    return names
+
+
+def resolve_local_module(directory: Path, module_name: str) -> Optional[Path]:
+    """The file of ``module_name`` if it is a module next to the script."""
+    base = directory.joinpath(*module_name.split("."))
+    for candidate in (base.with_suffix(".py"), base / "__init__.py"):
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+class ModuleAnalysis:
+    """Top-level definitions of a module and the names each one refers to.
+
+    Args:
+        file_path: The file the source was read from, to resolve local imports
+        source: The source code of the module
+
+    Raises:
+        SyntaxError if the source cannot be parsed.
+    """
+
+    def __init__(self, file_path: Path, source: str):
+        self.file_path = file_path
+        self.source_hash = hashlib.sha256(source.encode("utf8")).hexdigest()
+        self.tree = ast.parse(source, filename=str(file_path))
+        self.line_count = len(source.splitlines())
+        # The dump of each top-level statement, without positions
+        self.statements: List[str] = []
+
+        self.definitions: Dict[str, List[str]] = {}
+        self.references: Dict[str, Set[str]] = {}
+        # Bound name -> (file of the local module, imported name or None)
+        self.local_imports: Dict[str, Tuple[Path, Optional[str]]] = {}
+        # Function or class -> the local modules imported in its body, as above
+        self.nested_imports: Dict[str, List[Tuple[Path, Optional[str]]]] = {}
+        # Names read while the module is executed, see _eager_names
+        self.eager_references: Set[str] = set()
+
+        for stmt in self.tree.body:
+            self._add_statement(stmt)
+        # Whether the module reads its own identity anywhere
+        self.uses_identity = bool(_referenced_names(self.tree) & _MODULE_IDENTITY)
+
+    def _add_statement(self, stmt: ast.stmt):
+        dumped = ast.dump(stmt)
+        self.statements.append(dumped)
+        references = _referenced_names(stmt)
+        self.eager_references.update(_eager_names(stmt))
+        for name in _bound_names(stmt):
+            self.definitions.setdefault(name, []).append(dumped)
+            self.references.setdefault(name, set()).update(references - {name})
+
+        for bound, local_file, imported in self._imports(stmt):
+            self.local_imports[bound] = (local_file, imported)
+        if isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            self.nested_imports[stmt.name] = [
+                (local_file, imported)
+                for node in ast.walk(stmt)
+                for _, local_file, imported in self._imports(node)
+            ]
+
+    def _imports(self, node: ast.AST) -> List[Tuple[str, Path, Optional[str]]]:
+        """The local modules imported by ``node``, if it is an import statement.
+
+        Returns:
+            The bound name, the file of the local module and the imported name
+            (``None`` for ``import module``) of each import
+        """
+        imports = []
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                local_file = resolve_local_module(self.file_path.parent, alias.name)
+                if local_file is not None:
+                    bound = alias.asname if alias.asname else alias.name.split(".")[0]
+                    imports.append((bound, local_file, None))
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            local_file = resolve_local_module(self.file_path.parent, node.module)
+            if local_file is not None:
+                for alias in node.names:
+                    if alias.name != "*":
+                        bound = alias.asname if alias.asname else alias.name
+                        imports.append((bound, local_file, alias.name))
+        return imports
+
+    def module_names(self) -> Set[str]:
+        """Names under which local modules are imported, as in ``sys.modules``.
+
+        Includes the modules imported inside functions.
+        """
+        names = set()
+        for node in ast.walk(self.tree):
+            if isinstance(node, ast.Import):
+                names.update(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                names.add(node.module)
+        return {
+            name
+            for name in names
+            if resolve_local_module(self.file_path.parent, name) is not None
+        }
+
+
+class DependencyAnalyzer:
+    """Hash functions of a module together with everything they depend on.
+
+    The files are read when :meth:`update` is called, and the hashes describe
+    the sources at that time. Unchanged files are not parsed again.
+
+    Args:
+        file_path: The plotting script
+    """
+
+    def __init__(self, file_path: Path):
+        self.file_path = file_path
+        self._analyses: Dict[Path, ModuleAnalysis] = {}
+        self._previous: Dict[Path, ModuleAnalysis] = {}
+
+    def update(self) -> None:
+        """Read the script and the local modules it imports from disk.
+
+        Raises:
+            SyntaxError if the script cannot be parsed.
+        """
+        self._previous, self._analyses = self._analyses, {}
+        self.analysis(self.file_path)
+        self.local_files()
+        self._previous = {}
+
+    def analysis(self, file_path: Path) -> ModuleAnalysis:
+        """The analysis of ``file_path`` as of the last :meth:`update`.
+
+        Raises:
+            OSError if the file cannot be read
+            SyntaxError if the file cannot be parsed.
+        """
+        if file_path not in self._analyses:
+            source = file_path.read_text(encoding="utf8")
+            previous = self._previous.get(file_path)
+            source_hash = hashlib.sha256(source.encode("utf8")).hexdigest()
+            if previous is not None and previous.source_hash == source_hash:
+                self._analyses[file_path] = previous
+            else:
+                logger.debug(f"Analysing dependencies in {file_path}")
+                self._analyses[file_path] = ModuleAnalysis(file_path, source)
+        return self._analyses[file_path]
+
+    def _collect(
+        self,
+        file_path: Path,
+        name: Optional[str],
+        parts: List[str],
+        files: Set[Path],
+        visited: Set[Tuple[Path, Optional[str]]],
+    ) -> None:
+        """Accumulate the definitions ``name`` depends on in ``file_path``.
+
+        If ``name`` is ``None``, the whole module is a dependency.
+        """
+        if (file_path, name) in visited:
+            return
+        visited.add((file_path, name))
+        files.add(file_path)
+
+        try:
+            analysis = self.analysis(file_path)
+        except (OSError, SyntaxError) as exc:
+            parts.append(f"{file_path}:unreadable:{exc}")
+            return
+
+        label = self._label(file_path)
+        if name is None:
+            parts.append(f"{label}:{analysis.source_hash}")
+            if analysis.uses_identity:
+                parts.append(f"{file_path.resolve()}:identity")
+            imports = list(analysis.local_imports.values())
+            for nested in analysis.nested_imports.values():
+                imports.extend(nested)
+            for local_file, imported in imports:
+                self._collect(local_file, imported, parts, files, visited)
+            return
+
+        pending = [name]
+        seen = set()
+        while pending:
+            current = pending.pop()
+            if current in seen:
+                continue
+            seen.add(current)
+
+            if current in analysis.local_imports:
+                local_file, imported = analysis.local_imports[current]
+                self._collect(local_file, imported, parts, files, visited)
+            for local_file, imported in analysis.nested_imports.get(current, []):
+                self._collect(local_file, imported, parts, files, visited)
+            for definition in analysis.definitions.get(current, []):
+                parts.append(f"{label}:{current}:{definition}")
+            if current in _MODULE_IDENTITY and current not in analysis.definitions:
+                parts.append(f"{file_path.resolve()}:{current}")
+            pending.extend(analysis.references.get(current, set()))
+
+    def _label(self, file_path: Path) -> str:
+        """Name of ``file_path`` in hashes, independent of where the script is.
+
+        So that identical functions in different scripts have the same hash,
+        unless they use the identity of their module (see the module doc).
+        """
+        if file_path == self.file_path:
+            return "<script>"
+        try:
+            return os.path.relpath(file_path, self.file_path.parent)
+        except ValueError:  # On another drive
+            return str(file_path)
+
+    def dependencies(self, name: str) -> Tuple[List[str], Set[Path]]:
+        """The definitions and the files the function ``name`` depends on."""
+        parts: List[str] = []
+        files: Set[Path] = set()
+        self._collect(self.file_path, name, parts, files, set())
+        return parts, files
+
+    def is_defined(self, name: str) -> bool:
+        """Whether ``name`` is defined at the top level of the script."""
+        try:
+            return name in self.analysis(self.file_path).definitions
+        except (OSError, SyntaxError):
+            return False
+
+    def hash(self, name: str) -> str:
+        """Hash of ``name`` and all the definitions it transitively depends on."""
+        parts, _ = self.dependencies(name)
+        digest = hashlib.sha256()
+        for part in sorted(parts):
+            digest.update(part.encode("utf8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def local_files(self) -> Set[Path]:
+        """The script and all the local modules it transitively imports."""
+        files: Set[Path] = set()
+        self._collect(self.file_path, None, [], files, set())
+        return files
+
+    def local_module_names(self) -> Set[str]:
+        """``sys.modules`` names of the local modules imported by the script."""
+        names = set()
+        for file_path in self.local_files():
+            names.update(self.analysis(file_path).module_names())
+        return names
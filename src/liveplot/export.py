@@ -0,0 +1,286 @@
+"""Write the figures in several formats and resolutions, with ``--export DIR``.
+
+Each time a figure is redrawn, the figure built by ``make_figure`` is written
+to ``DIR`` in each of the ``--export-formats``, such as
+``png@150,png@300,pdf,svg`` (``format@dpi``, the dpi of the figure by
+default). A format with a dpi is written to ``<stem>-<dpi>dpi.<format>``, and
+otherwise to ``<stem>.<format>``. With ``--once``, liveplot exits once the
+figures are drawn and exported, to export figures in one command.
+
+``make_figure`` is not run again for each format, and raster formats of the
+same resolution (``png@300,jpg@300``) are rendered once and encoded several
+times. The renderings are made in the liveplot process by default. With
+``--jobs N`` and at least 4 renderings, the figure is pickled once and
+rendered by a pool of ``N`` worker processes instead, one rendering per task,
+while the figure stays responsive: below that, pickling the figure and
+starting the workers cost more than they save (see
+``benchmarks/test_export.py``). Figures that cannot be pickled (for example
+with artists of classes defined in the script) are rendered in the liveplot
+process. The workers render with the rcParams of the liveplot process at the time of the
+export (``savefig.*`` set by ``settings``, ...), sent along with the figure.
+
+The animated artists of ``--blit`` are included, ``savefig`` skips them
+otherwise. Files are written to a temporary file and renamed, and the files
+of an export superseded by a newer one are not written.
+"""
+import concurrent.futures
+import contextlib
+import functools
+import importlib
+import io
+import logging
+import multiprocessing
+import os
+import pickle
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import matplotlib
+import numpy as np
+
+logger = logging.getLogger("liveplot.export")
+
+# Encoded from the same rendering when they have the same resolution
+_RASTER_FORMATS = ("png", "jpg", "jpeg", "tif", "tiff", "webp")
+# Fewer renderings are faster in this process than pickled to the workers
+POOL_MIN_RENDERINGS = 4
+
+
+class ExportFormat(NamedTuple):
+    """A file format, and the resolution to render it at for raster formats."""
+
+    format: str
+    dpi: Optional[float] = None
+
+    def file_name(self, stem: str) -> str:
+        if self.dpi is None:
+            return f"{stem}.{self.format}"
+        return f"{stem}-{self.dpi:g}dpi.{self.format}"
+
+
+def parse_formats(spec: str) -> List[ExportFormat]:
+    """The formats of ``spec``, such as ``png@150,png@300,pdf,svg``.
+
+    Raises:
+        ValueError if a format is not supported by matplotlib or a dpi is not
+        a positive number.
+    """
+    # pylint: disable-next=import-outside-toplevel
+    from matplotlib.backend_bases import FigureCanvasBase
+
+    formats = []
+    for item in spec.split(","):
+        name, _, dpi = item.strip().lower().partition("@")
+        if name not in FigureCanvasBase.get_supported_filetypes():
+            raise ValueError(f"Unsupported export format '{name}'")
+        try:
+            resolution = float(dpi) if dpi else None
+        except ValueError as exc:
+            raise ValueError(f"Invalid dpi '{dpi}' for {name}") from exc
+        if resolution is not None and resolution <= 0:
+            raise ValueError(f"Invalid dpi '{dpi}' for {name}")
+        formats.append(ExportFormat(name, resolution))
+    return list(dict.fromkeys(formats))
+
+
+def group_formats(formats: List[ExportFormat]) -> List[List[ExportFormat]]:
+    """The formats rendered by each task: raster formats of the same dpi together."""
+    groups: Dict[object, List[ExportFormat]] = {}
+    for export_format in formats:
+        if export_format.format in _RASTER_FORMATS:
+            key: object = export_format.dpi
+        else:
+            key = export_format
+        groups.setdefault(key, []).append(export_format)
+    return list(groups.values())
+
+
+@contextlib.contextmanager
+def _unanimated(fig):
+    """Draw the animated artists of ``fig`` like the others in the block."""
+    artists = fig.findobj(lambda artist: artist.get_animated())
+    for artist in artists:
+        artist.set_animated(False)
+    try:
+        yield
+    finally:
+        for artist in artists:
+            artist.set_animated(True)
+
+
+def _can_reuse_rendering() -> bool:
+    """Whether ``savefig`` renders like a draw of the canvas, with the rcParams."""
+    rc_params = matplotlib.rcParams
+    return (
+        rc_params["savefig.bbox"] != "tight"
+        and rc_params["savefig.facecolor"] == "auto"
+        and rc_params["savefig.edgecolor"] == "auto"
+        and not rc_params["savefig.transparent"]
+    )
+
+
+def _render_raster(fig, formats: List[ExportFormat]) -> Dict[str, bytes]:
+    """Render ``fig`` once and encode it in each of the raster ``formats``."""
+    # pylint: disable=import-outside-toplevel
+    import matplotlib.image
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    canvas, dpi = fig.canvas, fig.dpi
+    try:
+        fig.dpi = formats[0].dpi or dpi
+        agg = FigureCanvasAgg(fig)
+        agg.draw()
+        pixels = np.asarray(agg.buffer_rgba())
+        images = {}
+        for export_format in formats:
+            buffer = io.BytesIO()
+            matplotlib.image.imsave(
+                buffer, pixels, format=export_format.format, dpi=fig.dpi
+            )
+            images[export_format.file_name("{stem}")] = buffer.getvalue()
+        return images
+    finally:
+        fig.dpi = dpi
+        fig.set_canvas(canvas)
+
+
+def render(fig, formats: List[ExportFormat]) -> Dict[str, bytes]:
+    """Render ``fig`` in each of ``formats``.
+
+    Returns:
+        The content of each file, by file name with ``{stem}`` for the stem
+    """
+    with _unanimated(fig):
+        if len(formats) > 1 and _can_reuse_rendering():
+            return _render_raster(fig, formats)
+        images = {}
+        for export_format in formats:
+            buffer = io.BytesIO()
+            fig.savefig(
+                buffer,
+                format=export_format.format,
+                dpi=export_format.dpi or "figure",
+            )
+            images[export_format.file_name("{stem}")] = buffer.getvalue()
+        return images
+
+
+def _rc_params() -> Dict[str, Any]:
+    """The rcParams of this process, to render the same in the workers."""
+    return {
+        key: value for key, value in matplotlib.rcParams.items() if key != "backend"
+    }
+
+
+def _init_worker():
+    """Import the rendering backends when the worker process starts."""
+    matplotlib.use("agg")
+    for module in ["matplotlib.pyplot", "matplotlib.backends.backend_pdf"]:
+        importlib.import_module(module)
+
+
+def _render_pickled(
+    figure: bytes, formats: List[ExportFormat], rc_params: Dict[str, Any]
+) -> Dict[str, bytes]:
+    """Entry point of the worker processes, see :func:`render`.
+
+    Args:
+        figure: The pickled figure
+        formats: The formats to render it in
+        rc_params: The rcParams to render it with, see :func:`_rc_params`
+    """
+    with matplotlib.rc_context(rc_params):
+        return render(pickle.loads(figure), formats)
+
+
+class Exporter:
+    """Write figures to ``directory`` in each of ``formats``, see the module doc.
+
+    Args:
+        directory: Where to write the files, created if needed
+        formats: As returned by :func:`parse_formats`
+        workers: How many worker processes render the formats when there are
+            at least :data:`POOL_MIN_RENDERINGS` renderings, 1 to render them
+            in this process
+    """
+
+    def __init__(self, directory: Path, formats: List[ExportFormat], workers: int = 1):
+        self.directory = Path(directory)
+        self.formats = formats
+        self._groups = group_formats(formats)
+        self._executor: Optional[concurrent.futures.Executor] = None
+        if workers > 1 and len(self._groups) >= POOL_MIN_RENDERINGS:
+            # Not forked, the children of a GUI process must not touch its
+            # backend. The workers import matplotlib while the data loads.
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=min(workers, len(self._groups)),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+            for _ in range(min(workers, len(self._groups))):
+                self._executor.submit(int)
+        self._generation: Dict[str, int] = {}
+        self._futures: List[concurrent.futures.Future] = []
+
+    def export(self, fig, stem: str) -> None:
+        """Write ``fig`` as ``<stem>.<format>``, in the background if possible.
+
+        Exports of the same ``stem`` still running are superseded.
+        """
+        generation = self._generation.get(stem, 0) + 1
+        self._generation[stem] = generation
+        self.directory.mkdir(parents=True, exist_ok=True)
+        figure = None
+        if self._executor is not None:
+            try:
+                with _unanimated(fig):
+                    figure = pickle.dumps(fig)
+            except Exception as exc:  # pylint: disable=broad-except
+                logger.debug(f"Exporting {stem} in this process, as: {exc}")
+
+        if figure is None:
+            for formats in self._groups:
+                self._write(stem, generation, render(fig, formats))
+            return
+
+        self._futures = [future for future in self._futures if not future.done()]
+        rc_params = _rc_params()
+        for formats in self._groups:
+            future = self._executor.submit(_render_pickled, figure, formats, rc_params)
+            future.add_done_callback(functools.partial(self._written, stem, generation))
+            self._futures.append(future)
+
+    def _written(self, stem: str, generation: int, future: concurrent.futures.Future):
+        if future.cancelled():
+            return
+        try:
+            images = future.result()
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.error(f"Could not export {stem}: {exc}")
+            return
+        self._write(stem, generation, images)
+
+    def _write(self, stem: str, generation: int, images: Dict[str, bytes]):
+        if self._generation.get(stem) != generation:
+            return
+        for name, content in images.items():
+            path = self.directory / name.format(stem=stem)
+            tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+            try:
+                tmp_path.write_bytes(content)
+                os.replace(tmp_path, path)
+            finally:
+                if tmp_path.exists():
+                    tmp_path.unlink()
+            logger.info(f"Exported {path}")
+
+    def wait(self) -> None:
+        """Wait for the exports in progress."""
+        concurrent.futures.wait(self._futures)
+        self._futures = []
+
+    def close(self) -> None:
+        """Wait for the exports in progress and stop the worker processes."""
+        self.wait()
+        if self._executor is not None:
+            self._executor.shutdown()
@@ -0,0 +1,282 @@
+"""Notifications when the watched files change on disk.
+
+Two backends are available. :class:`InotifyWatcher` asks the Linux kernel to
+report writes, so an idle session does not touch the filesystem at all.
+:class:`PollingWatcher` compares ``stat`` results and works everywhere.
+
+Both watch the parent directory of the files rather than the files themselves,
+so that editors that save by writing a temporary file and renaming it over the
+original are detected. Bursts of events (atomic rename, truncate-then-write,
+swap files) are coalesced: :meth:`FileWatcher.poll` reports a change only once
+the files have been quiet for ``debounce`` seconds.
+"""
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+logger = logging.getLogger("liveplot.file_watcher")
+
+WATCHER_BACKENDS = ("auto", "inotify", "poll")
+
+DEFAULT_DEBOUNCE = 0.01
+DEFAULT_POLL_INTERVAL = 0.25
+
+
+class FileWatcher:
+    """Base class for the watcher backends.
+
+    Subclasses implement :meth:`_wait_for_events`, which blocks for at most
+    ``timeout`` seconds and returns whether one of the watched files was touched.
+
+    Args:
+        paths: The files to watch
+        debounce: Quiet period (seconds) required before reporting a change
+    """
+
+    def __init__(self, paths: Iterable[Path], debounce: float = DEFAULT_DEBOUNCE):
+        self.debounce = debounce
+        self._paths: Set[Path] = set()
+        self._last_event: Optional[float] = None
+        for path in paths:
+            self.add_path(path)
+
+    def add_path(self, path: Path) -> None:
+        """Start watching ``path``. Does nothing if it is already watched."""
+        path = Path(path).absolute()
+        if path not in self._paths:
+            logger.debug(f"Watching {path}")
+            self._paths.add(path)
+            self._watch(path)
+
+    @property
+    def paths(self) -> Set[Path]:
+        return set(self._paths)
+
+    def _watch(self, path: Path) -> None:
+        pass
+
+    def _wait_for_events(self, timeout: float) -> bool:
+        raise NotImplementedError
+
+    def poll(self, timeout: float = 0.0) -> bool:
+        """Whether the watched files changed and have since settled.
+
+        Waits up to ``timeout`` seconds for a change to happen and settle.
+        Returns ``True`` at most once per burst of events.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            now = time.monotonic()
+            if self._last_event is not None:
+                quiet_for = now - self._last_event
+                if quiet_for >= self.debounce:
+                    self._last_event = None
+                    return True
+                wait = self.debounce - quiet_for
+            else:
+                wait = max(0.0, deadline - now)
+
+            if self._wait_for_events(wait):
+                self._last_event = time.monotonic()
+            elif self._last_event is None and time.monotonic() >= deadline:
+                return False
+
+    def close(self) -> None:
+        pass
+
+
+class PollingWatcher(FileWatcher):
+    """Detect changes by comparing ``st_mtime_ns`` and ``st_size``.
+
+    Args:
+        paths: The files to watch
+        debounce: Quiet period (seconds) required before reporting a change
+        interval: Minimum time (seconds) between two calls to ``stat``
+    """
+
+    def __init__(
+        self,
+        paths: Iterable[Path],
+        debounce: float = DEFAULT_DEBOUNCE,
+        interval: float = DEFAULT_POLL_INTERVAL,
+    ):
+        self.interval = interval
+        self._stats: Dict[Path, Optional[Tuple[int, int]]] = {}
+        self._last_check = 0.0
+        super().__init__(paths, debounce=debounce)
+        # Allow settling bursts to be detected at the debounce resolution
+        self.debounce = max(self.debounce, self.interval)
+
+    @staticmethod
+    def _stat(path: Path) -> Optional[Tuple[int, int]]:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _watch(self, path: Path) -> None:
+        self._stats[path] = self._stat(path)
+
+    def _wait_for_events(self, timeout: float) -> bool:
+        next_check = self._last_check + self.interval
+        now = time.monotonic()
+        if now < next_check:
+            time.sleep(min(timeout, next_check - now))
+            if time.monotonic() < next_check:
+                return False
+
+        self._last_check = time.monotonic()
+        changed = False
+        for path, previous in self._stats.items():
+            current = self._stat(path)
+            if current != previous:
+                self._stats[path] = current
+                changed = True
+        return changed
+
+
+class _Inotify:
+    """Minimal ``ctypes`` binding to the inotify API of the Linux libc."""
+
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    MASK = (
+        IN_MODIFY
+        | IN_ATTRIB
+        | IN_CLOSE_WRITE
+        | IN_MOVED_FROM
+        | IN_MOVED_TO
+        | IN_CREATE
+        | IN_DELETE
+    )
+
+    EVENT_HEADER = struct.Struct("iIII")
+
+    _libc = None
+
+    @classmethod
+    def libc(cls):
+        if cls._libc is None:
+            if not sys.platform.startswith("linux"):
+                raise OSError("inotify is only available on Linux")
+            libc = ctypes.CDLL(
+                ctypes.util.find_library("c") or "libc.so.6", use_errno=True
+            )
+            if not hasattr(libc, "inotify_init1"):
+                raise OSError("The C library does not provide inotify")
+            cls._libc = libc
+        return cls._libc
+
+    @classmethod
+    def is_available(cls) -> bool:
+        try:
+            cls.libc()
+        except OSError:
+            return False
+        return True
+
+
+class InotifyWatcher(FileWatcher):
+    """Detect changes through inotify events on the parent directories.
+
+    Only events on the names of the watched files are reported, so writes to
+    swap and backup files in the same directory are ignored.
+
+    Raises:
+        OSError if inotify is not available.
+    """
+
+    def __init__(self, paths: Iterable[Path], debounce: float = DEFAULT_DEBOUNCE):
+        libc = _Inotify.libc()
+        self._fd = libc.inotify_init1(_Inotify.IN_NONBLOCK | _Inotify.IN_CLOEXEC)
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"inotify_init1 failed: {os.strerror(errno)}")
+        self._watch_descriptors: Dict[int, Path] = {}
+        self._names: Dict[Path, Set[str]] = {}
+        super().__init__(paths, debounce=debounce)
+
+    def _watch(self, path: Path) -> None:
+        directory = path.parent
+        if directory not in self._names:
+            wd = _Inotify.libc().inotify_add_watch(
+                self._fd, os.fsencode(str(directory)), _Inotify.MASK
+            )
+            if wd < 0:
+                errno = ctypes.get_errno()
+                raise OSError(errno, f"Cannot watch {directory}: {os.strerror(errno)}")
+            self._watch_descriptors[wd] = directory
+            self._names[directory] = set()
+        self._names[directory].add(path.name)
+
+    def _read_events(self) -> bool:
+        try:
+            buffer = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return False
+
+        relevant = False
+        offset = 0
+        header = _Inotify.EVENT_HEADER
+        while offset < len(buffer):
+            wd, _, _, length = header.unpack_from(buffer, offset)
+            offset += header.size
+            name = os.fsdecode(buffer[offset : offset + length].rstrip(b"\0"))
+            offset += length
+            directory = self._watch_descriptors.get(wd)
+            if directory is not None and name in self._names[directory]:
+                relevant = True
+        return relevant
+
+    def _wait_for_events(self, timeout: float) -> bool:
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        return bool(ready) and self._read_events()
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def make_file_watcher(
+    paths: Iterable[Path],
+    backend: str = "auto",
+    debounce: float = DEFAULT_DEBOUNCE,
+) -> FileWatcher:
+    """Create a watcher for ``paths`` using the requested backend.
+
+    Args:
+        paths: The files to watch
+        backend: One of ``"auto"``, ``"inotify"`` or ``"poll"``. ``"auto"`` uses
+            inotify if available and falls back to polling otherwise.
+        debounce: Quiet period (seconds) required before reporting a change
+
+    Raises:
+        ValueError if the backend is unknown
+        OSError if the ``"inotify"`` backend was requested but is not available
+    """
+    if backend not in WATCHER_BACKENDS:
+        raise ValueError(f"Unknown watcher backend {backend}, use {WATCHER_BACKENDS}")
+
+    if backend == "inotify" or (backend == "auto" and _Inotify.is_available()):
+        logger.debug("Using the inotify file watcher")
+        return InotifyWatcher(paths, debounce=debounce)
+
+    logger.debug("Using the polling file watcher")
+    return PollingWatcher(paths, debounce=debounce)
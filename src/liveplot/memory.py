@@ -0,0 +1,136 @@
+"""Keep the data held by a session under a memory budget.
+
+A :class:`~liveplot.plot_watcher.PlotWatcher` holds the result of
+``load_data``, the result of ``postprocess`` (or of each stage), and often
+both are large. With a :class:`MemoryBudget`, when the NumPy arrays held in
+memory exceed the budget, results are spilled one by one: they are written
+to disk (see :func:`liveplot.cache.dump`) and replaced by memory-mapped
+copies. The pages of a spilled array are read back lazily when the array is
+used, and the operating system can drop them again when memory is short.
+
+The result of ``load_data`` is spilled first, as it is only needed again when
+``postprocess`` changes. If it is in the on-disk cache, the cached copy is
+mapped instead of writing it again.
+
+Only NumPy arrays (in lists, tuples and dicts) are counted and spilled. Other
+objects are left in memory, and so are the results shared with other scripts
+through a :class:`~liveplot.data_store.DataStore`, which may be using them.
+"""
+import logging
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Collection, Dict, Optional, Set
+
+import numpy as np
+
+from liveplot import cache as disk
+
+logger = logging.getLogger("liveplot.memory")
+
+
+def _memory_arrays(obj: Any, seen: Set[int]) -> int:
+    if isinstance(obj, np.ndarray):
+        base = obj
+        while isinstance(base.base, np.ndarray):
+            base = base.base
+        if isinstance(base, np.memmap) or id(base) in seen:
+            return 0
+        seen.add(id(base))
+        return base.nbytes
+    if isinstance(obj, (list, tuple)):
+        return sum(_memory_arrays(item, seen) for item in obj)
+    if isinstance(obj, dict):
+        return sum(_memory_arrays(item, seen) for item in obj.values())
+    return 0
+
+
+def resident_size(*objs: Any) -> int:
+    """Size in bytes of the NumPy arrays in ``objs`` that are held in memory.
+
+    Arrays sharing memory are counted once, memory-mapped arrays are not
+    counted.
+    """
+    seen: Set[int] = set()
+    return sum(_memory_arrays(obj, seen) for obj in objs)
+
+
+class MemoryBudget:
+    """Spill results to memory-mapped files when over budget.
+
+    Args:
+        max_size: The size in bytes of the arrays that can stay in memory
+        directory: Where to write the spilled results, preferably on disk
+            rather than on a tmpfs (default: the temporary directory)
+    """
+
+    def __init__(self, max_size: int, directory: Optional[Path] = None):
+        self.max_size = max_size
+        self.directory = directory
+
+    def spill(self, obj: Any) -> Any:
+        """A copy of ``obj`` whose arrays are memory-mapped from disk.
+
+        The files are removed right away, the mapped arrays keep them alive
+        until they are no longer used.
+
+        Raises:
+            Exception (any) raised by pickle if ``obj`` cannot be pickled.
+        """
+        if self.directory is not None:
+            Path(self.directory).mkdir(parents=True, exist_ok=True)
+        path = Path(tempfile.mkdtemp(prefix=".spill-", dir=self.directory))
+        try:
+            disk.dump(obj, path)
+            return disk.load(path)
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def fit(
+        self,
+        results: Dict[str, Any],
+        mapped: Optional[Dict[str, Callable]] = None,
+        pinned: Collection[str] = (),
+    ) -> Dict[str, Any]:
+        """Spill results until the arrays held in memory fit in the budget.
+
+        Args:
+            results: The results held, by name, in the order to spill them.
+                Results already on disk (see ``mapped``) are spilled first.
+            mapped: For results that are already on disk, a function returning
+                a memory-mapped copy, used instead of writing them again
+            pinned: Results that count towards the budget but are not spilled,
+                such as results shared with other scripts
+
+        Returns:
+            The results, with memory-mapped copies of the spilled ones
+        """
+        results = dict(results)
+        mapped = mapped if mapped is not None else {}
+        held = resident_size(*results.values())
+        if held <= self.max_size:
+            return results
+
+        sizes = {name: resident_size(value) for name, value in results.items()}
+        order = sorted(results, key=lambda name: name not in mapped)
+        for name in order:
+            if held <= self.max_size:
+                break
+            if sizes[name] == 0 or name in pinned:
+                continue
+            try:
+                if name in mapped:
+                    results[name] = mapped[name]()
+                else:
+                    results[name] = self.spill(results[name])
+            except Exception as exc:  # pylint: disable=broad-except
+                logger.warning(f"Could not spill {name} to disk: {exc}")
+                continue
+            logger.info(f"Spilled {name} to disk ({sizes[name] / 2**20:.0f}MB)")
+            held = resident_size(*results.values())
+        if held > self.max_size:
+            logger.warning(
+                f"Holding {held / 2**20:.0f}MB of data, "
+                f"over the memory budget of {self.max_size / 2**20:.0f}MB"
+            )
+        return results
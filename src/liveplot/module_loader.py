@@ -1,9 +1,17 @@
 """Code loading module and utilities."""
+import ast
 import inspect
+import linecache
 import logging
+import os
+import sys
 from importlib.util import module_from_spec, spec_from_file_location
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from liveplot.cache import hash_source
+from liveplot.dependencies import DependencyAnalyzer, ModuleAnalysis
+from liveplot.pipeline import is_stage
 
 logger = logging.getLogger("liveplot.code_loader")
 
@@ -31,6 +39,19 @@ def dummy_settings(plt):
     return None
 
 
+# pylint: disable=missing-docstring
+def dummy_postprocess_chunk(chunk):
+    return chunk
+
+
+# pylint: disable=missing-docstring
+def dummy_combine(data, chunk):
+    if data is None:
+        return [chunk]
+    data.append(chunk)
+    return data
+
+
 possible_patches = {
     "load_data": dummy_load_data,
     "postprocess": dummy_postprocess,
@@ -38,13 +59,26 @@ possible_patches = {
     "make_figure": dummy_make_figure,
 }
 
+# Only used when load_data yields chunks, patched without logging
+optional_patches = {
+    "postprocess_chunk": dummy_postprocess_chunk,
+    "combine": dummy_combine,
+}
+
 
 def _patch_missing_functions(module):
+    for f_name, func in optional_patches.items():
+        if not hasattr(module, f_name):
+            setattr(module, f_name, func)
+
+    # Scripts with stages do not need load_data and postprocess
+    has_stages = any(is_stage(value) for value in vars(module).values())
     patched = []
     for f_name, func in possible_patches.items():
         if not hasattr(module, f_name):
             setattr(module, f_name, func)
-            patched.append(f_name)
+            if not (has_stages and f_name in ("load_data", "postprocess")):
+                patched.append(f_name)
 
     if len(patched) > 0:
         message = (
@@ -88,14 +122,90 @@ def _import_module(file_path: Path):
 
     module = module_from_spec(spec)
 
+    # Make modules next to the script importable, as when running the script.
+    # Other scripts watched in the same process may have local modules with
+    # the same names, so the directory of this one goes first.
+    directory = str(file_path.parent.absolute())
+    if directory in sys.path:
+        sys.path.remove(directory)
+    sys.path.insert(0, directory)
+
     try:
         spec.loader.exec_module(module)
-    except Exception as exc:
+    except (Exception, SystemExit) as exc:
         raise ImportError(f"Could not import module in file '{file_path}'") from exc
 
     return module
 
 
+_DEFINITIONS = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+
+
+def _skeleton(analysis: ModuleAnalysis) -> List[str]:
+    """The top-level code of the module, with definitions reduced to their name."""
+    return [
+        f"def {stmt.name}" if isinstance(stmt, _DEFINITIONS) else dumped
+        for stmt, dumped in zip(analysis.tree.body, analysis.statements)
+    ]
+
+
+def _spans(analysis: ModuleAnalysis) -> List[Tuple[int, int]]:
+    """The first line of each top-level statement and of what follows it."""
+    starts = [stmt.lineno for stmt in analysis.tree.body]
+    return list(zip(starts, starts[1:] + [analysis.line_count + 1]))
+
+
+def changed_definitions(
+    old: ModuleAnalysis, new: ModuleAnalysis
+) -> Optional[List[ast.stmt]]:
+    """The function and class definitions of ``new`` that differ from ``old``.
+
+    Definitions that moved in the file count as changed, so that the line
+    numbers of tracebacks stay right.
+
+    Returns:
+        The changed definitions, or ``None`` if the module has to be imported
+        again: if other top-level code changed (imports, constants, ...),
+        definitions were added, removed or reordered, or a changed definition
+        is used while the module is executed (``FUNCS = [helper]``,
+        ``CONST = helper()``, decorators, default values, ...), since the
+        objects built from it would keep the old definition.
+    """
+    if old is new:
+        return []
+    if _skeleton(old) != _skeleton(new):
+        return None
+    changed = [
+        stmt
+        for stmt, old_dump, new_dump, old_span, new_span in zip(
+            new.tree.body, old.statements, new.statements, _spans(old), _spans(new)
+        )
+        if isinstance(stmt, _DEFINITIONS)
+        and (old_dump != new_dump or old_span != new_span)
+    ]
+    if {stmt.name for stmt in changed} & new.eager_references:
+        return None
+    return changed
+
+
+def _exec_definitions(module, file_path: Path, definitions: List[ast.stmt]):
+    """Execute ``definitions`` in the namespace of ``module``.
+
+    Raises:
+        ImportError if executing a definition raised an exception,
+        for example in a decorator or a default value
+    """
+    code = compile(
+        ast.Module(body=definitions, type_ignores=[]), str(file_path), "exec"
+    )
+    # So that inspect and tracebacks see the new source
+    linecache.checkcache(str(file_path))
+    try:
+        exec(code, module.__dict__)  # pylint: disable=exec-used
+    except (Exception, SystemExit) as exc:
+        raise ImportError(f"Could not import module in file '{file_path}'") from exc
+
+
 class PlottingModuleError(Exception):
     """Base class to wrap exceptions occuring in module code."""
 
@@ -119,36 +229,176 @@ class ModuleLoader:
     ):
         logger.debug(f"Creating CodeLoader for {file_path}")
         self._file_path: Path = file_path
-        self._functions_source_last_exec: Dict[str, Any] = {}
+        self._functions_hash_last_exec: Dict[str, str] = {}
         self._module = None
         self._last_load_attempt: Optional[float] = None
+        self._dependencies = DependencyAnalyzer(file_path)
+        self._dependency_mtimes: Dict[Path, float] = {}
+        # The code of the loaded module, to re-execute only what changed
+        self._loaded_analysis: Optional[ModuleAnalysis] = None
+        self._loaded_sources: Dict[Path, str] = {}
+        self._hashes: Dict[str, str] = {}
 
     def load_module(self) -> None:
         """Load (or reload) the module.
 
+        Local modules imported by the script are re-imported as well,
+        so that changes to them are picked up. If only function or class
+        definitions of the script changed, they are executed again in the
+        loaded module instead, without running the imports and other
+        top-level code again.
+
         Raises:
             ImportError if the module could not be reloaded.
         """
         logger.debug(f"Loading module at {self._file_path}")
         self._last_load_attempt = self._file_path.stat().st_mtime
-        self._module = _import_module(self._file_path)
-        self._module = _patch_missing_functions(self._module)
+        self._hashes = {}
+        try:
+            self._dependencies.update()
+        except SyntaxError:
+            pass  # Reported by the import below
+        self._dependency_mtimes = {
+            path: os.path.getmtime(path)
+            for path in self.dependency_files()
+            if path != self._file_path and os.path.isfile(path)
+        }
+
+        definitions = self._changed_definitions()
+        # Until the load succeeds, so that a failed load is followed by an import
+        self._loaded_analysis = None
+        if definitions is not None:
+            logger.debug(f"Re-executing {[stmt.name for stmt in definitions]}")
+            _exec_definitions(self._module, self._file_path, definitions)
+        else:
+            self._forget_local_modules()
+            self._module = _patch_missing_functions(_import_module(self._file_path))
+        self._record_loaded_code()
+
+    def _local_sources(self) -> Dict[Path, str]:
+        return {
+            path: self._dependencies.analysis(path).source_hash
+            for path in self.dependency_files()
+            if path != self._file_path
+        }
+
+    def _changed_definitions(self) -> Optional[List[ast.stmt]]:
+        """The definitions to re-execute, ``None`` if a full import is needed."""
+        if self._module is None or self._loaded_analysis is None:
+            return None
+        try:
+            analysis = self._dependencies.analysis(self._file_path)
+            if self._local_sources() != self._loaded_sources:
+                return None
+        except (OSError, SyntaxError):
+            return None
+        return changed_definitions(self._loaded_analysis, analysis)
+
+    def _record_loaded_code(self):
+        try:
+            self._loaded_analysis = self._dependencies.analysis(self._file_path)
+            self._loaded_sources = self._local_sources()
+        except (OSError, SyntaxError):
+            self._loaded_analysis = None
+
+    def _forget_local_modules(self):
+        for name in self._dependencies.local_module_names():
+            if name in sys.modules:
+                logger.debug(f"Forgetting local module {name}")
+                del sys.modules[name]
+
+    def dependency_files(self) -> Set[Path]:
+        """The script and the local modules it imports, as of the last load."""
+        return self._dependencies.local_files()
+
+    def func_source(self, f_name: str) -> str:
+        """The source code of the function ``f_name`` in the loaded module."""
+        return inspect.getsource(getattr(self._module, f_name))
+
+    def func_hash(self, f_name: str) -> str:
+        """A hash of ``f_name`` and of the code it depends on.
+
+        Covers the helper functions, constants and local modules ``f_name``
+        uses (see :class:`~liveplot.dependencies.DependencyAnalyzer`).
+        The hash is stable across sessions, and computed once per load.
+        """
+        if f_name not in self._hashes:
+            if self._dependencies.is_defined(f_name):
+                self._hashes[f_name] = self._dependencies.hash(f_name)
+            else:
+                self._hashes[f_name] = hash_source(self.func_source(f_name))
+        return self._hashes[f_name]
+
+    def stages(self) -> Dict[str, Callable]:
+        """The functions of the module declared as stages, by name.
+
+        See :func:`~liveplot.pipeline.stage`.
+        """
+        if self._module is None:
+            return {}
+        return {
+            name: value for name, value in vars(self._module).items() if is_stage(value)
+        }
+
+    def defines(self, f_name: str) -> bool:
+        """Whether the loaded module has a function ``f_name``, patched or not."""
+        return self._module is not None and callable(
+            getattr(self._module, f_name, None)
+        )
+
+    def signature(self, f_name: str) -> inspect.Signature:
+        """The signature of the function ``f_name`` of the loaded module."""
+        return inspect.signature(getattr(self._module, f_name))
+
+    def mark_executed(self, f_name: str):
+        """Record the current version of ``f_name`` as the last executed one.
 
-    def _save_function_source(self, f_name: str):
-        source = inspect.getsource(getattr(self._module, f_name))
-        self._functions_source_last_exec[f_name] = source
+        Used when the result of ``f_name`` is restored instead of computed.
+        """
+        self._functions_hash_last_exec[f_name] = self.func_hash(f_name)
+
+    def executed_hashes(self) -> Dict[str, str]:
+        """The hash of each function as of its last call, see :meth:`mark_executed`."""
+        return dict(self._functions_hash_last_exec)
+
+    def restore_executed_hashes(self, hashes: Dict[str, str]):
+        """Consider the functions of ``hashes`` called with those versions.
+
+        Used to resume a session saved with :meth:`executed_hashes`: the
+        functions whose hash is unchanged are not called again.
+        """
+        self._functions_hash_last_exec.update(hashes)
 
     def func_has_changed(self, f_name: str) -> bool:
-        """Check if the function has changed since its last call.
+        """Check if the function or its dependencies changed since its last call.
+
+        Compares the hash when last called to the hash of the loaded code.
+        """
+        if f_name not in self._functions_hash_last_exec:
+            return True
+        return self._functions_hash_last_exec[f_name] != self.func_hash(f_name)
 
-        Compares the source when last called to the source in memory.
+    def bind(self, f_name: str) -> Callable:
+        """The function ``f_name`` of the loaded module, to be called later.
 
-        Raises:
-            ValueError if the function has never been called.
+        Exceptions raised by the function are wrapped as in :meth:`call`.
+        The returned callable keeps using the current version of the function
+        if the module is reloaded, so it can be handed to another thread.
+        Counts as a call for :func:`~CodeLoader.func_has_changed`.
         """
-        never_executed = f_name not in self._functions_source_last_exec
-        source = inspect.getsource(getattr(self._module, f_name))
-        return never_executed or self._functions_source_last_exec[f_name] != source
+        self.mark_executed(f_name)
+        func = getattr(self._module, f_name)
+
+        def bound(*args, **kwargs):
+            logger.debug(f"Executing function {f_name}")
+            try:
+                return func(*args, **kwargs)
+            except (Exception, SystemExit) as exc:
+                raise PlottingModuleError(
+                    f"Plotting triggered an exception in `{f_name}`, trying to recover"
+                ) from exc
+
+        return bound
 
     def call(self, f_name: str, *args, **kwargs) -> Any:
         """Call the function ``f_name`` and passes it all other arguments.
@@ -156,22 +406,33 @@ class ModuleLoader:
         Saves the function source for future comparison in
         :func:`~CodeLoader.func_has_changed`.
         """
-        logger.debug(f"Executing function {f_name}")
-        self._save_function_source(f_name)
-        func = getattr(self._module, f_name)
-        try:
-            return func(*args, **kwargs)
-        except Exception as exc:
-            raise PlottingModuleError(
-                f"Plotting triggered an exception in `{f_name}`, trying to recover"
-            ) from exc
+        return self.bind(f_name)(*args, **kwargs)
 
     def should_reload(self) -> bool:
         """Whether the file has changed on disk since its last load.
 
-        Compares the last load time with the file's last modified (``st_mtime``).
+        Compares the last load time with the file's last modified (``st_mtime``),
+        and does the same for the local modules the script imports.
+        Returns ``False`` while the file is missing, for example in the middle
+        of an editor replacing it by renaming a temporary file.
         """
-        return (
-            self._last_load_attempt is None
-            or self._last_load_attempt < self._file_path.stat().st_mtime
-        )
+        if self._last_load_attempt is None:
+            return True
+        try:
+            last_modified = self._file_path.stat().st_mtime
+        except FileNotFoundError:
+            return False
+        return self._last_load_attempt < last_modified or self._dependency_changed()
+
+    def _dependency_changed(self) -> bool:
+        for path, last_modified in self._dependency_mtimes.items():
+            try:
+                if os.path.getmtime(path) > last_modified:
+                    return True
+            except FileNotFoundError:
+                continue
+        return False
+
+    @property
+    def file_path(self) -> Path:
+        return self._file_path
@@ -0,0 +1,296 @@
+"""Scripts made of any number of stages, re-run only downstream of an edit.
+
+Instead of ``load_data`` and ``postprocess``, a script can declare its own
+stages with the :func:`stage` decorator. The parameters of a stage are the
+names of the stages it depends on::
+
+    from liveplot import stage
+
+    @stage
+    def runs():
+        return np.load("runs.npy")
+
+    @stage
+    def converged(runs):
+        return runs[runs[:, -1] < 1e-3]
+
+    @stage
+    def fit(converged):
+        return np.polyfit(converged[:, 0], converged[:, 1], 3)
+
+    def make_figure(fig, data):
+        ax = fig.add_subplot(111)
+        ax.plot(data["converged"][:, 0], data["converged"][:, 1], ".")
+        ax.plot(data["converged"][:, 0], np.polyval(data["fit"], ...))
+
+``make_figure`` receives a dict with the result of each stage. The result of
+each stage is kept, and when the script changes, only the stages whose code
+changed and the stages downstream of them run again: editing ``fit`` above
+does not load or filter the runs again.
+
+The key of a stage is the hash of its code (see
+:meth:`~liveplot.module_loader.ModuleLoader.func_hash`) and of the keys of the
+stages it depends on. Stages should not modify their inputs in place, as the
+inputs are the kept results of other stages. Stages run in the GUI process,
+also with ``--background``.
+
+Stages that do not depend on each other run at the same time, each in a
+thread, and ``settings`` runs in the meantime. Threads suit stages waiting on
+files or the network, and NumPy code, which releases the GIL. A stage spending
+its time in Python code can be run in a child process instead with
+``@stage(process=True)``: the child imports the script again, and the inputs
+and result of the stage must be picklable. Stages should not use pyplot.
+"""
+import concurrent.futures
+import functools
+import inspect
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from liveplot.cache import hash_source
+
+logger = logging.getLogger("liveplot.pipeline")
+
+# Attributes marking the functions decorated with @stage, and those to run
+# in a child process
+_STAGE = "_liveplot_stage"
+_PROCESS = "_liveplot_process"
+
+
+def stage(func: Optional[Callable] = None, *, process: bool = False) -> Callable:
+    """Declare ``func`` as a stage of the pipeline of the script.
+
+    The parameters of ``func`` without default value name the stages whose
+    results it takes as input. Used as ``@stage`` or ``@stage(process=True)``.
+
+    Args:
+        process: Whether to run the stage in a child process rather than in
+            a thread, for CPU-bound Python code
+    """
+    if func is None:
+        return functools.partial(stage, process=process)
+    setattr(func, _STAGE, True)
+    setattr(func, _PROCESS, process)
+    return func
+
+
+def is_stage(obj: Any) -> bool:
+    """Whether ``obj`` was decorated with :func:`stage`."""
+    return callable(obj) and getattr(obj, _STAGE, False) is True
+
+
+def runs_in_process(func: Callable) -> bool:
+    """Whether the stage ``func`` was declared with ``process=True``."""
+    return getattr(func, _PROCESS, False) is True
+
+
+def stage_inputs(func: Callable) -> List[str]:
+    """The names of the stages ``func`` depends on, in the order of its parameters."""
+    return [
+        parameter.name
+        for parameter in inspect.signature(func).parameters.values()
+        if parameter.default is inspect.Parameter.empty
+        and parameter.kind
+        in (inspect.Parameter.POSITIONAL_ONLY, inspect.Parameter.POSITIONAL_OR_KEYWORD)
+    ]
+
+
+def run_order(graph: Dict[str, List[str]]) -> List[str]:
+    """The stages of ``graph`` sorted so that each comes after its inputs.
+
+    Args:
+        graph: The inputs of each stage, ordered as defined in the script
+
+    Raises:
+        ValueError if a stage depends on an unknown stage or on itself,
+        directly or not
+    """
+    order: List[str] = []
+    visiting: List[str] = []
+
+    def visit(name: str):
+        if name in order:
+            return
+        if name in visiting:
+            cycle = " -> ".join(visiting[visiting.index(name) :] + [name])
+            raise ValueError(f"The stages depend on each other: {cycle}")
+        visiting.append(name)
+        for dependency in graph[name]:
+            if dependency not in graph:
+                raise ValueError(f"Stage {name} depends on unknown stage {dependency}")
+            visit(dependency)
+        visiting.pop()
+        order.append(name)
+
+    for name in graph:
+        visit(name)
+    return order
+
+
+class Pipeline:
+    """The last result of each stage of a script, to re-run only what changed."""
+
+    def __init__(self):
+        self._results: Dict[str, Tuple[str, Any]] = {}
+        # The inputs of each stage, as of the last run
+        self._inputs: Dict[str, List[str]] = {}
+
+    @property
+    def names(self) -> List[str]:
+        """The stages with a kept result."""
+        return list(self._results)
+
+    @staticmethod
+    def plan(stages: Dict[str, Callable], func_hash: Callable[[str], str]):
+        """The stages in the order to run them, with their inputs and key.
+
+        Args:
+            stages: The stage functions of the script, by name
+            func_hash: The hash of the code of a stage, by name
+
+        Returns:
+            A list of ``(name, inputs, key)``
+
+        Raises:
+            ValueError if the dependencies are not valid, see :func:`run_order`
+        """
+        graph = {name: stage_inputs(func) for name, func in stages.items()}
+        keys: Dict[str, str] = {}
+        plan = []
+        for name in run_order(graph):
+            inputs = graph[name]
+            keys[name] = hash_source(func_hash(name), *(keys[i] for i in inputs))
+            plan.append((name, inputs, keys[name]))
+        return plan
+
+    def snapshot(self) -> Dict[str, Any]:
+        """The kept results and the inputs of each stage, for :meth:`restore`."""
+        return {"results": dict(self._results), "inputs": dict(self._inputs)}
+
+    def restore(self, snapshot: Dict[str, Any]):
+        """Keep the results of a :meth:`snapshot`, of a previous session."""
+        self._results = dict(snapshot["results"])
+        self._inputs = dict(snapshot["inputs"])
+
+    def results(self) -> Dict[str, Any]:
+        """The kept result of each stage."""
+        return {name: value for name, (_, value) in self._results.items()}
+
+    def replace(self, name: str, value: Any):
+        """Keep ``value`` as the result of ``name``, for example a copy of it."""
+        key, _ = self._results[name]
+        self._results[name] = (key, value)
+
+    def invalidate(self, names: List[str]) -> List[str]:
+        """Drop the results of ``names`` and of the stages downstream of them.
+
+        Returns:
+            The stages whose result was dropped
+        """
+        dropped = [name for name in names if name in self._results]
+        for name in self._results:
+            if name not in dropped and set(self._inputs.get(name, [])) & set(dropped):
+                dropped.append(name)
+        for name in dropped:
+            del self._results[name]
+        return dropped
+
+    def is_current(self, plan: List[Tuple[str, List[str], str]]) -> bool:
+        """Whether the kept results are those of the stages of ``plan``."""
+        return {name: key for name, _, key in plan} == {
+            name: key for name, (key, _) in self._results.items()
+        }
+
+    def run(
+        self,
+        plan: List[Tuple[str, List[str], str]],
+        compute: Callable[[str, str, List[Any]], Any],
+        workers: int = 1,
+        meanwhile: Optional[Callable[[], Any]] = None,
+    ) -> Dict[str, Any]:
+        """Run the stale stages of ``plan`` and return the results of all stages.
+
+        With several ``workers``, each stale stage starts in a thread as soon
+        as its inputs are ready, and ``meanwhile`` runs in the calling thread
+        while the stages run. The results of stages that are no longer in the
+        plan are dropped.
+
+        Args:
+            plan: As returned by :meth:`plan`
+            compute: Called with the name, key and inputs of each stale stage,
+                returns its result
+            workers: How many stages can run at the same time, 1 to run them
+                one after the other in the calling thread
+            meanwhile: Called once in the calling thread, if given, after
+                the stages if they run one after the other
+
+        Raises:
+            The first exception raised by ``compute`` or ``meanwhile``, once
+            the stages already started are done. ``KeyboardInterrupt`` is
+            raised without waiting for them, and the others are not started
+        """
+        stale = []
+        results: Dict[str, Any] = {}
+        for name, inputs, key in plan:
+            kept = self._results.get(name)
+            if kept is None or kept[0] != key:
+                stale.append((name, inputs, key))
+            else:
+                results[name] = kept[1]
+
+        concurrent_stages = len(stale) > 1 or (stale and meanwhile is not None)
+        if workers > 1 and concurrent_stages:
+            self._run_concurrently(stale, compute, workers, meanwhile, results)
+        else:
+            for name, inputs, key in stale:
+                logger.debug(f"Running stage {name}")
+                results[name] = compute(name, key, [results[i] for i in inputs])
+                self._results[name] = (key, results[name])
+            if meanwhile is not None:
+                meanwhile()
+
+        self._results = {name: self._results[name] for name, _, _ in plan}
+        self._inputs = {name: inputs for name, inputs, _ in plan}
+        return {name: results[name] for name, _, _ in plan}
+
+    def _run_concurrently(
+        self,
+        stale: List[Tuple[str, List[str], str]],
+        compute: Callable[[str, str, List[Any]], Any],
+        workers: int,
+        meanwhile: Optional[Callable[[], Any]],
+        results: Dict[str, Any],
+    ):
+        pending = list(stale)
+        running: Dict[concurrent.futures.Future, Tuple[str, str]] = {}
+        executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="liveplot-stage"
+        )
+        interrupted = False
+        try:
+            while pending or running:
+                for name, inputs, key in list(pending):
+                    if all(i in results for i in inputs):
+                        logger.debug(f"Running stage {name} in a thread")
+                        args = [results[i] for i in inputs]
+                        future = executor.submit(compute, name, key, args)
+                        running[future] = (name, key)
+                        pending.remove((name, inputs, key))
+                if meanwhile is not None:
+                    call, meanwhile = meanwhile, None
+                    call()
+                done, _ = concurrent.futures.wait(
+                    running, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    name, key = running.pop(future)
+                    results[name] = future.result()
+                    self._results[name] = (key, results[name])
+        except KeyboardInterrupt:
+            interrupted = True
+            raise
+        finally:
+            for future in running:
+                future.cancel()
+            # Threads cannot be stopped, so Ctrl+C leaves the running stages
+            executor.shutdown(wait=not interrupted)
@@ -1,78 +1,882 @@
+import contextlib
+import importlib
 import logging
+import time
 from pathlib import Path
-from typing import Optional
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 
+from liveplot import data_files
+from liveplot.background import (
+    CHUNK_FUNCTIONS,
+    UNCHANGED,
+    DataRunner,
+    Job,
+    ThreadJob,
+    call_in_process,
+    data_hashes,
+    load_key,
+    mark_loaded,
+)
+from liveplot.cache import DataCache, hash_source, script_scope
+from liveplot.data_files import Signature
+from liveplot.data_store import DataStore
+from liveplot.decimation import decimating, undecimated
+from liveplot.export import Exporter
+from liveplot.memory import MemoryBudget
 from liveplot.module_loader import ModuleLoader, PlottingModuleError
+from liveplot.pipeline import Pipeline, runs_in_process
 from liveplot.plt_interface import PltInterface
+from liveplot.profiling import Profiler
+from liveplot.streaming import consume, is_stream
 
 logger = logging.getLogger("liveplot.plot_watcher")
 
+# Time (s) given to the GUI event loop after drawing partial data
+partial_draw_pause = 0.001
+
+
+def _files_entry(key: str) -> str:
+    """The cache entry of the data files read by the result cached under ``key``."""
+    return hash_source(key, "data files")
+
+
+def _with_files(key: str, files: Dict[Path, Signature]) -> str:
+    """``key`` made specific to the current content of ``files``."""
+    if not files:
+        return key
+    return hash_source(key, *(f"{path}:{sig}" for path, sig in sorted(files.items())))
+
+
+def _update_figure_module():
+    """:mod:`liveplot.update_figure`, imported when first needed.
+
+    It imports most of matplotlib, which is not needed before the first
+    figure.
+    """
+    return importlib.import_module("liveplot.update_figure")
+
 
 class PlotWatcher:
-    def __init__(self, plotting_module: ModuleLoader, plotting_stuff: PltInterface):
+    def __init__(
+        self,
+        plotting_module: ModuleLoader,
+        plotting_stuff: PltInterface,
+        cache: Optional[DataCache] = None,
+        runner: Optional[DataRunner] = None,
+        incremental: bool = False,
+        decimate: Optional[str] = None,
+        store: Optional[DataStore] = None,
+        profiler: Optional[Profiler] = None,
+        memory_budget: Optional[MemoryBudget] = None,
+        workers: int = 1,
+        exporter: Optional[Exporter] = None,
+        overlap_settings: bool = False,
+    ):
         self.plt_module = plotting_module
         self.plt_interface = plotting_stuff
+        self.cache = None
+        if cache is not None:
+            self.cache = cache.scoped(script_scope(plotting_module.file_path))
+        self.runner = runner
+        self.incremental = incremental
+        self.decimate = decimate
+        self.store = store
+        self.profiler = profiler
+        self.memory_budget = memory_budget
+        self.workers = workers
+        self.exporter = exporter
+        self.overlap_settings = overlap_settings
+        self._data_key: Optional[str] = None
+        self._job_keys: Tuple[Optional[str], Optional[str]] = (None, None)
+        self._figure_built = False
         self.data = None
         self.data_post = None
         self.interactive_elements = None
+        self._job: Optional[Job] = None
+        self._job_runs_load = False
+        self._job_started = 0.0
+        self._pending_settings = False
+        self.pipeline = Pipeline()
+        self._uses_pipeline = False
+        # The data files read by load_data and by each stage, and their
+        # signature when read, see liveplot.data_files
+        self._data_files: Dict[str, Dict[Path, Signature]] = {}
+        self._stale_data: Set[str] = set()
+        # The offset returned by load_data_incremental
+        self._data_offset: Any = None
 
     @staticmethod
-    def from_path(file_path: Path, plt_interface: Optional[PltInterface] = None):
+    def from_path(
+        file_path: Path,
+        plt_interface: Optional[PltInterface] = None,
+        cache: Optional[DataCache] = None,
+        runner: Optional[DataRunner] = None,
+        incremental: bool = False,
+        decimate: Optional[str] = None,
+        store: Optional[DataStore] = None,
+        profiler: Optional[Profiler] = None,
+        memory_budget: Optional[MemoryBudget] = None,
+        workers: int = 1,
+        exporter: Optional[Exporter] = None,
+        overlap_settings: bool = False,
+    ):
         logger.debug(f"Creating PlotWatcher for {file_path}")
 
         return PlotWatcher(
             ModuleLoader(file_path),
             plt_interface if plt_interface is not None else PltInterface(),
+            cache=cache,
+            runner=runner,
+            incremental=incremental,
+            decimate=decimate,
+            store=store,
+            profiler=profiler,
+            memory_budget=memory_budget,
+            workers=workers,
+            exporter=exporter,
+            overlap_settings=overlap_settings,
         )
 
-    def _make_plot(self):
-        has_changed = self.plt_module.func_has_changed
-        should_settings = has_changed("settings")
-        should_load_data = has_changed("load_data")
-        should_postprocess = should_load_data or has_changed("postprocess")
-        should_make_figure = (
-            should_postprocess or should_settings or has_changed("make_figure")
+    def _stage(self, name: str):
+        """Context measuring the stage ``name`` if profiling."""
+        if self.profiler is None:
+            return contextlib.nullcontext()
+        return self.profiler.stage(name)
+
+    def _refresh_context(self):
+        """Context grouping the stages run in it as one refresh if profiling."""
+        if self.profiler is None:
+            return contextlib.nullcontext()
+        return self.profiler.refresh(self.plt_module.file_path)
+
+    def _share(self, stage: str, key: Optional[str], value: Any) -> Any:
+        """Put the result of ``stage`` in the store, see :meth:`DataStore.put`."""
+        if self.store is None or key is None:
+            return value
+        return self.store.put((id(self), stage), key, value)
+
+    @property
+    def data_files(self) -> Set[Path]:
+        """The files read by ``load_data`` and the stages, to watch."""
+        return {path for files in self._data_files.values() for path in files}
+
+    def _changed_data_files(self) -> List[str]:
+        """``load_data`` and the stages whose data files changed since read."""
+        return [
+            name
+            for name, files in self._data_files.items()
+            if files and data_files.signatures(files) != files
+        ]
+
+    def _data_function(self) -> str:
+        """``load_data_incremental`` if the script defines it, else ``load_data``."""
+        if self.plt_module.defines("load_data_incremental"):
+            return "load_data_incremental"
+        return "load_data"
+
+    def _record_data_files(
+        self,
+        name: str,
+        key: Optional[str],
+        files: Dict[Path, Signature],
+        offset: Any = None,
+    ):
+        """Keep the data files read by ``name``, and with its cached result.
+
+        Args:
+            name: ``load_data`` or a stage
+            key: The key of the cached result, if it is cached
+            files: The signatures of the files, see :func:`data_files.recording`
+            offset: The offset returned by ``load_data_incremental``, if any
+        """
+        self._data_files[name] = files
+        self._stale_data.discard(name)
+        if self.cache is not None and key is not None and files:
+            self.cache.save(_files_entry(key), {"files": files, "offset": offset})
+
+    def _cached_data_files(self, name: str, key: str, appendable: bool = False):
+        """The data files read by the result of ``name`` cached under ``key``.
+
+        If the files changed since, the cached result is removed, unless the
+        files were only appended to and ``appendable``.
+
+        Returns:
+            The files and the offset of ``load_data_incremental``, ``({}, None)``
+            if no files were recorded, ``None`` if the cached result is stale
+        """
+        entry = _files_entry(key)
+        if self.cache is None or entry not in self.cache:
+            return {}, None
+        try:
+            recorded = self.cache.load(entry)
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.warning(f"Could not read the data files of {name}: {exc}")
+            return {}, None
+        files = recorded["files"]
+        current = data_files.signatures(files)
+        if current != files and not (
+            appendable and data_files.only_appended(files, current)
+        ):
+            logger.info(f"The data files of {name} changed since it was cached")
+            self.cache.discard(key)
+            self.cache.discard(entry)
+            return None
+        return files, recorded["offset"]
+
+    def _postprocess_key(self) -> Optional[str]:
+        if self.store is None or self._data_key is None:
+            return None
+        return hash_source(self._data_key, self.plt_module.func_hash("postprocess"))
+
+    def _restore_data(self) -> Tuple[bool, Any]:
+        """Restore the result of ``load_data`` from the store or the cache.
+
+        Returns:
+            Whether the data was found, and the data
+        """
+        if self.cache is None and self.store is None:
+            return False, None
+        if "load_data" in self._stale_data:
+            return False, None
+
+        loader = self._data_function()
+        key = load_key(self.plt_module, loader)
+        if self.store is not None and key in self.store:
+            data = self.store.acquire((id(self), "load_data"), key)
+            self._data_key = key
+            mark_loaded(self.plt_module, loader)
+            logger.info("Reused load_data from another script")
+            return True, data
+
+        appendable = loader == "load_data_incremental"
+        if self.cache is not None and key in self.cache:
+            recorded = self._cached_data_files("load_data", key, appendable)
+            if recorded is None:
+                return False, None
+            try:
+                data = self.cache.load(key)
+            except Exception as exc:  # pylint: disable=broad-except
+                logger.warning(f"Could not restore load_data from cache: {exc}")
+            else:
+                self._data_files["load_data"], self._data_offset = recorded
+                mark_loaded(self.plt_module, loader)
+                logger.info("Restored load_data from cache")
+                if "load_data" in self._changed_data_files():
+                    return True, self._append_data(data)
+                self._data_key = _with_files(key, self._data_files["load_data"])
+                return True, self._share("load_data", self._data_key, data)
+        return False, None
+
+    def _call_data_function(self, loader: str) -> Tuple[Any, Any, Dict]:
+        """Call ``loader`` to load the data, recording the files it reads.
+
+        Returns:
+            The data, the offset returned by ``load_data_incremental`` (``None``
+            for ``load_data``) and the data files read
+        """
+        with data_files.recording() as files:
+            if loader == "load_data":
+                return self.plt_module.call(loader), None, files
+            data, offset = self._incremental_result(
+                self.plt_module.call(loader, None, None)
+            )
+            return data, offset, files
+
+    @staticmethod
+    def _incremental_result(result: Any) -> Tuple[Any, Any]:
+        """The data and offset returned by ``load_data_incremental``.
+
+        Raises:
+            PlottingModuleError if the function did not return a pair
+        """
+        if not (isinstance(result, tuple) and len(result) == 2):
+            raise PlottingModuleError(
+                "`load_data_incremental` must return the data and an offset"
+            )
+        return result
+
+    def _can_append(self) -> bool:
+        """Whether the data files were only appended to since the data was read."""
+        files = self._data_files.get("load_data")
+        return (
+            bool(files)
+            and self._data_function() == "load_data_incremental"
+            and data_files.only_appended(files, data_files.signatures(files))
         )
 
+    def _append_data(self, data: Any) -> Any:
+        """``data`` updated with ``load_data_incremental``, from its last offset."""
+        key = load_key(self.plt_module, "load_data_incremental")
+        with data_files.recording() as files:
+            result = self.plt_module.call(
+                "load_data_incremental", data, self._data_offset
+            )
+        data, self._data_offset = self._incremental_result(result)
+        # The data is only saved to the cache on full loads, with the offset
+        # read until then, so that appending costs the size of the new data
+        files = {**self._data_files["load_data"], **files}
+        self._data_files["load_data"] = files
+        self._stale_data.discard("load_data")
+        self._data_key = _with_files(key, files)
+        logger.debug("PlotWatcher: appended to the data")
+        return self._share("load_data", self._data_key, data)
+
+    def _load_data(
+        self, meanwhile: Optional[Callable[[], Any]] = None, append: bool = False
+    ):
+        """Call ``load_data``, or restore its result if possible.
+
+        Only logs the reload when ``load_data`` is called, :meth:`_restore_data`
+        logs the restores.
+
+        Args:
+            meanwhile: Called in this thread while ``load_data`` runs in
+                another one, if given. Not called if the data is restored.
+            append: Whether to append to the data with
+                ``load_data_incremental``, if the data files allow it
+        """
+        postprocess_chunk, combine = map(self.plt_module.bind, CHUNK_FUNCTIONS)
+        if append and self._can_append():
+            data = self._append_data(self.data)
+            logger.info("Reloaded load_data")
+            return data
+        found, data = self._restore_data()
+        if found:
+            return data
+
+        loader = self._data_function()
+        key = load_key(self.plt_module, loader)
+        if meanwhile is None:
+            data, offset, files = self._call_data_function(loader)
+        else:
+            # A daemon thread, so that Ctrl+C does not wait for load_data
+            loading = ThreadJob(lambda report: self._call_data_function(loader))
+            meanwhile()
+            loading.wait()
+            data, offset, files = loading.result()
+        if is_stream(data):
+            logger.debug("PlotWatcher: load_data is a stream")
+            with data_files.recording() as stream_files:
+                data = consume(data, postprocess_chunk, combine, self._draw_partial)
+            files = {**stream_files, **files}
+        self._data_offset = offset
+        if self.cache is not None:
+            self.cache.save(key, data)
+        self._record_data_files("load_data", key, files, offset)
+        self._data_key = _with_files(key, files)
+        logger.info("Reloaded load_data")
+        return self._share("load_data", self._data_key, data)
+
+    def _overlaps_settings(self) -> bool:
+        """Whether the data is loaded while ``settings`` runs, if opted in.
+
+        Otherwise ``settings`` runs once the data is loaded.
+        """
+        return self._pending_settings and self.overlap_settings and self.workers > 1
+
+    def _load_data_during_settings(self, append: bool = False):
+        """Load the data while ``settings`` runs, see :meth:`_load_data`.
+
+        ``settings`` uses pyplot, which must stay in the main thread, so
+        ``load_data`` runs in another one. The data is kept if ``settings``
+        fails.
+        """
+        failed: List[PlottingModuleError] = []
+
+        def apply_settings():
+            try:
+                self._apply_settings()
+            except PlottingModuleError as exc:
+                failed.append(exc)
+
+        with self._stage("load_data"):
+            self.data = self._load_data(meanwhile=apply_settings, append=append)
+        if failed:
+            raise failed[0]
+
+    def _postprocess(self):
+        """Call ``postprocess``, or reuse the result of another script."""
+        key = self._postprocess_key()
+        if key is not None and key in self.store:
+            self.plt_module.mark_executed("postprocess")
+            logger.info("Reused postprocess from another script")
+            return self.store.acquire((id(self), "postprocess"), key)
+        data_post = self.plt_module.call("postprocess", self.data)
+        return self._share("postprocess", key, data_post)
+
+    def _compute_stage(self, name: str, key: str, inputs: List[Any]) -> Any:
+        """Run the pipeline stage ``name``, or reuse its result if possible.
+
+        Results are shared with the other scripts, and the results of the
+        stages without inputs are cached on disk like ``load_data``. Called
+        from the threads of :meth:`Pipeline.run` when running stages
+        concurrently.
+        """
+        stale = name in self._stale_data
+        if self.store is not None and key in self.store and not stale:
+            logger.info(f"Reused stage {name} from another script")
+            return self.store.acquire((id(self), name), key)
+        if not inputs and self.cache is not None and key in self.cache and not stale:
+            recorded = self._cached_data_files(name, key)
+            if recorded is not None:
+                try:
+                    value = self.cache.load(key)
+                except Exception as exc:  # pylint: disable=broad-except
+                    logger.warning(f"Could not restore stage {name} from cache: {exc}")
+                else:
+                    self._data_files[name] = recorded[0]
+                    logger.info(f"Restored stage {name} from cache")
+                    return self._share(name, _with_files(key, recorded[0]), value)
+
+        with self._stage(name), data_files.recording() as files:
+            if runs_in_process(self.plt_module.stages()[name]):
+                value = call_in_process(self.plt_module.file_path, name, *inputs)
+            else:
+                value = self.plt_module.call(name, *inputs)
+        if not inputs and self.cache is not None:
+            self.cache.save(key, value)
+        self._record_data_files(name, key if not inputs else None, files)
+        logger.info(f"Reloaded stage {name}")
+        return self._share(name, _with_files(key, files), value)
+
+    def _submit_data_stages(self, should_load_data: bool):
+        """Start ``load_data`` (if needed) and ``postprocess`` in the background.
+
+        Supersedes the job in flight, if any. If that job was running
+        ``load_data``, the new one runs it too.
+        """
+        if self._job is not None:
+            logger.info("Superseding the computation in progress")
+            self._job.cancel()
+            should_load_data = should_load_data or self._job_runs_load
+            self._job = None
+
+        key = load_key(self.plt_module)
+        if should_load_data and self.cache is not None and key in self.cache:
+            # So that the runner does not restore stale data from the cache
+            if "load_data" in self._stale_data:
+                self.cache.discard(key)
+            else:
+                self._cached_data_files("load_data", key)
+        self._stale_data.discard("load_data")
+
+        data = self.data
+        if self.runner.holds_data:
+            data = None  # The runner restores the data from the cache itself
+        elif should_load_data:
+            found, restored = self._restore_data()
+            if found:
+                data = restored
+                self.data = restored
+                should_load_data = False
+
+        files = self._data_files.get("load_data")
+        if should_load_data and files:
+            # The files read in the background are not recorded, keep
+            # watching the same ones
+            self._data_files["load_data"] = data_files.signatures(files)
+
+        cache_key = None
+        if should_load_data and self.cache is not None:
+            cache_key = key
         if should_load_data:
-            logger.debug("PlotWatcher: load_data has changed")
-            self.data = self.plt_module.call("load_data")
+            self._data_key = key
+        self._job_keys = (self._data_key, self._postprocess_key())
+
+        logger.debug("PlotWatcher: starting data stages in the background")
+        self._job_started = time.perf_counter()
+        self._job = self.runner.submit(
+            self.plt_module, should_load_data, data, self.cache, cache_key
+        )
+        self._job_runs_load = should_load_data
+
+    def _collect_data_stages(self) -> bool:
+        """Swap in the result of the background job if it is ready.
+
+        Returns:
+            Whether new data was swapped in
+
+        Raises:
+            PlottingModuleError if the user code raised an exception.
+        """
+        if self._job is None or not self._job.done():
+            return False
+
+        job, self._job = self._job, None
+        if self.profiler is not None:
+            self.profiler.record("background", time.perf_counter() - self._job_started)
+        data, data_post = job.result()
+        data_key, post_key = self._job_keys
+        if data is not UNCHANGED:
             logger.info("Reloaded load_data")
+            self.data = self._share("load_data", data_key, data)
+        self.data_post = self._share("postprocess", post_key, data_post)
+        logger.info("Reloaded postprocess")
+        return True
+
+    def _fit_memory_budget(self):
+        """Spill the data to disk if it takes more memory than the budget."""
+        if self.memory_budget is None:
+            return
+        if self._uses_pipeline:
+            results = self._fit(self.data_post)
+            for name, value in results.items():
+                self.pipeline.replace(name, value)
+            self.data_post = results
+            return
+
+        mapped = {}
+        key = self._data_key
+        if self.cache is not None and key is not None and key in self.cache:
+            mapped["load_data"] = lambda: self.cache.load(key)
+        results = self._fit(
+            {"load_data": self.data, "postprocess": self.data_post}, mapped
+        )
+        self.data, self.data_post = results["load_data"], results["postprocess"]
+
+    def _fit(
+        self, results: Dict[str, Any], mapped: Optional[Dict[str, Callable]] = None
+    ) -> Dict[str, Any]:
+        """Fit ``results`` in the memory budget, see :meth:`MemoryBudget.fit`.
+
+        Shared results are not spilled, other scripts may use them. The
+        spilled results are also replaced in the store.
+        """
+        keys = {}
+        if self.store is not None:
+            keys = {name: self.store.held((id(self), name)) for name in results}
+        pinned = {
+            name
+            for name, key in keys.items()
+            if key is not None and self.store.is_shared(key)
+        }
+        fitted = self.memory_budget.fit(results, mapped, pinned)
+        for name, key in keys.items():
+            if key is not None and fitted[name] is not results[name]:
+                self.store.replace(key, fitted[name])
+        return fitted
+
+    def _make_figure(self, fig) -> Any:
+        """Call ``make_figure`` on ``fig``, decimating large artists if enabled."""
+        with self._stage("make_figure"):
+            if self.decimate is None:
+                return self.plt_module.call("make_figure", fig, self.data_post)
+            with decimating(self.decimate):
+                return self.plt_module.call("make_figure", fig, self.data_post)
+
+    def _draw(self, only_animated: bool = False):
+        """Draw the figure, right away when profiling so that it can be timed."""
+        with self._stage("draw"):
+            self.plt_interface.draw(
+                only_animated=only_animated, sync=self.profiler is not None
+            )
+
+    def _can_update(self) -> bool:
+        """Whether ``update_figure`` can update the figure instead of rebuilding it.
+
+        The figure must have been built by the current ``make_figure``.
+        """
+        return (
+            self.incremental
+            and self._figure_built
+            and self.plt_module.defines("update_figure")
+            and not self.plt_module.func_has_changed("make_figure")
+        )
+
+    def _update_figure(self):
+        """Call ``update_figure`` with the artists returned by ``make_figure``."""
+        fig = self.plt_interface.fig
+        with self._stage("update_figure"):
+            if self.decimate is None:
+                self.plt_module.call(
+                    "update_figure", fig, self.data_post, self.interactive_elements
+                )
+                return
+            with undecimated(fig):
+                self.plt_module.call(
+                    "update_figure", fig, self.data_post, self.interactive_elements
+                )
+
+    def _redraw(self):
+        if self._can_update():
+            static_state = _update_figure_module().static_state
+            background = static_state(self.plt_interface.fig)
+            self._update_figure()
+            only_data_changed = background == static_state(self.plt_interface.fig)
+            self._draw(only_animated=only_data_changed)
+            logger.info("Updated the figure in place")
+            return
+
+        self._figure_built = False
+        self.plt_interface.clear()
+        self.interactive_elements = self._make_figure(self.plt_interface.fig)
+        self._figure_built = True
+        if self.plt_module.defines("update_figure"):
+            # Only called when the data changes, edits are drawn from now on
+            self.plt_module.mark_executed("update_figure")
+        if self.incremental:
+            self.plt_interface.animate(
+                _update_figure_module().data_artists(self.plt_interface.fig)
+            )
+        self._draw()
+        logger.info("Reloaded make_figure")
+
+    def _export(self):
+        """Export the figure, once drawn with all the data."""
+        if self.exporter is not None:
+            with self._stage("export"):
+                self.exporter.export(
+                    self.plt_interface.fig, self.plt_module.file_path.stem
+                )
+
+    def _draw_partial(self, data):
+        """Draw the data loaded so far while ``load_data`` yields chunks."""
+        if self._pending_settings:
+            self._apply_settings()
+        self.data = data
+        with self._stage("postprocess"):
+            self.data_post = self.plt_module.call("postprocess", data)
+        self._redraw()
+        self.plt_interface.pause(partial_draw_pause)
+
+    def _apply_settings(self):
+        self._pending_settings = False
+        with self._stage("settings"):
+            self.plt_interface.reset_rc_params()
+            self.plt_module.call("settings", self.plt_interface.plt)
+            self.plt_interface.record_rc_params()
+            self.plt_interface.new_figure()
+        self._figure_built = False
+        logger.info("Reloaded settings")
+
+    def _plan_pipeline(self):
+        """The plan of the stages of the script, ``None`` if it has none."""
+        stages = self.plt_module.stages()
+        if not stages:
+            return None
+        try:
+            return Pipeline.plan(stages, self.plt_module.func_hash)
+        except ValueError as exc:
+            raise PlottingModuleError("The stages of the script are invalid") from exc
+
+    def _make_plot(self):
+        has_changed = self.plt_module.func_has_changed
+        with self._stage("hash"):
+            plan = self._plan_pipeline()
+            loader = self._data_function()
+            should_settings = has_changed("settings")
+            loader_changed = (
+                has_changed(loader)
+                or has_changed("postprocess_chunk")
+                or has_changed("combine")
+            )
+            should_load_data = loader_changed or "load_data" in self._stale_data
+            should_postprocess = should_load_data or has_changed("postprocess")
+            if plan is not None:
+                # The stages replace load_data and postprocess
+                should_load_data = False
+                should_postprocess = not self.pipeline.is_current(plan)
+            should_make_figure = (
+                should_postprocess
+                or should_settings
+                or has_changed("make_figure")
+                or (self._can_update() and has_changed("update_figure"))
+            )
+
+        self._pending_settings = should_settings
+        self._uses_pipeline = plan is not None
+
+        if plan is not None and should_postprocess:
+            logger.debug("PlotWatcher: stages have changed")
+            previous = self.pipeline.names
+            self.data_post = self.pipeline.run(
+                plan,
+                self._compute_stage,
+                workers=self.workers,
+                meanwhile=self._apply_settings if self._overlaps_settings() else None,
+            )
+            if self.store is not None:
+                for name in set(previous) - set(self.pipeline.names):
+                    self.store.release((id(self), name))
+            should_postprocess = False
+
+        if self.runner is not None and should_postprocess:
+            if should_load_data and loader != "load_data":
+                # load_data_incremental keeps its offset here, only
+                # postprocess runs in the background
+                with self._stage("load_data"):
+                    self.data = self._load_data(append=not loader_changed)
+                should_load_data = False
+            self._submit_data_stages(should_load_data)
+            should_make_figure = should_make_figure and not should_postprocess
+            should_load_data = should_postprocess = False
+
+        if should_load_data and self._overlaps_settings():
+            logger.debug("PlotWatcher: load_data and settings have changed")
+            self._load_data_during_settings(append=not loader_changed)
+        elif should_load_data:
+            logger.debug("PlotWatcher: load_data has changed")
+            with self._stage("load_data"):
+                self.data = self._load_data(append=not loader_changed)
 
         if should_postprocess:
             logger.debug("PlotWatcher: postprocess has changed")
-            self.data_post = self.plt_module.call("postprocess", self.data)
+            with self._stage("postprocess"):
+                self.data_post = self._postprocess()
             logger.info("Reloaded postprocess")
 
-        if should_settings:
+        self._fit_memory_budget()
+
+        if self._pending_settings:
             logger.debug("PlotWatcher: settings has changed")
-            self.plt_module.call("settings", self.plt_interface.plt)
-            self.plt_interface.new_figure()
-            logger.info("Reloaded settings")
+            self._apply_settings()
 
         if should_make_figure:
             logger.debug("PlotWatcher: needs to redraw")
-            self.plt_interface.clear()
-            self.interactive_elements = self.plt_module.call(
-                "make_figure", self.plt_interface.fig, self.data_post
-            )
-            self.plt_interface.draw()
-            logger.info("Reloaded make_figure")
+            self._redraw()
+            self._export()
+
+        used = self.pipeline.names if self._uses_pipeline else ["load_data"]
+        self._data_files = {
+            name: files for name, files in self._data_files.items() if name in used
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        """The state of the session, to resume it with :meth:`restore`.
+
+        Keeps the results of ``load_data``, ``postprocess`` and the stages
+        with the hashes of the code that computed them, the data files they
+        read and the rcParams set by ``settings``. The results of
+        ``load_data`` and ``postprocess`` are left out while they are computed
+        in the background or kept by a worker process.
+        """
+        state: Dict[str, Any] = {
+            "hashes": {},
+            "pipeline": self.pipeline.snapshot(),
+            "data_files": dict(self._data_files),
+            "rc_params": dict(self.plt_interface.rc_params),
+        }
+        holds_data = self.runner is None or not self.runner.holds_data
+        if self._job is None and holds_data and not self._uses_pipeline:
+            state["hashes"] = data_hashes(self.plt_module)
+            state["data"] = self.data
+            state["data_post"] = self.data_post
+            state["data_key"] = self._data_key
+            state["data_offset"] = self._data_offset
+        return state
+
+    def restore(self, state: Dict[str, Any]):
+        """Resume from a :meth:`snapshot`, before the first refresh.
+
+        The functions whose code did not change since the snapshot are not
+        called again, nor are the stages whose code and inputs did not change.
+        ``settings`` and ``make_figure`` are called to build the figure. The
+        results computed from data files that changed since are computed again.
+        """
+        self.plt_module.restore_executed_hashes(state["hashes"])
+        self.data = state.get("data")
+        self.data_post = state.get("data_post")
+        self._data_key = state.get("data_key")
+        self._data_offset = state.get("data_offset")
+        self.pipeline.restore(state["pipeline"])
+        if self.pipeline.names:
+            self.data_post = self.pipeline.results()
+        self._data_files = dict(state["data_files"])
+        self.plt_interface.rc_params = dict(state["rc_params"])
+
+        changed = self._changed_data_files()
+        if changed:
+            logger.info(f"The data files of {', '.join(changed)} changed since")
+            self._stale_data.update(changed)
+            self._stale_data.update(self.pipeline.invalidate(changed))
+
+    def needs_refresh(self) -> bool:
+        """Whether the script or the data files changed since the last refresh."""
+        return self.plt_module.should_reload() or bool(self._changed_data_files())
 
     def refresh(self):
         if self.plt_module.should_reload():
             logger.debug("PlotWatcher: Refresh: plotting code has changed")
+            with self._refresh_context():
+                self._reload()
+            return
 
-            try:
+        changed = self._changed_data_files()
+        if changed:
+            logger.debug(f"PlotWatcher: Refresh: data files of {changed} changed")
+            with self._refresh_context():
+                self._reload_data(changed)
+
+    def _reload_data(self, names: List[str]):
+        """Run ``load_data`` or the stages ``names`` again, and what follows."""
+        logger.info(f"The data files of {', '.join(names)} have changed")
+        self._stale_data.update(names)
+        self._stale_data.update(self.pipeline.invalidate(names))
+        try:
+            self._make_plot()
+        except PlottingModuleError as exc:
+            logger.error(str(exc))
+            logger.exception(exc.__cause__, exc_info=exc.__cause__)
+
+    def _reload(self):
+        try:
+            with self._stage("load_module"):
                 self.plt_module.load_module()
-            except ImportError as exc:
-                logger.error(exc.msg)
-                logger.exception(exc.__cause__, exc_info=exc.__cause__)
-                return
+        except ImportError as exc:
+            logger.error(exc.msg)
+            logger.exception(exc.__cause__, exc_info=exc.__cause__)
+            return
 
-            try:
-                self._make_plot()
-            except PlottingModuleError as exc:
-                logger.error(str(exc))
-                logger.exception(exc.__cause__, exc_info=exc.__cause__)
-                return
+        try:
+            self._make_plot()
+        except PlottingModuleError as exc:
+            logger.error(str(exc))
+            logger.exception(exc.__cause__, exc_info=exc.__cause__)
+            return
+
+    def poll_background(self) -> bool:
+        """Draw the result of the background computation, if it is ready.
+
+        Called regularly from the event loop when a runner is used.
+
+        Returns:
+            Whether the figure was redrawn
+        """
+        if self._job is None:
+            return False
+        with self._refresh_context():
+            return self._poll_job()
+
+    def _poll_job(self) -> bool:
+        drawn = False
+        try:
+            if self._job is not None:
+                has_partial, data_post = self._job.partial()
+                if has_partial:
+                    logger.debug("PlotWatcher: drawing partial data")
+                    self.data_post = data_post
+                    self._redraw()
+                    drawn = True
+            if self._collect_data_stages():
+                self._fit_memory_budget()
+                self._redraw()
+                self._export()
+                drawn = True
+        except PlottingModuleError as exc:
+            logger.error(str(exc))
+            logger.exception(exc.__cause__, exc_info=exc.__cause__)
+        return drawn
+
+    def close(self):
+        """Stop the computation in progress and release the shared data."""
+        if self._job is not None:
+            self._job.cancel()
+            self._job = None
+        if self.store is not None:
+            for stage in ["load_data", "postprocess"] + self.pipeline.names:
+                self.store.release((id(self), stage))
+
+    @property
+    def busy(self) -> bool:
+        """Whether a computation is running in the background."""
+        return self._job is not None
@@ -2,38 +2,209 @@
 
 Only used by :class:`~PlotWatcher`, but kept as a separate class so it can be
 replaced by a dummy class during tests to check the logic without plotting.
+
+``matplotlib.pyplot`` is imported on first use rather than with this module,
+as importing it and the GUI backend is slow.
 """
+import importlib
+import logging
+import os
 import sys
-from typing import Callable, Optional
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import matplotlib
+
+logger = logging.getLogger("liveplot.plt_interface")
+
+
+class BlitManager:
+    """Redraw a set of animated artists over a cached background.
+
+    The artists are marked as animated, so full draws of the canvas skip them.
+    After each full draw, the background of their axes is saved with
+    ``copy_from_bbox`` and the artists are drawn on top. :meth:`update` then
+    restores the saved backgrounds and redraws only the animated artists.
+
+    Args:
+        canvas: The canvas of the figure
+    """
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self._artists: List = []
+        self._backgrounds: Dict = {}
+        self._draw_handler = canvas.mpl_connect("draw_event", self._on_draw)
+
+    def set_artists(self, artists: Sequence):
+        """Animate ``artists`` instead of the previous ones."""
+        for artist in self._artists:
+            artist.set_animated(False)
+        self._artists = list(artists)
+        for artist in self._artists:
+            artist.set_animated(True)
+        self._backgrounds = {}
 
-from matplotlib import pyplot as plt
+    def _axes(self):
+        return list(dict.fromkeys(a.axes for a in self._artists if a.axes))
+
+    def _draw_artists(self):
+        for artist in sorted(self._artists, key=lambda a: a.get_zorder()):
+            self.canvas.figure.draw_artist(artist)
+
+    def _on_draw(self, event):  # pylint: disable=unused-argument
+        self._backgrounds = {
+            ax: self.canvas.copy_from_bbox(ax.bbox) for ax in self._axes()
+        }
+        self._draw_artists()
+
+    def update(self) -> bool:
+        """Redraw the animated artists over the saved backgrounds.
+
+        Returns:
+            ``False`` if there is no background yet and a full draw is needed
+        """
+        if not self._artists or not self._backgrounds:
+            return False
+        for background in self._backgrounds.values():
+            self.canvas.restore_region(background)
+        self._draw_artists()
+        for ax in self._backgrounds:
+            self.canvas.blit(ax.bbox)
+        self.canvas.flush_events()
+        return True
+
+    def disconnect(self):
+        self.set_artists([])
+        self.canvas.mpl_disconnect(self._draw_handler)
 
 
 class PltInterface:
-    """Utility functions that have to do with pyplt."""
+    """Utility functions that have to do with pyplt.
+
+    Args:
+        blit: Whether to redraw only the animated artists when possible
+            (see :class:`BlitManager`)
+        on_close: Called when the figure window is closed
+            (default: exit the program)
+    """
 
-    def __init__(self):
+    def __init__(self, blit: bool = False, on_close: Optional[Callable] = None):
         self.fig = None
         self._close_handler = None
-        self.plt = plt
+        self.blit = blit
+        self.on_close = on_close if on_close is not None else sys.exit
+        self._blit_manager: Optional[BlitManager] = None
+        # The rcParams changed by the settings function of the script
+        self.rc_params: Dict[str, Any] = {}
+        self._default_rc_params = {
+            key: value
+            for key, value in matplotlib.rcParams.copy().items()
+            if key != "backend"
+        }
+
+    @property
+    def plt(self):
+        """The ``matplotlib.pyplot`` module, imported on first use."""
+        return importlib.import_module("matplotlib.pyplot")
+
+    def reset_rc_params(self):
+        """Restore the rcParams as they were before calling any settings."""
+        self.plt.rcParams.update(self._default_rc_params)
+
+    def record_rc_params(self):
+        """Save the rcParams changed since :meth:`reset_rc_params` in ``rc_params``.
+
+        So they can be re-applied with ``plt.rc_context`` when several scripts
+        share the process.
+        """
+        current = self.plt.rcParams.copy()
+        self.rc_params = {
+            key: current[key]
+            for key, default in self._default_rc_params.items()
+            if current[key] != default
+        }
 
     def new_figure(self):
-        """Create a new figure that exits the program when closed."""
+        """Create a new figure that calls ``on_close`` when closed."""
         if self.fig is not None:
             self.fig.canvas.mpl_disconnect(self._close_handler)
+            if self._blit_manager is not None:
+                self._blit_manager.disconnect()
+                self._blit_manager = None
             self.plt.close(self.fig)
 
-        self.fig = plt.figure()
+        self.fig = self.plt.figure()
         self._close_handler: Optional[Callable] = self.fig.canvas.mpl_connect(
-            "close_event", lambda event: sys.exit()
+            "close_event", lambda event: self.on_close()
         )
+        if self.blit and self.fig.canvas.supports_blit:
+            self._blit_manager = BlitManager(self.fig.canvas)
         self.plt.show(block=False)
 
     def clear(self):
+        if self._blit_manager is not None:
+            self._blit_manager.set_artists([])
         self.fig.clear()
 
-    def draw(self):
-        self.plt.draw()
+    def animate(self, artists: Sequence):
+        """Register the artists that change between draws, if blitting."""
+        if self._blit_manager is not None:
+            self._blit_manager.set_artists(artists)
+
+    def draw(self, only_animated: bool = False, sync: bool = False):
+        """Redraw the figure.
+
+        Args:
+            only_animated: Whether only the animated artists changed, in which
+                case they are blitted over the cached background if possible
+            sync: Whether to render now rather than when the GUI is idle
+        """
+        if only_animated and self._blit_manager is not None:
+            if self._blit_manager.update():
+                return
+        if sync:
+            self.fig.canvas.draw()
+        else:
+            self.fig.canvas.draw_idle()
 
     def pause(self, interval: int):
         self.plt.pause(interval)
+
+
+class HeadlessInterface(PltInterface):
+    """Render the figure to a file instead of a window, with the Agg backend.
+
+    The file is written to a temporary file in the same directory and renamed,
+    so viewers never see a half-written image.
+
+    Args:
+        output: The file to write, its extension gives the format
+            (``png``, ``pdf``, ``svg``, ...)
+    """
+
+    def __init__(self, output: Path):
+        super().__init__()
+        self.output = Path(output)
+        matplotlib.use("agg")
+
+    def new_figure(self):
+        """Create a new figure, without showing it."""
+        if self.fig is not None:
+            self.plt.close(self.fig)
+        self.fig = self.plt.figure()
+
+    def draw(self, only_animated: bool = False, sync: bool = False):
+        """Render the figure to the output file."""
+        tmp_path = self.output.with_name(f".{self.output.name}.{os.getpid()}.tmp")
+        try:
+            self.fig.savefig(tmp_path, format=self.output.suffix[1:])
+            os.replace(tmp_path, self.output)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        logger.info(f"Saved figure to {self.output}")
+
+    def pause(self, interval: int):
+        time.sleep(interval)
@@ -0,0 +1,200 @@
+"""Timing of the stages of each refresh, to find where reload time goes.
+
+A :class:`Profiler` measures the wall time, CPU time and peak memory of each
+stage (``load_module``, ``hash``, ``load_data``, ``postprocess``,
+``make_figure``, ``draw``, ...) of each refresh of a
+:class:`~liveplot.plot_watcher.PlotWatcher`. It can
+
+- log a one-line summary of each refresh,
+- append one JSON object per refresh to a file,
+- dump a ``cProfile`` profile of the slowest stage of each refresh,
+- summarize all the refreshes of the session, see :meth:`Profiler.summary`.
+
+Peak memory is the peak of the memory allocated during the stage, as traced by
+:mod:`tracemalloc` (NumPy arrays included), which slows down allocations.
+"""
+import contextlib
+import cProfile
+import json
+import logging
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger("liveplot.profiling")
+
+
+def _reset_peak():
+    if hasattr(tracemalloc, "reset_peak"):
+        tracemalloc.reset_peak()
+    else:  # Python < 3.9, restarting also forgets the current allocations
+        tracemalloc.stop()
+        tracemalloc.start()
+
+
+def _format_size(size: float) -> str:
+    for unit in ("B", "kB", "MB"):
+        if size < 1024:
+            return f"{size:.0f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GB"
+
+
+class Profiler:
+    """Records the duration of the stages of each refresh.
+
+    Args:
+        stats_file: Where to append one JSON line per refresh, if given
+        profile_dir: Where to save a ``cProfile`` dump of the slowest stage of
+            each refresh (``<refresh>-<stage>.prof``), if given
+        track_memory: Whether to measure the peak memory of each stage
+    """
+
+    def __init__(
+        self,
+        stats_file: Optional[Path] = None,
+        profile_dir: Optional[Path] = None,
+        track_memory: bool = True,
+    ):
+        self.stats_file = stats_file
+        self.profile_dir = profile_dir
+        self.track_memory = track_memory
+        self.refreshes: List[Dict[str, Any]] = []
+        self._current: Optional[Dict[str, Any]] = None
+        # Index of the stage in the current refresh, and its profile
+        self._profiles: List[Tuple[int, cProfile.Profile]] = []
+        self._depth = 0
+        if profile_dir is not None:
+            Path(profile_dir).mkdir(parents=True, exist_ok=True)
+
+    @contextlib.contextmanager
+    def refresh(self, script: Path) -> Iterator[None]:
+        """Group the stages run in the block as one refresh of ``script``.
+
+        Nested calls are part of the outer refresh.
+        """
+        if self._current is not None:
+            yield
+            return
+        self._current = {"time": time.time(), "script": str(script), "stages": []}
+        self._profiles = []
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record, self._current = self._current, None
+            record["wall"] = time.perf_counter() - start
+            if record["stages"]:
+                self._finish(record)
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Measure the stage run in the block.
+
+        Stages run within another stage, such as the partial redraws of a
+        streaming ``load_data``, are timed but not profiled, and their memory
+        counts towards the outer stage. Stages run in other threads, such as
+        concurrent pipeline stages, are timed with the CPU time of their
+        thread and neither profiled nor traced.
+        """
+        if threading.current_thread() is not threading.main_thread():
+            start_wall, start_cpu = time.perf_counter(), time.thread_time()
+            try:
+                yield
+            finally:
+                wall = time.perf_counter() - start_wall
+                self.record(name, wall, time.thread_time() - start_cpu)
+            return
+
+        outer = self._depth == 0
+        track_memory = self.track_memory and outer
+        if track_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            _reset_peak()
+            start_memory = tracemalloc.get_traced_memory()[0]
+        profile = None
+        if self.profile_dir is not None and outer:
+            profile = cProfile.Profile()
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        self._depth += 1
+        if profile is not None:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+            self._depth -= 1
+            wall = time.perf_counter() - start_wall
+            cpu = time.process_time() - start_cpu
+            peak = 0
+            if track_memory and tracemalloc.is_tracing():
+                peak = max(tracemalloc.get_traced_memory()[1] - start_memory, 0)
+            self.record(name, wall, cpu, peak, profile)
+
+    def record(
+        self,
+        name: str,
+        wall: float,
+        cpu: float = 0.0,
+        peak_memory: int = 0,
+        profile: Optional[cProfile.Profile] = None,
+    ):
+        """Add a stage measured elsewhere, for example in another process."""
+        stage = {"name": name, "wall": wall, "cpu": cpu, "peak_memory": peak_memory}
+        if self._current is None:
+            record = {"time": time.time(), "script": None, "stages": [stage]}
+            self._finish(dict(record, wall=wall))
+            return
+        if profile is not None:
+            self._profiles.append((len(self._current["stages"]), profile))
+        self._current["stages"].append(stage)
+
+    def _finish(self, record: Dict[str, Any]):
+        record["index"] = len(self.refreshes)
+        self.refreshes.append(record)
+
+        stages = ", ".join(
+            f"{stage['name']} {stage['wall']:.3f}s" for stage in record["stages"]
+        )
+        logger.info(f"Refresh took {record['wall']:.3f}s ({stages})")
+
+        if self.stats_file is not None:
+            with open(self.stats_file, "a", encoding="utf8") as file:
+                file.write(json.dumps(record) + "\n")
+
+        if self._profiles:
+            index, profile = max(
+                self._profiles, key=lambda item: record["stages"][item[0]]["wall"]
+            )
+            name = record["stages"][index]["name"]
+            path = Path(self.profile_dir) / f"{record['index']}-{name}.prof"
+            profile.dump_stats(str(path))
+            logger.info(f"Saved the profile of {name} to {path}")
+            self._profiles = []
+
+    def summary(self) -> str:
+        """Table of the count, mean and max wall time, CPU time and memory per stage."""
+        totals: Dict[str, List[Dict[str, Any]]] = {}
+        for record in self.refreshes:
+            for stage in record["stages"]:
+                totals.setdefault(stage["name"], []).append(stage)
+
+        lines = [
+            f"{'stage':<14}{'count':>7}{'mean':>10}{'max':>10}"
+            f"{'cpu mean':>10}{'peak mem':>10}"
+        ]
+        for name, stages in totals.items():
+            walls = [stage["wall"] for stage in stages]
+            cpus = [stage["cpu"] for stage in stages]
+            peak = max(stage["peak_memory"] for stage in stages)
+            lines.append(
+                f"{name:<14}{len(stages):>7}{sum(walls) / len(walls):>9.3f}s"
+                f"{max(walls):>9.3f}s{sum(cpus) / len(cpus):>9.3f}s"
+                f"{_format_size(peak):>10}"
+            )
+        lines.append(f"{len(self.refreshes)} refreshes")
+        return "\n".join(lines)
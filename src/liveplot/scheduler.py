@@ -0,0 +1,121 @@
+"""Decide which figures to update, in which order and how often.
+
+The event loop of :func:`~liveplot.cli.launch_liveplot` hands the changes
+reported by the :class:`~liveplot.file_watcher.FileWatcher` to a
+:class:`Scheduler`, which debounces them in the file watcher (``--debounce``:
+a change is reported once the files have been quiet for that long, so the
+bursts of saves of auto-formatters or "save on focus loss" editors give a
+single refresh) and:
+
+- collapses them: a script that changed several times while other scripts
+  were being updated is refreshed once, with its latest version;
+- refreshes the scripts that were the quickest to refresh last time first
+  (a script never refreshed counts as the quickest), so that a cheap edit of
+  a figure is not stuck behind the slow ``load_data`` of another one;
+- looks for new changes and draws the results of the background computations
+  (``--background``, ``--worker``) between two refreshes, so that an edit of
+  ``make_figure`` made while ``load_data`` runs in the background is drawn
+  right away, with the previous data;
+- redraws each figure at most ``max_fps`` times per second. Refreshes and
+  background results arriving faster stay pending and are drawn, with the
+  latest version, when the figure may be redrawn again.
+"""
+import contextlib
+import logging
+import time
+from typing import Callable, ContextManager, Dict, Iterable, List, Optional
+
+from liveplot.file_watcher import FileWatcher
+from liveplot.plot_watcher import PlotWatcher
+
+logger = logging.getLogger("liveplot.scheduler")
+
+
+class Scheduler:
+    """Refresh the :class:`PlotWatcher` whose files changed, see the module doc.
+
+    Args:
+        file_watcher: Reports the changes to the scripts and their data files,
+            the files of each watcher are added to it after each refresh
+        max_fps: Maximum number of redraws per second of each figure
+            (default: no limit)
+        context: The context to refresh or poll a watcher in, for example to
+            set its rcParams
+    """
+
+    def __init__(
+        self,
+        file_watcher: FileWatcher,
+        max_fps: Optional[float] = None,
+        context: Optional[Callable[[PlotWatcher], ContextManager]] = None,
+    ):
+        self.file_watcher = file_watcher
+        self.min_interval = 1.0 / max_fps if max_fps else 0.0
+        self.context = context or (lambda watcher: contextlib.nullcontext())
+        # Ordered set of the watchers waiting for a refresh
+        self._pending: Dict[PlotWatcher, None] = {}
+        # Duration (s) of the last refresh of each watcher
+        self._cost: Dict[PlotWatcher, float] = {}
+        self._last_draw: Dict[PlotWatcher, float] = {}
+        self._started = False
+
+    @property
+    def pending(self) -> List[PlotWatcher]:
+        """The watchers waiting for a refresh, in the order they will get it."""
+        return sorted(self._pending, key=lambda watcher: self._cost.get(watcher, 0.0))
+
+    def _collect_changes(self, watchers: Iterable[PlotWatcher]) -> None:
+        if self.file_watcher.poll() or not self._started:
+            self._started = True
+            for watcher in watchers:
+                if watcher.needs_refresh():
+                    self._pending[watcher] = None
+
+    def _may_draw(self, watcher: PlotWatcher) -> bool:
+        last_draw = self._last_draw.get(watcher)
+        return last_draw is None or time.monotonic() - last_draw >= self.min_interval
+
+    def _refresh(self, watcher: PlotWatcher) -> None:
+        del self._pending[watcher]
+        start = time.perf_counter()
+        with self.context(watcher):
+            watcher.refresh()
+        self._cost[watcher] = time.perf_counter() - start
+        self._last_draw[watcher] = time.monotonic()
+        for path in watcher.plt_module.dependency_files() | watcher.data_files:
+            self.file_watcher.add_path(path)
+
+    def _poll_background(self, watchers: Iterable[PlotWatcher]) -> None:
+        for watcher in watchers:
+            if watcher.busy and self._may_draw(watcher):
+                with self.context(watcher):
+                    if watcher.poll_background():
+                        self._last_draw[watcher] = time.monotonic()
+
+    def step(self, watchers: Iterable[PlotWatcher]) -> None:
+        """Refresh the watchers whose files changed and poll their background work.
+
+        Only the watchers of ``watchers`` are considered, the others (closed
+        figures) are forgotten.
+        """
+        watchers = list(watchers)
+        for gone in set(self._pending) - set(watchers):
+            del self._pending[gone]
+        self._collect_changes(watchers)
+        self._poll_background(watchers)
+
+        deferred = []
+        while self._pending:
+            ready = [w for w in self.pending if w not in deferred]
+            if not ready:
+                break
+            watcher = ready[0]
+            if not self._may_draw(watcher):
+                deferred.append(watcher)
+                continue
+            logger.debug(f"Refreshing {watcher.plt_module.file_path}")
+            self._refresh(watcher)
+            # Collapse the changes made in the meantime into the pending
+            # refreshes, and draw what the background computations finished
+            self._collect_changes(watchers)
+            self._poll_background(watchers)
@@ -0,0 +1,286 @@
+"""Serve the figures over HTTP, to watch them from another machine.
+
+With ``--serve PORT``, the figures are rendered without a window (as with
+``--output``) and served by a small HTTP server running in a thread of the
+liveplot process. The data and the computations stay on the machine running
+liveplot, and a browser pointed at ``http://host:PORT/`` shows the figures.
+
+Only changed frames are sent. Each figure is served at
+``/figures/<name>.<format>`` with an ``ETag`` (a hash of the image), and
+requests with a matching ``If-None-Match`` get an empty ``304 Not Modified``.
+The page waits for changes with a long-polling request to ``/figures``,
+which returns the ``ETag`` of each figure as soon as one of them changes, and
+only fetches the images whose ``ETag`` changed. A figure whose image is
+identical after a refresh is not sent again. SVG images are sent gzipped to
+clients accepting it.
+
+The server listens on ``127.0.0.1`` by default. To watch from another
+machine, forward the port (``ssh -L PORT:localhost:PORT host``), or listen on
+all interfaces with ``--serve-host 0.0.0.0`` on a trusted network: there is
+no authentication.
+"""
+import gzip
+import hashlib
+import io
+import json
+import logging
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+
+import matplotlib
+
+from liveplot.plt_interface import HeadlessInterface
+
+logger = logging.getLogger("liveplot.server")
+
+# Longest time (s) a request to /figures waits for a change
+LONG_POLL_TIMEOUT = 20.0
+
+_CONTENT_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+
+# Without the date, so that an unchanged figure gives the same image
+_METADATA = {"png": None, "svg": {"Date": None}}
+
+_INDEX = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>liveplot</title>
+<style>
+body { font-family: sans-serif; margin: 1em; }
+figure { display: inline-block; margin: 0.5em; }
+img { max-width: 100%; }
+</style>
+</head>
+<body>
+<div id="figures"></div>
+<script>
+const etags = {};
+const container = document.getElementById("figures");
+
+async function show(name) {
+  // The browser sends If-None-Match and reuses its copy on 304
+  const response = await fetch("figures/" + encodeURIComponent(name),
+                               {cache: "no-cache"});
+  if (!response.ok) return;
+  let figure = document.getElementById(name);
+  if (figure === null) {
+    figure = document.createElement("figure");
+    figure.id = name;
+    figure.innerHTML = "<img><figcaption></figcaption>";
+    figure.querySelector("figcaption").textContent = name;
+    container.appendChild(figure);
+  }
+  const img = figure.querySelector("img");
+  const previous = img.src;
+  img.src = URL.createObjectURL(await response.blob());
+  if (previous) URL.revokeObjectURL(previous);
+}
+
+async function watch() {
+  let version = -1;
+  while (true) {
+    try {
+      const response = await fetch("figures?since=" + version, {cache: "no-store"});
+      const state = await response.json();
+      version = state.version;
+      for (const [name, etag] of Object.entries(state.figures)) {
+        if (etags[name] !== etag) {
+          etags[name] = etag;
+          await show(name);
+        }
+      }
+    } catch (error) {
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+    }
+  }
+}
+
+watch();
+</script>
+</body>
+</html>
+"""
+
+
+class Frame(NamedTuple):
+    """The last rendering of a figure."""
+
+    body: bytes
+    content_type: str
+    etag: str
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "_Server"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        url = urlparse(self.path)
+        if url.path == "/":
+            self._send(HTTPStatus.OK, _INDEX.encode("utf8"), "text/html")
+        elif url.path == "/figures":
+            since = parse_qs(url.query).get("since", ["-1"])[0]
+            try:
+                version = int(since)
+            except ValueError:
+                self._send(HTTPStatus.BAD_REQUEST, b"Invalid since", "text/plain")
+                return
+            version, etags = self.server.figures.wait(version, LONG_POLL_TIMEOUT)
+            body = json.dumps({"version": version, "figures": etags}).encode("utf8")
+            self._send(HTTPStatus.OK, body, "application/json")
+        elif url.path.startswith("/figures/"):
+            self._send_frame(unquote(url.path[len("/figures/") :]))
+        else:
+            self._send(HTTPStatus.NOT_FOUND, b"Not found", "text/plain")
+
+    def _send_frame(self, name: str):
+        frame = self.server.figures.frame(name)
+        if frame is None:
+            self._send(HTTPStatus.NOT_FOUND, b"No such figure", "text/plain")
+            return
+        headers = {"ETag": frame.etag, "Cache-Control": "no-cache"}
+        if frame.etag in self.headers.get("If-None-Match", ""):
+            self._send(HTTPStatus.NOT_MODIFIED, b"", None, headers)
+            return
+        body = frame.body
+        if frame.content_type == "image/svg+xml" and "gzip" in self.headers.get(
+            "Accept-Encoding", ""
+        ):
+            body = gzip.compress(body)
+            headers["Content-Encoding"] = "gzip"
+        self._send(HTTPStatus.OK, body, frame.content_type, headers)
+
+    def _send(
+        self,
+        status: HTTPStatus,
+        body: bytes,
+        content_type: Optional[str],
+        headers: Optional[Dict[str, str]] = None,
+    ):
+        self.send_response(status)
+        if content_type is not None:
+            self.send_header("Content-Type", content_type)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        if status != HTTPStatus.NOT_MODIFIED:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    figures: "FigureServer"
+
+
+class FigureServer:
+    """Serve the last frame of each figure, see the module documentation.
+
+    Args:
+        port: The port to listen on, 0 to pick a free one
+        host: The address to listen on
+    """
+
+    def __init__(self, port: int, host: str = "127.0.0.1"):
+        self._frames: Dict[str, Frame] = {}
+        self._version = 0
+        self._changed = threading.Condition()
+        self._httpd = _Server((host, port), _Handler)
+        self._httpd.figures = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        """The host and port the server listens on."""
+        host, port = self._httpd.server_address[:2]
+        return host, port
+
+    @property
+    def url(self) -> str:
+        host, port = self.address
+        return f"http://{host}:{port}/"
+
+    def start(self) -> None:
+        """Start answering requests, in a daemon thread."""
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, name="liveplot-server", daemon=True
+        )
+        self._thread.start()
+        logger.info(f"Serving the figures at {self.url}")
+
+    def close(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def publish(self, name: str, body: bytes, content_type: str) -> bool:
+        """Serve ``body`` as the figure ``name``, waking up waiting clients.
+
+        Returns:
+            Whether the frame changed
+        """
+        frame = Frame(body, content_type, _etag(body))
+        with self._changed:
+            previous = self._frames.get(name)
+            if previous is not None and previous.etag == frame.etag:
+                return False
+            self._frames[name] = frame
+            self._version += 1
+            self._changed.notify_all()
+        return True
+
+    def frame(self, name: str) -> Optional[Frame]:
+        with self._changed:
+            return self._frames.get(name)
+
+    def wait(self, version: int, timeout: float) -> Tuple[int, Dict[str, str]]:
+        """Wait for the frames to change after ``version``.
+
+        Returns:
+            The current version and the ``ETag`` of each figure, after at most
+            ``timeout`` seconds
+        """
+        with self._changed:
+            self._changed.wait_for(lambda: self._version != version, timeout)
+            etags = {name: frame.etag for name, frame in self._frames.items()}
+            return self._version, etags
+
+
+class ServedInterface(HeadlessInterface):
+    """Render the figure for a :class:`FigureServer` instead of to a file.
+
+    Args:
+        server: The server to publish the frames to
+        name: The name of the figure, served as ``/figures/<name>.<format>``
+        image_format: ``png`` or ``svg``
+    """
+
+    def __init__(self, server: FigureServer, name: str, image_format: str = "png"):
+        super().__init__(Path(f"{name}.{image_format}"))
+        self.server = server
+        self.image_format = image_format
+
+    def draw(self, only_animated: bool = False, sync: bool = False):
+        """Render the figure and publish it if it changed."""
+        buffer = io.BytesIO()
+        # With fixed ids, so that an unchanged figure is not sent again
+        with matplotlib.rc_context({"svg.hashsalt": "liveplot"}):
+            self.fig.savefig(
+                buffer, format=self.image_format, metadata=_METADATA[self.image_format]
+            )
+        name = self.output.name
+        if self.server.publish(
+            name, buffer.getvalue(), _CONTENT_TYPES[self.image_format]
+        ):
+            logger.info(f"Updated figure {name}")
@@ -0,0 +1,111 @@
+"""Save the state of a session on exit, and resume it later.
+
+With ``--snapshot PATH``, the state of each script (see
+:meth:`~liveplot.plot_watcher.PlotWatcher.snapshot`: the results of the
+stages, the hashes of the code that computed them, the data files and the
+rcParams) is written to the directory ``PATH`` when liveplot exits, including
+when the window is closed. ``--restore PATH`` starts from that state, and
+only runs the functions and stages whose code changed since.
+
+Each script is written as a cache entry (see :func:`liveplot.cache.dump`):
+NumPy arrays are stored as ``.npy`` files and memory-mapped when restored, so
+resuming does not read them until they are used. With ``compress``, arrays
+are stored compressed instead, which makes the snapshot smaller but restoring
+reads them in memory.
+
+The snapshot is written to a temporary directory next to ``PATH`` and renamed,
+so an interrupted write leaves the previous snapshot intact.
+"""
+import json
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Iterable
+
+from liveplot import cache as disk
+from liveplot.cache import hash_source
+from liveplot.plot_watcher import PlotWatcher
+
+logger = logging.getLogger("liveplot.snapshot")
+
+SNAPSHOT_VERSION = 1
+
+_MANIFEST = "manifest.json"
+
+
+def _entry_name(file_path: Path) -> str:
+    return hash_source(str(Path(file_path).absolute()))[:16]
+
+
+def save_snapshot(
+    path: Path, watchers: Iterable[PlotWatcher], compress: bool = False
+) -> None:
+    """Write the state of ``watchers`` to the directory ``path``.
+
+    Scripts whose state cannot be pickled are left out, with a warning.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = Path(tempfile.mkdtemp(prefix=f".{path.name}-", dir=path.parent))
+    scripts = {}
+    try:
+        for watcher in watchers:
+            file_path = watcher.plt_module.file_path
+            entry = tmp_path / _entry_name(file_path)
+            entry.mkdir()
+            try:
+                disk.dump(watcher.snapshot(), entry, compress=compress)
+            except Exception as exc:  # pylint: disable=broad-except
+                logger.warning(f"Could not save the state of {file_path}: {exc}")
+                shutil.rmtree(entry, ignore_errors=True)
+                continue
+            scripts[str(Path(file_path).absolute())] = entry.name
+        manifest = {"version": SNAPSHOT_VERSION, "scripts": scripts}
+        (tmp_path / _MANIFEST).write_text(json.dumps(manifest), encoding="utf8")
+
+        # The arrays of a restored snapshot may still be mapped, they stay
+        # readable after their files are removed
+        old_path = None
+        if path.exists():
+            old_path = Path(tempfile.mkdtemp(prefix=f".{path.name}-", dir=path.parent))
+            os.replace(path, old_path / path.name)
+        os.replace(tmp_path, path)
+        if old_path is not None:
+            shutil.rmtree(old_path, ignore_errors=True)
+    finally:
+        if tmp_path.exists():
+            shutil.rmtree(tmp_path, ignore_errors=True)
+    logger.info(f"Saved the session to {path}")
+
+
+def restore_snapshot(path: Path, watchers: Iterable[PlotWatcher]) -> None:
+    """Restore the state of ``watchers`` saved in ``path``, when saved.
+
+    Scripts not in the snapshot start from scratch, and so do all of them if
+    the snapshot cannot be read, with a warning.
+    """
+    path = Path(path)
+    try:
+        manifest = json.loads((path / _MANIFEST).read_text(encoding="utf8"))
+    except (OSError, ValueError) as exc:
+        logger.warning(f"Could not read the snapshot {path}: {exc}")
+        return
+    if manifest.get("version") != SNAPSHOT_VERSION:
+        logger.warning(f"The snapshot {path} was made by another version of liveplot")
+        return
+
+    for watcher in watchers:
+        file_path = watcher.plt_module.file_path
+        entry = manifest["scripts"].get(str(Path(file_path).absolute()))
+        if entry is None:
+            logger.info(f"{file_path} is not in the snapshot {path}")
+            continue
+        try:
+            state = disk.load(path / entry)
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.warning(f"Could not restore the state of {file_path}: {exc}")
+            continue
+        watcher.restore(state)
+        logger.info(f"Restored the session of {file_path} from {path}")
@@ -0,0 +1,96 @@
+"""Support for ``load_data`` functions that yield the data in chunks.
+
+If ``load_data`` is a generator function, each chunk it yields is passed
+through ``postprocess_chunk`` and folded into the data with ``combine``::
+
+    def load_data():
+        for path in sorted(glob.glob("logs/*.csv")):
+            yield np.loadtxt(path)
+
+    def postprocess_chunk(chunk):      # default: identity
+        return chunk[::10]
+
+    def combine(data, chunk):          # default: collect the chunks in a list
+        return chunk if data is None else np.concatenate([data, chunk])
+
+The figure is redrawn with the data accumulated so far at most every
+:data:`DEFAULT_REDRAW_INTERVAL` seconds, so the shape of the plot appears
+before the whole dataset is loaded. Reducing the chunks in ``combine`` keeps
+the peak memory bounded.
+
+Other iterators returned by ``load_data`` (``map``, ``zip``, file objects,
+...) are the data, as any other value.
+"""
+import inspect
+import time
+from typing import Any, Callable, Iterable, Optional
+
+from liveplot.module_loader import PlottingModuleError
+
+DEFAULT_REDRAW_INTERVAL = 0.5
+
+
+def is_stream(data: Any) -> bool:
+    """Whether ``load_data`` returned chunks rather than the data."""
+    return inspect.isgenerator(data)
+
+
+class Throttle:
+    """Lets an action through at most once every ``interval`` seconds."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._last: Optional[float] = None
+
+    def ready(self) -> bool:
+        now = time.monotonic()
+        if self._last is None or now - self._last >= self.interval:
+            self._last = now
+            return True
+        return False
+
+
+def _chunks(stream: Iterable) -> Iterable:
+    """Iterate over ``stream``, wrapping errors raised by the user generator."""
+    iterator = iter(stream)
+    while True:
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        except Exception as exc:
+            raise PlottingModuleError(
+                "Plotting triggered an exception in `load_data`, trying to recover"
+            ) from exc
+        yield chunk
+
+
+def consume(
+    stream: Iterable,
+    postprocess_chunk: Callable,
+    combine: Callable,
+    on_partial: Optional[Callable[[Any], None]] = None,
+    interval: float = DEFAULT_REDRAW_INTERVAL,
+) -> Any:
+    """Fold the chunks of ``stream`` into the data.
+
+    Args:
+        stream: The chunks returned by ``load_data``
+        postprocess_chunk: Applied to each chunk
+        combine: ``combine(data, chunk)`` returns the data with the chunk added,
+            ``data`` is ``None`` for the first chunk.
+        on_partial: Called with the data accumulated so far, at most every
+            ``interval`` seconds
+        interval: Minimum time between two calls to ``on_partial``
+
+    Returns:
+        The accumulated data, ``None`` if the stream is empty.
+    """
+    data = None
+    throttle = Throttle(interval)
+    throttle.ready()  # No partial update before the first interval
+    for chunk in _chunks(stream):
+        data = combine(data, postprocess_chunk(chunk))
+        if on_partial is not None and throttle.ready():
+            on_partial(data)
+    return data
@@ -0,0 +1,342 @@
+"""Render the figure of a script for many parameter sets, with ``--sweep PATH``.
+
+The script declares the parameter sets with a ``sweep`` function, returning
+either a grid (a dict of lists, of which every combination is rendered) or a
+list of dicts::
+
+    def sweep():
+        return {"seed": [0, 1, 2], "lr": [0.1, 0.01]}
+
+    def load_data(seed):
+        return np.load(f"runs/{seed}.npy")
+
+    def make_figure(fig, data, seed, lr):
+        fig.add_subplot(111).plot(data[lr])
+
+``load_data``, ``postprocess`` and ``make_figure`` get the parameters they
+name (all of them if they take ``**kwargs``). The variants that need the same
+``load_data`` and ``postprocess`` are rendered by the same task, which loads
+the data once. The tasks run in a pool of ``--jobs`` processes, and the
+results of ``load_data`` are cached on disk per parameter set.
+
+``PATH`` is a directory, where each variant is rendered to
+``<name>=<value>,....png``, or an image, in which case the variants are
+rendered to the directory ``<image stem>.variants`` next to it and tiled into
+the image (a contact sheet).
+
+When the script changes, only the variants whose code or parameters changed
+are rendered again, and the images of the variants that were removed from
+the sweep are deleted. Scripts declaring stages are not supported.
+"""
+import concurrent.futures
+import importlib
+import inspect
+import itertools
+import logging
+import math
+import os
+import re
+import threading
+import traceback
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+import matplotlib
+
+from liveplot.background import (
+    bind_data_functions,
+    compute_data,
+    load_key,
+    mp_context,
+)
+from liveplot.cache import DataCache, hash_source, script_scope
+from liveplot.module_loader import ModuleLoader, PlottingModuleError
+
+logger = logging.getLogger("liveplot.sweep")
+
+Parameters = Dict[str, Any]
+
+# Width (inches) of each variant in the contact sheet
+SHEET_CELL_WIDTH = 4.0
+
+# The loaders of the scripts in a worker process, kept between tasks
+_loaders: Dict[Path, ModuleLoader] = {}
+_loaders_lock = threading.Lock()
+
+
+def parameter_sets(sweep: Any) -> List[Parameters]:
+    """The parameter sets declared by the return value of ``sweep``.
+
+    Raises:
+        ValueError if ``sweep`` is neither a dict of lists nor a list of dicts.
+    """
+    if isinstance(sweep, Mapping):
+        names = list(sweep)
+        values = [list(sweep[name]) for name in names]
+        return [
+            dict(zip(names, combination)) for combination in itertools.product(*values)
+        ]
+    sets = list(sweep)
+    if not all(isinstance(params, Mapping) for params in sets):
+        raise ValueError("sweep must return a dict of lists or a list of dicts")
+    return [dict(params) for params in sets]
+
+
+def variant_name(params: Parameters) -> str:
+    """A file name for the variant ``params``, such as ``seed=0,lr=0.1``."""
+    name = ",".join(f"{key}={value}" for key, value in params.items())
+    return re.sub(r"[^\w.,=+-]", "_", name) or "default"
+
+
+def arguments(signature: inspect.Signature, params: Parameters) -> Parameters:
+    """The parameters of ``params`` named in ``signature``."""
+    if any(p.kind is p.VAR_KEYWORD for p in signature.parameters.values()):
+        return dict(params)
+    return {key: value for key, value in params.items() if key in signature.parameters}
+
+
+def _loader(file_path: Path) -> ModuleLoader:
+    with _loaders_lock:
+        if file_path not in _loaders:
+            _loaders[file_path] = ModuleLoader(file_path)
+        loader = _loaders[file_path]
+        if loader.should_reload():
+            loader.load_module()
+        return loader
+
+
+def _render(loader: ModuleLoader, data_post: Any, params: Parameters, path: Path):
+    plt = importlib.import_module("matplotlib.pyplot")
+    with plt.rc_context():
+        loader.call("settings", plt)
+        fig = plt.figure()
+        try:
+            loader.call(
+                "make_figure",
+                fig,
+                data_post,
+                **arguments(loader.signature("make_figure"), params),
+            )
+            tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+            try:
+                fig.savefig(tmp_path, format=path.suffix[1:])
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        finally:
+            plt.close(fig)
+
+
+def _error(exc: BaseException) -> Tuple[str, str]:
+    if isinstance(exc, PlottingModuleError) and exc.__cause__ is not None:
+        cause = exc.__cause__
+        formatted = traceback.format_exception(type(cause), cause, cause.__traceback__)
+        return str(exc), "".join(formatted)
+    return f"Sweep worker failed: {exc}", traceback.format_exc()
+
+
+def _render_variants(
+    file_path: Path,
+    load_params: Parameters,
+    post_params: Parameters,
+    cache: Optional[DataCache],
+    cache_key: Optional[str],
+    variants: List[Tuple[Parameters, Path]],
+) -> List[Tuple[Path, Optional[Tuple[str, str]]]]:
+    """Entry point of the worker processes: load the data once, render each variant.
+
+    Returns:
+        The path of each variant, with the error message and traceback if it
+        could not be rendered
+    """
+    matplotlib.use("agg")
+    try:
+        loader = _loader(file_path)
+        functions = bind_data_functions(loader, load_params, post_params)
+        _, data_post = compute_data(functions, True, None, cache, cache_key)
+    except Exception as exc:  # pylint: disable=broad-except
+        error = _error(exc)
+        return [(path, error) for _, path in variants]
+
+    results: List[Tuple[Path, Optional[Tuple[str, str]]]] = []
+    for params, path in variants:
+        try:
+            _render(loader, data_post, params, path)
+            results.append((path, None))
+        except Exception as exc:  # pylint: disable=broad-except
+            results.append((path, _error(exc)))
+    return results
+
+
+def make_executor(workers: int) -> concurrent.futures.ProcessPoolExecutor:
+    """The pool of processes rendering the variants of all scripts."""
+    return concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, mp_context=mp_context()
+    )
+
+
+def write_contact_sheet(images: List[Path], output: Path) -> None:
+    """Tile ``images`` into ``output``, each with its name as title."""
+    # pylint: disable=import-outside-toplevel
+    import matplotlib.image
+    from matplotlib.figure import Figure
+
+    columns = max(1, math.ceil(math.sqrt(len(images))))
+    rows = max(1, math.ceil(len(images) / columns))
+    pixels = [matplotlib.image.imread(str(image)) for image in images]
+    aspect = pixels[0].shape[0] / pixels[0].shape[1] if pixels else 1.0
+    fig = Figure(
+        figsize=(SHEET_CELL_WIDTH * columns, SHEET_CELL_WIDTH * aspect * rows * 1.1)
+    )
+    for index, (image, pixel) in enumerate(zip(images, pixels)):
+        ax = fig.add_subplot(rows, columns, index + 1)
+        ax.imshow(pixel)
+        ax.set_title(image.stem, fontsize="small")
+        ax.set_axis_off()
+    fig.tight_layout()
+    tmp_path = output.with_name(f".{output.name}.{os.getpid()}.tmp")
+    try:
+        fig.savefig(tmp_path, format=output.suffix[1:])
+        os.replace(tmp_path, output)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class SweepWatcher:
+    """Render every variant of a script again when it changes.
+
+    Args:
+        file_path: The script, which defines ``sweep``
+        output: A directory for the images of the variants, or an image file
+            for a contact sheet
+        executor: The pool of processes rendering the variants
+        cache: Where to save the results of ``load_data`` of each variant
+    """
+
+    def __init__(
+        self,
+        file_path: Path,
+        output: Path,
+        executor: concurrent.futures.Executor,
+        cache: Optional[DataCache] = None,
+    ):
+        self.plt_module = ModuleLoader(file_path)
+        self.output = Path(output)
+        self.executor = executor
+        self.cache = (
+            cache.scoped(script_scope(file_path)) if cache is not None else None
+        )
+        # The key of each rendered image, to render only the changed variants
+        self._rendered: Dict[Path, str] = {}
+
+    @property
+    def sheet(self) -> Optional[Path]:
+        """The contact sheet to write, if ``output`` is an image."""
+        return self.output if self.output.suffix else None
+
+    @property
+    def directory(self) -> Path:
+        """The directory of the images of the variants."""
+        if self.sheet is None:
+            return self.output
+        return self.output.with_name(f"{self.output.stem}.variants")
+
+    def refresh(self):
+        if not self.plt_module.should_reload():
+            return
+        try:
+            self.plt_module.load_module()
+        except ImportError as exc:
+            logger.error(exc.msg)
+            logger.exception(exc.__cause__, exc_info=exc.__cause__)
+            return
+
+        try:
+            self._render_changed()
+        except PlottingModuleError as exc:
+            logger.error(str(exc))
+            logger.exception(exc.__cause__, exc_info=exc.__cause__)
+
+    def _variants(self) -> List[Parameters]:
+        loader = self.plt_module
+        if not loader.defines("sweep"):
+            raise PlottingModuleError(f"{loader.file_path} does not define sweep")
+        if loader.stages():
+            raise PlottingModuleError("Sweeps do not support stages")
+        try:
+            return parameter_sets(loader.call("sweep"))
+        except (TypeError, ValueError) as exc:
+            raise PlottingModuleError("sweep returned invalid parameters") from exc
+
+    def _render_changed(self):
+        loader = self.plt_module
+        variants = self._variants()
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        # The variants to render, grouped by the data they need
+        groups: Dict[str, Tuple[Parameters, Parameters, str, list]] = {}
+        keys: Dict[Path, str] = {}
+        for params in variants:
+            load_params = arguments(loader.signature("load_data"), params)
+            post_params = arguments(loader.signature("postprocess"), params)
+            cache_key = hash_source(
+                load_key(loader), "sweep", repr(sorted(load_params.items()))
+            )
+            group = hash_source(
+                cache_key,
+                loader.func_hash("postprocess"),
+                repr(sorted(post_params.items())),
+            )
+            path = self.directory / f"{variant_name(params)}.png"
+            keys[path] = hash_source(
+                group,
+                loader.func_hash("settings"),
+                loader.func_hash("make_figure"),
+                repr(sorted(params.items())),
+            )
+            if self._rendered.get(path) == keys[path] and path.exists():
+                continue
+            groups.setdefault(group, (load_params, post_params, cache_key, []))
+            groups[group][3].append((params, path))
+
+        removed = [path for path in self._rendered if path not in keys]
+        for path in removed:
+            del self._rendered[path]
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+        futures = [
+            self.executor.submit(
+                _render_variants,
+                loader.file_path,
+                load_params,
+                post_params,
+                self.cache,
+                cache_key if self.cache is not None else None,
+                todo,
+            )
+            for load_params, post_params, cache_key, todo in groups.values()
+        ]
+        rendered = 0
+        for future in concurrent.futures.as_completed(futures):
+            for path, error in future.result():
+                if error is None:
+                    self._rendered[path] = keys[path]
+                    rendered += 1
+                else:
+                    message, formatted = error
+                    logger.error(f"Could not render {path.name}: {message}")
+                    logger.error(formatted)
+        logger.info(
+            f"Rendered {rendered} of {len(variants)} variants "
+            f"of {loader.file_path.name} to {self.directory}"
+        )
+
+        if self.sheet is not None and (futures or removed or not self.sheet.exists()):
+            images = [path for path in keys if path in self._rendered]
+            write_contact_sheet(images, self.sheet)
+            logger.info(f"Saved the contact sheet to {self.sheet}")
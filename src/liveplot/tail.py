@@ -0,0 +1,89 @@
+"""Read only what was appended to a file, for ``load_data_incremental``.
+
+A script can define ``load_data_incremental(data, offset)`` instead of
+``load_data``. It is called with ``(None, None)`` to load the data, and
+returns the data and an offset of its choosing, for example how far it read
+into the file. When the data files are appended to (see
+:mod:`liveplot.data_files`), it is called again with the current data and
+that offset, and returns the data with the new part appended::
+
+    from liveplot import tail
+
+    def load_data_incremental(data, offset):
+        lines, offset = tail.read_lines("train.log", offset)
+        if not lines:
+            return data, offset
+        rows = np.loadtxt(lines, delimiter=",", ndmin=2)
+        return tail.extend(data, rows), offset
+
+so each refresh reads the new lines only. If the files are replaced,
+truncated or rewritten, or if the function changes, it is called with
+``(None, None)`` again.
+
+The helpers below read the lines (:func:`read_lines`) or fixed-size binary
+records (:func:`read_records`, memory-mapping the new part) after an offset,
+and concatenate the new data to the arrays of the data (:func:`extend`).
+"""
+import os
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+
+
+def read_lines(
+    path, offset: Optional[int] = None, encoding: str = "utf8"
+) -> Tuple[List[str], int]:
+    """The complete lines of ``path`` after the byte ``offset``.
+
+    A last line without end of line is left for the next call, as it may
+    still be being written.
+
+    Returns:
+        The lines (without end of line) and the offset after the last one
+    """
+    offset = offset or 0
+    with open(path, "rb") as file:
+        file.seek(offset)
+        chunk = file.read()
+    end = chunk.rfind(b"\n") + 1
+    return chunk[:end].decode(encoding).splitlines(), offset + end
+
+
+def read_records(path, dtype, offset: Optional[int] = None) -> Tuple[np.ndarray, int]:
+    """The complete records of ``dtype`` in ``path`` after the byte ``offset``.
+
+    Only the part of the file after ``offset`` is mapped in memory and copied.
+
+    Returns:
+        The records, as a 1-d array, and the offset after the last one
+    """
+    dtype = np.dtype(dtype)
+    offset = offset or 0
+    count = (os.path.getsize(path) - offset) // dtype.itemsize
+    if count <= 0:
+        return np.empty(0, dtype=dtype), offset
+    records = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(count,))
+    return np.array(records), offset + count * dtype.itemsize
+
+
+def extend(data: Any, new: Any) -> Any:
+    """``data`` with ``new`` appended, array by array.
+
+    Arrays are concatenated along their first axis, lists are concatenated,
+    and tuples and dicts are extended item by item. ``data`` is not modified.
+
+    Returns:
+        ``new`` if ``data`` is ``None``
+    """
+    if data is None:
+        return new
+    if isinstance(data, np.ndarray):
+        return np.concatenate([data, new])
+    if isinstance(data, list):
+        return data + list(new)
+    if isinstance(data, tuple):
+        items = [extend(old, add) for old, add in zip(data, new)]
+        return type(data)(*items) if hasattr(data, "_fields") else tuple(items)
+    if isinstance(data, dict):
+        return {key: extend(value, new[key]) for key, value in data.items()}
+    raise TypeError(f"Cannot append to data of type {type(data).__name__}")
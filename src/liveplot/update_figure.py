@@ -0,0 +1,61 @@
+"""The data artists of a figure updated in place, and what its background shows.
+
+In incremental mode, :class:`~liveplot.plot_watcher.PlotWatcher` builds the
+figure with ``make_figure`` once, and when only the data changes, calls the
+``update_figure`` function of the script with what ``make_figure`` returned::
+
+    def make_figure(fig, data):
+        ax = fig.add_subplot(111)
+        return ax.plot(data)
+
+    def update_figure(fig, data, lines):
+        lines[0].set_ydata(data)
+
+The figure is never cleared, so ``make_figure`` does not run again and the
+artists keep their identity. An edit of ``make_figure`` or ``settings``
+rebuilds the figure.
+
+If the limits, ticks and labels are the same after the update (see
+:func:`static_state`), only the data artists (see :func:`data_artists`) have
+to be redrawn, over a cached background with ``--blit``.
+"""
+from typing import List, Tuple
+
+from matplotlib.artist import Artist
+
+
+def _children(ax) -> List[List[Artist]]:
+    return [list(ax.lines), list(ax.collections), list(ax.images)]
+
+
+def data_artists(fig) -> List[Artist]:
+    """The artists showing data, which change when the data changes."""
+    return [
+        artist for ax in fig.axes for children in _children(ax) for artist in children
+    ]
+
+
+def static_state(fig) -> Tuple:
+    """What the background of the figure depends on, besides the data artists.
+
+    If it is the same before and after an update, only the data artists have
+    to be redrawn.
+    """
+    return (
+        tuple(fig.get_size_inches()),
+        fig.dpi,
+        tuple(
+            (
+                ax.get_xlim(),
+                ax.get_ylim(),
+                tuple(ax.get_position().bounds),
+                tuple(ax.get_xticks()),
+                tuple(ax.get_yticks()),
+                ax.get_xlabel(),
+                ax.get_ylabel(),
+                ax.get_title(),
+            )
+            for ax in fig.axes
+        ),
+        tuple(text.get_text() for text in fig.texts),
+    )
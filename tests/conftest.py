@@ -1,19 +1,14 @@
 import itertools
-import os
-import string
 import tempfile
+import textwrap
 from collections import namedtuple
 from pathlib import Path
-from random import choices
-from typing import Optional
+from typing import List
+from unittest.mock import Mock
 
 import pytest
 
-
-@pytest.fixture(scope="session")
-def session_tmp_dir():
-    with tempfile.TemporaryDirectory() as tmpdirname:
-        yield tmpdirname
+from liveplot.plot_watcher import PlotWatcher
 
 
 @pytest.fixture(scope="function")
@@ -37,23 +32,37 @@ def mock_stat():
 
 
 @pytest.fixture(scope="session")
-def make_module(session_tmp_dir):  # pylint: disable=redefined-outer-name
-    def _make_module(module_code, filepath: Optional[Path] = None) -> Path:
-        """Write the module code to a file and return the Path.
+def write_file():
+    def _write_file(filepath: Path, content: str) -> Path:
+        """Write the dedented content to ``filepath`` and return it."""
+        with open(filepath, "w", encoding="utf8") as file_handler:
+            file_handler.write(textwrap.dedent(content))
+        return filepath
+
+    return _write_file
 
-        The filename is random if not specified.
 
-        The Path object has a stat().st_mtime in the past.
-        The :class:`~module_loader` checks it to decide whether to reload.
-        We don't want to have to time.sleep(1) between calls.
+@pytest.fixture(scope="session")
+def make_watcher():
+    def _make_watcher(filepath: Path, plt_interface=None, **kwargs) -> PlotWatcher:
+        """A watcher of ``filepath`` recording the functions of the script it calls.
+
+        See ``called``. ``watcher.plt_module.call.reset_mock()`` forgets the
+        calls made so far.
         """
-        if filepath is None:
-            filename = "".join(choices(string.ascii_uppercase, k=10)) + ".py"
-            filepath = Path(os.path.join(session_tmp_dir, filename))
+        if plt_interface is None:
+            plt_interface = Mock(rc_params={})
+        watcher = PlotWatcher.from_path(filepath, plt_interface, **kwargs)
+        watcher.plt_module.call = Mock(wraps=watcher.plt_module.call)
+        return watcher
 
-        with open(filepath, "w", encoding="utf8") as file_handler:
-            file_handler.write(module_code)
+    return _make_watcher
 
-        return filepath
 
-    return _make_module
+@pytest.fixture(scope="session")
+def called():
+    def _called(watcher: PlotWatcher) -> List[str]:
+        """The functions of the script called by a watcher of ``make_watcher``."""
+        return [args[0] for args, _ in watcher.plt_module.call.call_args_list]
+
+    return _called
@@ -0,0 +1,178 @@
+import glob
+import os
+import textwrap
+import time
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+import numpy as np
+import pytest
+
+from liveplot.background import BACKGROUND_MODES, WorkerRunner, make_runner
+from liveplot.cli import configure_logs
+from liveplot.plot_watcher import PlotWatcher
+
+# pylint: disable=missing-docstring
+
+slow_script = textwrap.dedent(
+    """
+    import time
+
+    def load_data():
+        time.sleep({delay})
+        return 1
+
+    def postprocess(data):
+        return data + {offset}
+    """
+)
+
+
+def wait_for(watcher: PlotWatcher, timeout: float = 10):
+    start = time.monotonic()
+    while watcher.busy and time.monotonic() - start < timeout:
+        watcher.poll_background()
+        time.sleep(0.01)
+    assert not watcher.busy
+
+
+@pytest.mark.parametrize("mode", BACKGROUND_MODES)
+def test_refresh_returns_before_data_is_loaded(mode, make_module):
+    filepath = make_module(slow_script.format(delay=0.2, offset=1))
+    watcher = PlotWatcher.from_path(filepath, Mock(), runner=make_runner(mode))
+
+    watcher.refresh()
+
+    assert watcher.busy
+    assert watcher.data_post is None
+    wait_for(watcher)
+    assert watcher.data == 1
+    assert watcher.data_post == 2
+    watcher.plt_interface.draw.assert_called()
+
+
+@pytest.mark.parametrize("mode", BACKGROUND_MODES)
+def test_save_supersedes_computation(mode, make_module, mock_stat):
+    filepath = make_module(slow_script.format(delay=0.2, offset=1))
+    watcher = PlotWatcher.from_path(filepath, Mock(), runner=make_runner(mode))
+    watcher.refresh()
+
+    make_module(slow_script.format(delay=0.2, offset=10), filepath=filepath)
+    with patch.object(Path, "stat", return_value=mock_stat(filepath)):
+        watcher.refresh()
+
+    wait_for(watcher)
+    assert watcher.data == 1
+    assert watcher.data_post == 11
+
+
+@pytest.mark.parametrize("mode", BACKGROUND_MODES)
+def test_postprocess_only_change_keeps_data(mode, make_module, mock_stat):
+    filepath = make_module(slow_script.format(delay=0, offset=1))
+    watcher = PlotWatcher.from_path(filepath, Mock(), runner=make_runner(mode))
+    watcher.refresh()
+    wait_for(watcher)
+
+    make_module(slow_script.format(delay=0, offset=2), filepath=filepath)
+    with patch.object(Path, "stat", return_value=mock_stat(filepath)):
+        watcher.refresh()
+
+    assert not watcher.plt_module.func_has_changed("load_data")
+    wait_for(watcher)
+    assert watcher.data == 1
+    assert watcher.data_post == 3
+
+
+@pytest.mark.parametrize("mode", BACKGROUND_MODES)
+def test_logging_error_in_background(mode, make_module, caplog):
+    configure_logs()
+    filepath = make_module(
+        textwrap.dedent(
+            """
+            def load_data():
+                a = {"k": 0}
+                return a["not_k"]
+            """
+        )
+    )
+    watcher = PlotWatcher.from_path(filepath, Mock(), runner=make_runner(mode))
+    watcher.refresh()
+    wait_for(watcher)
+
+    assert "Plotting triggered an exception" in caplog.text
+    assert "not_k" in caplog.text
+
+
+worker_script = textwrap.dedent(
+    """
+    import os
+    import numpy as np
+
+    def load_data():
+        with open({log!r}, "a") as log:
+            log.write("load\\n")
+        return np.arange(1000)
+
+    def postprocess(data):
+        {postprocess}
+    """
+)
+
+
+def loads(log: Path) -> int:
+    return log.read_text().count("load")
+
+
+def test_worker_keeps_data_across_crashes(make_module, mock_stat, tmp_dir):
+    log = Path(tmp_dir) / "log.txt"
+    runner = WorkerRunner()
+    filepath = make_module(
+        worker_script.format(log=str(log), postprocess="return data * 2")
+    )
+    watcher = PlotWatcher.from_path(filepath, Mock(), runner=runner)
+
+    def edit(postprocess):
+        make_module(
+            worker_script.format(log=str(log), postprocess=postprocess), filepath
+        )
+        with patch.object(Path, "stat", return_value=mock_stat(filepath)):
+            watcher.refresh()
+        wait_for(watcher)
+
+    try:
+        watcher.refresh()
+        wait_for(watcher)
+        assert watcher.data is None  # The data stays in the worker
+        assert np.array_equal(watcher.data_post, np.arange(1000) * 2)
+
+        edit("os._exit(1)")
+        assert np.array_equal(watcher.data_post, np.arange(1000) * 2)
+
+        edit("return data * 3")
+        assert np.array_equal(watcher.data_post, np.arange(1000) * 3)
+        assert loads(log) == 1
+    finally:
+        runner.close()
+    assert not glob.glob(os.path.join("/dev/shm", "liveplot-*"))
+
+
+@pytest.mark.parametrize("worker", [False, True], ids=["process", "worker"])
+def test_child_processes_do_not_inherit_the_gui_backend(worker, make_module):
+    pytest.importorskip("matplotlib.backends.backend_tkagg")
+    runner = WorkerRunner() if worker else make_runner("process")
+    script = textwrap.dedent(
+        """
+        import sys
+
+        def load_data():
+            return "matplotlib.backends.backend_tkagg" in sys.modules
+        """
+    )
+    watcher = PlotWatcher.from_path(make_module(script), Mock(), runner=runner)
+    try:
+        watcher.refresh()
+        wait_for(watcher)
+    finally:
+        if worker:
+            runner.close()
+    assert watcher.data_post is False
@@ -0,0 +1,194 @@
+import logging
+import os
+import textwrap
+from pathlib import Path
+from unittest.mock import Mock
+
+import numpy as np
+import pytest
+
+from liveplot.cache import DataCache
+from liveplot.plot_watcher import PlotWatcher
+
+# pylint: disable=missing-docstring
+
+
+def test_roundtrip_nested_data(tmp_dir):
+    cache = DataCache(Path(tmp_dir))
+    data = {"x": np.arange(10), "meta": ["a", 1, None], "y": (np.ones((2, 3)),)}
+
+    assert cache.save("key", data)
+    assert "key" in cache
+    restored = cache.load("key")
+
+    assert isinstance(restored["x"], np.memmap)
+    assert np.array_equal(restored["x"], data["x"])
+    assert np.array_equal(restored["y"][0], data["y"][0])
+    assert restored["meta"] == data["meta"]
+
+
+def test_restored_arrays_are_copy_on_write(tmp_dir):
+    cache = DataCache(Path(tmp_dir))
+    cache.save("key", np.zeros(3))
+
+    restored = cache.load("key")
+    restored[0] = 1
+
+    assert cache.load("key")[0] == 0
+
+
+def test_missing_key(tmp_dir):
+    cache = DataCache(Path(tmp_dir))
+    assert "key" not in cache
+    with pytest.raises(KeyError):
+        cache.load("key")
+
+
+def test_unpicklable_data_is_not_cached(tmp_dir):
+    cache = DataCache(Path(tmp_dir))
+    assert not cache.save("key", lambda x: x)
+    assert "key" not in cache
+
+
+def test_evicts_least_recently_used(tmp_dir):
+    array = np.zeros(1000)
+    cache = DataCache(Path(tmp_dir), max_size=int(2.5 * array.nbytes))
+
+    cache.save("first", array)
+    cache.save("second", array)
+    os.utime(Path(tmp_dir) / "first", (0, 0))
+    os.utime(Path(tmp_dir) / "second", (1, 1))
+    cache.save("third", array)
+
+    assert "first" not in cache
+    assert "second" in cache
+    assert "third" in cache
+
+
+def test_clear(tmp_dir):
+    cache = DataCache(Path(tmp_dir) / "cache")
+    cache.save("key", 1)
+    cache.clear()
+    assert "key" not in cache
+    assert cache.size() == 0
+
+
+def test_plot_watcher_restores_load_data_from_cache(make_module, tmp_dir, caplog):
+    caplog.set_level(logging.INFO, logger="liveplot")
+    counter_file = Path(tmp_dir) / "calls.txt"
+    filepath = make_module(
+        textwrap.dedent(
+            f"""
+            import numpy as np
+
+            def load_data():
+                with open({str(counter_file)!r}, "a") as f:
+                    f.write("x")
+                return np.arange(5)
+            """
+        )
+    )
+    cache = DataCache(Path(tmp_dir) / "cache")
+
+    first = PlotWatcher.from_path(filepath, Mock(), cache=cache)
+    first.refresh()
+    assert "Reloaded load_data" in caplog.text
+    caplog.clear()
+    second = PlotWatcher.from_path(filepath, Mock(), cache=cache)
+    second.refresh()
+
+    assert "Restored load_data from cache" in caplog.text
+    assert "Reloaded load_data" not in caplog.text
+    assert counter_file.read_text() == "x"
+    assert np.array_equal(second.data, np.arange(5))
+    assert not second.plt_module.func_has_changed("load_data")
+
+
+@pytest.mark.parametrize(
+    "data_path",
+    ['"data.txt"', 'Path(__file__).parent / "data.txt"'],
+    ids=["working_directory", "script_directory"],
+)
+def test_scripts_in_other_directories_do_not_share_entries(
+    make_module, tmp_dir, monkeypatch, data_path
+):
+    cache = DataCache(Path(tmp_dir) / "cache")
+    data = []
+    for name in ("A", "B"):
+        directory = Path(tmp_dir) / name
+        directory.mkdir()
+        (directory / "data.txt").write_text(f"data of {name}\n")
+        filepath = make_module(
+            textwrap.dedent(
+                f"""
+                from pathlib import Path
+
+                def load_data():
+                    return Path({data_path}).read_text()
+                """
+            ),
+            directory / "plot.py",
+        )
+        monkeypatch.chdir(directory)
+        watcher = PlotWatcher.from_path(filepath, Mock(), cache=cache)
+        watcher.refresh()
+        data.append(watcher.data)
+
+    assert data == ["data of A\n", "data of B\n"]
+
+
+chunked_script = textwrap.dedent(
+    """
+    def load_data():
+        yield from range(3)
+
+    def postprocess_chunk(chunk):
+        return [{factor} * chunk]
+
+    def combine(data, chunk):
+        return chunk if data is None else data + chunk
+
+    def make_figure(fig, data):
+        pass
+    """
+)
+
+
+def edit(make_module, filepath: Path, code: str):
+    make_module(code, filepath=filepath)
+    # Newer than the last load, without patching Path.stat for the cache
+    mtime = filepath.stat().st_mtime + 10
+    os.utime(filepath, (mtime, mtime))
+
+
+def test_chunk_functions_are_part_of_the_cache_key(make_module, tmp_dir):
+    cache = DataCache(Path(tmp_dir) / "cache")
+    filepath = make_module(chunked_script.format(factor=1))
+    watcher = PlotWatcher.from_path(filepath, Mock(), cache=cache)
+    watcher.refresh()
+    assert watcher.data == [0, 1, 2]
+
+    edit(make_module, filepath, chunked_script.format(factor=100))
+    watcher.refresh()
+    assert watcher.data == [0, 100, 200]
+
+    restarted = PlotWatcher.from_path(filepath, Mock(), cache=cache)
+    restarted.refresh()
+    assert restarted.data == [0, 100, 200]
+    for f_name in ("load_data", "postprocess_chunk", "combine"):
+        assert not restarted.plt_module.func_has_changed(f_name)
+
+
+def test_restored_data_is_not_loaded_again(make_module, tmp_dir, make_watcher, called):
+    cache = DataCache(Path(tmp_dir) / "cache")
+    filepath = make_module(chunked_script.format(factor=1))
+    PlotWatcher.from_path(filepath, Mock(), cache=cache).refresh()
+    watcher = make_watcher(filepath, cache=cache)
+    watcher.refresh()
+
+    edited = chunked_script.format(factor=1).replace("pass", "fig.edited = True")
+    edit(make_module, filepath, edited)
+    watcher.plt_module.call.reset_mock()
+    watcher.refresh()
+
+    assert called(watcher) == ["make_figure"]
@@ -0,0 +1,161 @@
+import sys
+import textwrap
+from pathlib import Path
+from unittest.mock import Mock
+
+import pytest
+
+from liveplot.cache import DataCache
+from liveplot.plot_watcher import PlotWatcher
+
+# pylint: disable=missing-docstring
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(sys, "addaudithook"), reason="Recording needs audit hooks"
+)
+
+
+def append(path: Path, text: str):
+    with open(path, "a", encoding="utf8") as file:
+        file.write(text)
+
+
+def test_changed_data_file_reloads_the_data_only(make_module, tmp_dir):
+    log = Path(tmp_dir) / "train.log"
+    log.write_text("1\n2\n")
+    filepath = make_module(
+        textwrap.dedent(
+            f"""
+            def load_data():
+                with open({str(log)!r}, encoding="utf8") as file:
+                    return [int(line) for line in file]
+
+            def make_figure(fig, data):
+                fig.my_data = data
+            """
+        )
+    )
+    watcher = PlotWatcher.from_path(filepath, Mock())
+    watcher.refresh()
+    assert watcher.data_files == {log}
+    assert watcher.plt_interface.fig.my_data == [1, 2]
+
+    watcher.plt_module.load_module = Mock(wraps=watcher.plt_module.load_module)
+    watcher.refresh()
+    assert watcher.plt_interface.fig.my_data == [1, 2]
+
+    append(log, "3\n")
+    watcher.refresh()
+    assert watcher.plt_interface.fig.my_data == [1, 2, 3]
+    watcher.plt_module.load_module.assert_not_called()
+
+
+def test_stale_cached_data_is_not_restored(make_module, tmp_dir):
+    log = Path(tmp_dir) / "train.log"
+    log.write_text("1\n")
+    filepath = make_module(
+        textwrap.dedent(
+            f"""
+            def load_data():
+                return open({str(log)!r}, encoding="utf8").read().split()
+
+            def make_figure(fig, data):
+                fig.my_data = data
+            """
+        )
+    )
+    cache = DataCache(Path(tmp_dir) / "cache")
+    PlotWatcher.from_path(filepath, Mock(), cache=cache).refresh()
+
+    watcher = PlotWatcher.from_path(filepath, Mock(), cache=cache)
+    watcher.refresh()
+    assert watcher.plt_interface.fig.my_data == ["1"]
+
+    log.write_text("2\n")
+    watcher = PlotWatcher.from_path(filepath, Mock(), cache=cache)
+    watcher.refresh()
+    assert watcher.plt_interface.fig.my_data == ["2"]
+
+
+INCREMENTAL = textwrap.dedent(
+    """
+    from liveplot import tail
+
+    CALLS = []
+
+    def load_data_incremental(data, offset):
+        CALLS.append(offset)
+        lines, offset = tail.read_lines({log!r}, offset)
+        return tail.extend(data, [int(line) for line in lines]), offset
+
+    def make_figure(fig, data):
+        fig.my_data = data
+        fig.calls = list(CALLS)
+    """
+)
+
+
+def test_appended_data_is_read_incrementally(make_module, tmp_dir):
+    log = Path(tmp_dir) / "train.log"
+    log.write_text("1\n2\n")
+    filepath = make_module(INCREMENTAL.format(log=str(log)))
+    cache = DataCache(Path(tmp_dir) / "cache")
+    watcher = PlotWatcher.from_path(filepath, Mock(), cache=cache)
+    watcher.refresh()
+    assert watcher.plt_interface.fig.my_data == [1, 2]
+
+    append(log, "3\n")
+    watcher.refresh()
+    assert watcher.plt_interface.fig.my_data == [1, 2, 3]
+    assert watcher.plt_interface.fig.calls == [None, 4]
+
+    log.write_text("4\n")  # Truncated, read again from the start
+    watcher.refresh()
+    assert watcher.plt_interface.fig.my_data == [4]
+    assert watcher.plt_interface.fig.calls == [None, 4, None]
+
+    # A new session restores the cached data and reads what was appended since
+    append(log, "5\n")
+    watcher = PlotWatcher.from_path(filepath, Mock(), cache=cache)
+    watcher.refresh()
+    assert watcher.plt_interface.fig.my_data == [4, 5]
+    assert watcher.plt_interface.fig.calls == [2]
+
+
+def test_changed_data_file_reruns_the_stage_and_downstream(
+    make_module, tmp_dir, make_watcher, called
+):
+    log = Path(tmp_dir) / "train.log"
+    log.write_text("1\n2\n")
+    filepath = make_module(
+        textwrap.dedent(
+            f"""
+            from liveplot import stage
+
+            @stage
+            def lines():
+                return open({str(log)!r}, encoding="utf8").read().split()
+
+            @stage
+            def other():
+                return "unchanged"
+
+            @stage
+            def count(lines):
+                return len(lines)
+
+            def make_figure(fig, data):
+                fig.my_data = data
+            """
+        )
+    )
+    watcher = make_watcher(filepath)
+    watcher.refresh()
+    assert watcher.plt_interface.fig.my_data["count"] == 2
+
+    watcher.plt_module.call.reset_mock()
+    append(log, "3\n")
+    watcher.refresh()
+
+    assert watcher.plt_interface.fig.my_data["count"] == 3
+    assert called(watcher) == ["lines", "count", "make_figure"]
@@ -0,0 +1,197 @@
+import os
+import time
+from pathlib import Path
+
+from liveplot.dependencies import DependencyAnalyzer
+from liveplot.module_loader import ModuleLoader
+
+# pylint: disable=missing-docstring
+
+
+script = """
+import numpy as np
+from helpers import parse
+import other
+
+N = 10
+
+def scale(x):
+    return 2 * x
+
+def load_data():
+    return parse(N)
+
+def postprocess(data):
+    return scale(data)
+
+def make_figure(fig, data):
+    return other.style(data)
+"""
+
+helpers = """
+def _read(n):
+    return list(range(n))
+
+def parse(n):
+    return _read(n)
+
+def unrelated():
+    return None
+"""
+
+other = """
+def style(data):
+    return data
+"""
+
+
+def make_analyzer(tmp_dir, write_file) -> DependencyAnalyzer:
+    filepath = write_file(Path(tmp_dir) / "script.py", script)
+    write_file(Path(tmp_dir) / "helpers.py", helpers)
+    write_file(Path(tmp_dir) / "other.py", other)
+    analyzer = DependencyAnalyzer(filepath)
+    analyzer.update()
+    return analyzer
+
+
+def hashes(analyzer: DependencyAnalyzer):
+    analyzer.update()
+    return {
+        name: analyzer.hash(name)
+        for name in ["load_data", "postprocess", "make_figure"]
+    }
+
+
+def test_dependency_files(tmp_dir, write_file):
+    analyzer = make_analyzer(tmp_dir, write_file)
+    _, files = analyzer.dependencies("load_data")
+    assert {f.name for f in files} == {"script.py", "helpers.py"}
+    assert {f.name for f in analyzer.local_files()} == {
+        "script.py",
+        "helpers.py",
+        "other.py",
+    }
+    assert analyzer.local_module_names() == {"helpers", "other"}
+
+
+def test_comments_do_not_change_hashes(tmp_dir, write_file):
+    analyzer = make_analyzer(tmp_dir, write_file)
+    before = hashes(analyzer)
+    write_file(Path(tmp_dir) / "script.py", "# A comment\n" + script)
+    assert hashes(analyzer) == before
+
+
+def test_helper_change_invalidates_only_users(tmp_dir, write_file):
+    analyzer = make_analyzer(tmp_dir, write_file)
+    before = hashes(analyzer)
+    write_file(Path(tmp_dir) / "script.py", script.replace("2 * x", "3 * x"))
+    after = hashes(analyzer)
+    assert after["load_data"] == before["load_data"]
+    assert after["postprocess"] != before["postprocess"]
+    assert after["make_figure"] == before["make_figure"]
+
+
+def test_constant_change_invalidates_users(tmp_dir, write_file):
+    analyzer = make_analyzer(tmp_dir, write_file)
+    before = hashes(analyzer)
+    write_file(Path(tmp_dir) / "script.py", script.replace("N = 10", "N = 11"))
+    after = hashes(analyzer)
+    assert after["load_data"] != before["load_data"]
+    assert after["postprocess"] == before["postprocess"]
+
+
+def test_transitive_change_in_imported_function(tmp_dir, write_file):
+    analyzer = make_analyzer(tmp_dir, write_file)
+    before = hashes(analyzer)
+    write_file(
+        Path(tmp_dir) / "helpers.py", helpers.replace("range(n)", "range(2 * n)")
+    )
+    after = hashes(analyzer)
+    assert after["load_data"] != before["load_data"]
+    assert after["make_figure"] == before["make_figure"]
+
+
+def test_unrelated_change_in_imported_module(tmp_dir, write_file):
+    analyzer = make_analyzer(tmp_dir, write_file)
+    before = hashes(analyzer)
+    write_file(Path(tmp_dir) / "helpers.py", helpers.replace("return None", "return 1"))
+    assert hashes(analyzer) == before
+
+
+def test_module_import_depends_on_whole_module(tmp_dir, write_file):
+    analyzer = make_analyzer(tmp_dir, write_file)
+    before = hashes(analyzer)
+    write_file(Path(tmp_dir) / "other.py", other + "\nA = 1\n")
+    after = hashes(analyzer)
+    assert after["make_figure"] != before["make_figure"]
+    assert after["load_data"] == before["load_data"]
+
+
+def test_hashes_depend_on_the_location_only_if_used(tmp_dir, write_file):
+    located = script.replace("parse(N)", "parse(N, Path(__file__).parent)")
+    located_hashes = []
+    for name in ("a", "b"):
+        directory = Path(tmp_dir) / name
+        os.mkdir(directory)
+        write_file(directory / "helpers.py", helpers)
+        write_file(directory / "other.py", other)
+        write_file(directory / "script.py", located)
+        located_hashes.append(hashes(DependencyAnalyzer(directory / "script.py")))
+
+    a, b = located_hashes
+    assert a["load_data"] != b["load_data"]
+    assert a["postprocess"] == b["postprocess"]
+    assert a["make_figure"] == b["make_figure"]
+
+
+def test_loader_reloads_changed_local_module(tmp_dir, write_file):
+    make_analyzer(tmp_dir, write_file)
+    loader = ModuleLoader(Path(tmp_dir) / "script.py")
+    loader.load_module()
+    assert loader.call("load_data") == list(range(10))
+    loader.call("make_figure", None, None)
+    assert not loader.func_has_changed("load_data")
+
+    write_file(
+        Path(tmp_dir) / "helpers.py", helpers.replace("range(n)", "range(2 * n)")
+    )
+    loader.load_module()
+
+    assert loader.func_has_changed("load_data")
+    assert not loader.func_has_changed("make_figure")
+    assert loader.call("load_data") == list(range(20))
+
+
+lazy_script = """
+def load_data():
+    import lazy_reader
+    return lazy_reader.read()
+
+def make_figure(fig, data):
+    from lazy_styles import style
+    return style(data)
+"""
+
+
+def test_imports_inside_functions(tmp_dir, write_file):
+    filepath = write_file(Path(tmp_dir) / "script.py", lazy_script)
+    reader = write_file(Path(tmp_dir) / "lazy_reader.py", "def read():\n    return 1\n")
+    write_file(Path(tmp_dir) / "lazy_styles.py", "def style(data):\n    return data\n")
+    loader = ModuleLoader(filepath)
+    loader.load_module()
+    assert loader.call("load_data") == 1
+    loader.call("make_figure", None, None)
+    assert {f.name for f in loader.dependency_files()} == {
+        "script.py",
+        "lazy_reader.py",
+        "lazy_styles.py",
+    }
+
+    write_file(reader, "def read():\n    return 2\n")
+    os.utime(reader, (time.time() + 10, time.time() + 10))
+    assert loader.should_reload()
+    loader.load_module()
+
+    assert loader.func_has_changed("load_data")
+    assert not loader.func_has_changed("make_figure")
+    assert loader.call("load_data") == 2
@@ -0,0 +1,89 @@
+import os
+from pathlib import Path
+
+import pytest
+
+# noinspection PyProtectedMember
+from liveplot.file_watcher import (
+    InotifyWatcher,
+    PollingWatcher,
+    _Inotify,
+    make_file_watcher,
+)
+
+# pylint: disable=missing-docstring
+
+needs_inotify = pytest.mark.skipif(
+    not _Inotify.is_available(), reason="inotify is not available"
+)
+
+
+def make_polling_watcher(paths):
+    return PollingWatcher(paths, debounce=0.01, interval=0.01)
+
+
+def make_inotify_watcher(paths):
+    return InotifyWatcher(paths, debounce=0.01)
+
+
+watcher_factories = [
+    make_polling_watcher,
+    pytest.param(make_inotify_watcher, marks=needs_inotify),
+]
+
+
+@pytest.mark.parametrize("make_watcher", watcher_factories)
+def test_no_change_no_event(make_watcher, make_module):
+    watcher = make_watcher([make_module("")])
+    assert not watcher.poll(timeout=0.05)
+    watcher.close()
+
+
+@pytest.mark.parametrize("make_watcher", watcher_factories)
+def test_detects_write(make_watcher, make_module, write_file):
+    filepath = make_module("")
+    watcher = make_watcher([filepath])
+
+    write_file(filepath, "def f(): return 1")
+
+    assert watcher.poll(timeout=1)
+    assert not watcher.poll(timeout=0.05)
+    watcher.close()
+
+
+@pytest.mark.parametrize("make_watcher", watcher_factories)
+def test_coalesces_atomic_rename(make_watcher, tmp_dir, write_file):
+    filepath = Path(tmp_dir) / "script.py"
+    write_file(filepath, "")
+    watcher = make_watcher([filepath])
+
+    tmp_path = Path(tmp_dir) / ".script.py.tmp"
+    write_file(tmp_path, "")
+    write_file(tmp_path, "def f(): return 1")
+    os.replace(tmp_path, filepath)
+
+    assert watcher.poll(timeout=1)
+    assert not watcher.poll(timeout=0.05)
+    watcher.close()
+
+
+@needs_inotify
+def test_inotify_ignores_other_files(tmp_dir, write_file):
+    filepath = Path(tmp_dir) / "script.py"
+    write_file(filepath, "")
+    watcher = make_inotify_watcher([filepath])
+
+    write_file(Path(tmp_dir) / ".script.py.swp", "swap")
+
+    assert not watcher.poll(timeout=0.05)
+    watcher.close()
+
+
+def test_make_file_watcher_poll(make_module):
+    watcher = make_file_watcher([make_module("")], backend="poll")
+    assert isinstance(watcher, PollingWatcher)
+
+
+def test_make_file_watcher_unknown_backend(make_module):
+    with pytest.raises(ValueError):
+        make_file_watcher([make_module("")], backend="unknown")
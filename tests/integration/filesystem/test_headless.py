@@ -0,0 +1,33 @@
+import os
+import textwrap
+from pathlib import Path
+from unittest.mock import patch
+
+from liveplot.plot_watcher import PlotWatcher
+from liveplot.plt_interface import HeadlessInterface
+
+# pylint: disable=missing-docstring
+
+
+def test_renders_to_file_on_change(make_module, mock_stat, tmp_dir):
+    script = textwrap.dedent(
+        """
+        def make_figure(fig, data):
+            fig.add_subplot(111).plot([0, 1], [0, {y}])
+        """
+    )
+    output = Path(tmp_dir) / "figure.svg"
+    filepath = make_module(script.format(y=1))
+    watcher = PlotWatcher.from_path(filepath, HeadlessInterface(output))
+    watcher.refresh()
+
+    first = output.read_text(encoding="utf8")
+    assert first.rstrip().endswith("</svg>")
+    assert os.listdir(tmp_dir) == ["figure.svg"]
+
+    make_module(script.format(y=2), filepath=filepath)
+    with patch.object(Path, "stat", return_value=mock_stat(filepath)):
+        watcher.refresh()
+
+    assert output.read_text(encoding="utf8") != first
+    assert os.listdir(tmp_dir) == ["figure.svg"]
@@ -0,0 +1,70 @@
+import textwrap
+from unittest.mock import Mock
+
+import numpy as np
+
+from liveplot.cache import DataCache
+from liveplot.data_store import DataStore
+from liveplot.memory import MemoryBudget, resident_size
+from liveplot.plot_watcher import PlotWatcher
+
+# pylint: disable=missing-docstring
+
+
+def test_data_over_budget_is_memory_mapped(make_module, tmp_dir):
+    script = textwrap.dedent(
+        """
+        import numpy as np
+
+        def load_data():
+            return np.arange(10**5, dtype=float)
+
+        def postprocess(data):
+            return {"small": data[:10].copy(), "large": data * 2}
+        """
+    )
+    watcher = PlotWatcher.from_path(
+        make_module(script),
+        Mock(),
+        cache=DataCache(tmp_dir),
+        memory_budget=MemoryBudget(10**5, directory=tmp_dir),
+    )
+    watcher.refresh()
+
+    assert isinstance(watcher.data, np.memmap)  # Mapped from the cache
+    assert isinstance(watcher.data_post["large"], np.memmap)
+    assert resident_size(watcher.data, watcher.data_post) == 0
+    np.testing.assert_array_equal(watcher.data_post["large"], np.arange(10**5) * 2)
+
+
+def test_only_unshared_results_are_spilled_with_a_store(make_module, tmp_dir):
+    template = textwrap.dedent(
+        """
+        import numpy as np
+
+        def load_data():
+            return np.arange(10**5, dtype=float)
+
+        def postprocess(data):
+            return data * {factor}
+        """
+    )
+    store = DataStore()
+    first = PlotWatcher.from_path(
+        make_module(template.format(factor=2)), Mock(), store=store
+    )
+    second = PlotWatcher.from_path(
+        make_module(template.format(factor=3)),
+        Mock(),
+        store=store,
+        memory_budget=MemoryBudget(10**5, directory=tmp_dir),
+    )
+    first.refresh()
+    second.refresh()
+
+    assert second.data is first.data
+    assert not isinstance(second.data, np.memmap)  # Shared, kept in memory
+    assert isinstance(second.data_post, np.memmap)
+    np.testing.assert_array_equal(second.data_post, np.arange(10**5) * 3)
+    key = store.held((id(second), "postprocess"))
+    assert store.acquire((id(second), "postprocess"), key) is second.data_post
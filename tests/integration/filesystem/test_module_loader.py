@@ -64,3 +64,78 @@ def test_bad_user_function_raises_exception(make_module):
 
     with pytest.raises(PlottingModuleError):
         loader.call("postprocess", None)
+
+
+def test_only_changed_definitions_are_executed_again(make_module, mock_stat):
+    script = textwrap.dedent(
+        """
+        CALLS = []
+        SCALE = {scale}
+
+        def load_data():
+            CALLS.append(1)
+            return len(CALLS) * SCALE
+        {extra}
+        def make_figure(fig, data):
+            raise ValueError(data)
+        """
+    )
+    filepath = make_module(script.format(scale=1, extra=""))
+    loader = ModuleLoader(filepath)
+    loader.load_module()
+    assert loader.call("load_data") == 1
+
+    # Only make_figure moved: the top-level code does not run again
+    make_module(script.format(scale=1, extra="\n\n"), filepath=filepath)
+    with patch.object(Path, "stat", return_value=mock_stat(filepath)):
+        loader.load_module()
+    assert loader.call("load_data") == 2
+    with pytest.raises(PlottingModuleError) as exc_info:
+        loader.call("make_figure", None, None)
+    assert exc_info.value.__cause__.__traceback__.tb_next.tb_lineno == 12
+
+    # A constant changed: the module is imported again
+    make_module(script.format(scale=10, extra=""), filepath=filepath)
+    with patch.object(Path, "stat", return_value=mock_stat(filepath)):
+        loader.load_module()
+    assert loader.call("load_data") == 10
+
+
+@pytest.mark.parametrize(
+    "captured",
+    [
+        "FUNCS = [helper]\nCONST = helper()",
+        "FUNCS = [functools.partial(helper)]\nCONST = FUNCS[0]()",
+        "def _default(f=helper):\n    return f\nFUNCS = [_default()]\nCONST = FUNCS[0]()",
+        "FUNCS = []\n@register(helper)\ndef _decorated():\n    pass\nCONST = FUNCS[0]()",
+    ],
+    ids=["list", "partial", "default", "decorator"],
+)
+def test_captured_definitions_are_imported_again(make_module, mock_stat, captured):
+    script = textwrap.dedent(
+        """
+        import functools
+
+        def register(func):
+            FUNCS.append(func)
+            return lambda f: f
+
+        def helper():
+            return {value}
+
+        {captured}
+
+        def load_data():
+            return [func() for func in FUNCS], CONST
+        """
+    )
+    filepath = make_module(script.format(value=1, captured=captured))
+    loader = ModuleLoader(filepath)
+    loader.load_module()
+    assert loader.call("load_data") == ([1], 1)
+
+    make_module(script.format(value=2, captured=captured), filepath=filepath)
+    with patch.object(Path, "stat", return_value=mock_stat(filepath)):
+        loader.load_module()
+
+    assert loader.call("load_data") == ([2], 2)
@@ -0,0 +1,113 @@
+import logging
+import os
+from pathlib import Path
+from unittest.mock import Mock
+
+from liveplot.cli import expand_scripts, output_path
+from liveplot.data_store import DataStore
+from liveplot.plot_watcher import PlotWatcher
+
+# pylint: disable=missing-docstring
+
+
+script = """
+from helpers import value
+
+def load_data():
+    return value()
+"""
+
+
+def test_local_modules_with_the_same_name_stay_separate(tmp_dir, write_file):
+    scripts = []
+    for name in ("a", "b"):
+        directory = Path(tmp_dir) / name
+        os.mkdir(directory)
+        write_file(directory / "helpers.py", f"def value():\n    return '{name}'\n")
+        scripts.append(write_file(directory / "plot.py", script))
+
+    watchers = [PlotWatcher.from_path(path, Mock()) for path in scripts + scripts]
+    for watcher in watchers:
+        watcher.refresh()
+
+    assert [watcher.data for watcher in watchers] == ["a", "b", "a", "b"]
+
+
+def test_expand_scripts(tmp_dir, write_file):
+    for name in ("b.py", "a.py", "notes.txt"):
+        write_file(Path(tmp_dir) / name, "")
+    pattern = Path(tmp_dir) / "*.py"
+
+    scripts = expand_scripts([pattern, Path(tmp_dir) / "a.py", Path("missing.py")])
+
+    assert scripts == [
+        Path(tmp_dir) / "a.py",
+        Path(tmp_dir) / "b.py",
+        Path("missing.py"),
+    ]
+
+
+def test_output_path():
+    assert output_path(Path("out/{stem}.png"), Path("x/fig1.py")) == Path(
+        "out/fig1.png"
+    )
+    assert output_path(Path("out.png"), Path("fig1.py")) == Path("out.png")
+
+
+shared_script = """
+import numpy as np
+
+def load_data():
+    return np.arange(5)
+
+def postprocess(data):
+    return data * {factor}
+"""
+
+
+def test_identical_stages_are_shared(tmp_dir, caplog, write_file):
+    store = DataStore()
+    watchers = []
+    for name, factor in (("a", 2), ("b", 2), ("c", 3)):
+        filepath = write_file(
+            Path(tmp_dir) / f"{name}.py", shared_script.format(factor=factor)
+        )
+        watchers.append(PlotWatcher.from_path(filepath, Mock(), store=store))
+
+    with caplog.at_level(logging.INFO, logger="liveplot"):
+        for watcher in watchers:
+            watcher.refresh()
+
+    a, b, c = watchers
+    assert a.data is b.data is c.data
+    assert a.data_post is b.data_post
+    assert list(c.data_post) == [0, 3, 6, 9, 12]
+    assert not a.data.flags.writeable
+    assert "Reused load_data from another script" in caplog.text
+    assert len(store) == 3
+
+    a.close()
+    b.close()
+
+
+located_script = """
+from pathlib import Path
+
+def load_data():
+    return Path(__file__).parent.name
+"""
+
+
+def test_stages_using_their_location_are_not_shared(tmp_dir, write_file):
+    store = DataStore()
+    watchers = []
+    for name in ("a", "b"):
+        directory = Path(tmp_dir) / name
+        os.mkdir(directory)
+        filepath = write_file(directory / "plot.py", located_script)
+        watchers.append(PlotWatcher.from_path(filepath, Mock(), store=store))
+
+    for watcher in watchers:
+        watcher.refresh()
+
+    assert [watcher.data for watcher in watchers] == ["a", "b"]
@@ -0,0 +1,151 @@
+import os
+import textwrap
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+from liveplot.plot_watcher import PlotWatcher
+
+# pylint: disable=missing-docstring
+
+SCRIPT = textwrap.dedent(
+    """
+    from liveplot import stage
+
+    @stage
+    def raw():
+        return [3, 1, 2]
+
+    @stage
+    def ordered(raw):
+        return sorted(raw)
+
+    @stage
+    def top(ordered):
+        return ordered[-{index}]
+
+    def make_figure(fig, data):
+        fig.my_data = data
+    """
+)
+
+
+def test_edit_reruns_downstream_stages_only(
+    make_module, mock_stat, make_watcher, called
+):
+    filepath = make_module(SCRIPT.format(index=1))
+    watcher = make_watcher(filepath)
+    watcher.refresh()
+
+    assert watcher.plt_interface.fig.my_data == {
+        "raw": [3, 1, 2],
+        "ordered": [1, 2, 3],
+        "top": 3,
+    }
+    assert called(watcher) == ["raw", "ordered", "top", "settings", "make_figure"]
+
+    watcher.plt_module.call.reset_mock()
+    make_module(SCRIPT.format(index=3), filepath=filepath)
+    with patch.object(Path, "stat", return_value=mock_stat(filepath)):
+        watcher.refresh()
+
+    assert watcher.plt_interface.fig.my_data["top"] == 1
+    assert called(watcher) == ["top", "make_figure"]
+
+
+def test_invalid_stages_are_reported(make_module, caplog):
+    filepath = make_module(
+        "from liveplot import stage\n\n@stage\ndef fit(filtered):\n    return 1\n"
+    )
+    watcher = PlotWatcher.from_path(filepath, Mock())
+    watcher.refresh()
+
+    assert "depends on unknown stage filtered" in caplog.text
+
+
+def test_independent_stages_run_in_threads_and_processes(make_module):
+    filepath = make_module(
+        textwrap.dedent(
+            """
+            import os
+            import threading
+
+            from liveplot import stage
+
+            @stage
+            def local():
+                return threading.current_thread().name, os.getpid()
+
+            @stage(process=True)
+            def remote():
+                return threading.current_thread().name, os.getpid()
+
+            @stage
+            def both(local, remote):
+                return [local, remote]
+
+            def make_figure(fig, data):
+                fig.my_data = data
+            """
+        )
+    )
+    watcher = PlotWatcher.from_path(filepath, Mock(), workers=2)
+    watcher.refresh()
+
+    (local_thread, local_pid), (_, remote_pid) = watcher.plt_interface.fig.my_data[
+        "both"
+    ]
+    assert local_thread.startswith("liveplot-stage")
+    assert local_pid == os.getpid()
+    assert remote_pid != os.getpid()
+
+
+def test_load_data_runs_while_settings_runs(make_module):
+    filepath = make_module(
+        textwrap.dedent(
+            """
+            import threading
+
+            def settings(plt):
+                plt.settings_thread = threading.current_thread().name
+
+            def load_data():
+                return threading.current_thread().name
+
+            def make_figure(fig, data):
+                fig.my_data = data
+            """
+        )
+    )
+    watcher = PlotWatcher.from_path(filepath, Mock(), workers=2, overlap_settings=True)
+    watcher.refresh()
+
+    assert watcher.plt_interface.plt.settings_thread == "MainThread"
+    assert watcher.plt_interface.fig.my_data != "MainThread"
+
+
+def test_settings_run_after_load_data_by_default(make_module):
+    filepath = make_module(
+        textwrap.dedent(
+            """
+            import threading
+
+            CALLS = []
+
+            def settings(plt):
+                CALLS.append(("settings", threading.current_thread().name))
+
+            def load_data():
+                CALLS.append(("load_data", threading.current_thread().name))
+
+            def make_figure(fig, data):
+                fig.my_data = CALLS
+            """
+        )
+    )
+    watcher = PlotWatcher.from_path(filepath, Mock(), workers=2)
+    watcher.refresh()
+
+    assert watcher.plt_interface.fig.my_data == [
+        ("load_data", "MainThread"),
+        ("settings", "MainThread"),
+    ]
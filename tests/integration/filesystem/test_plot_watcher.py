@@ -117,3 +117,13 @@ def test_logging_user_plotting_code_error(bad_function, make_module, mock_stat,
     assert "Plotting triggered an exception" in caplog.text
     assert "not_k" in caplog.text
     assert "KeyError" in caplog.text
+
+
+def test_sys_exit_in_user_code_is_reported(make_module, caplog):
+    configure_logs()
+
+    filepath = make_module("import sys\ndef postprocess(data): sys.exit(3)")
+    watcher = PlotWatcher.from_path(filepath, Mock())
+    watcher.refresh()
+
+    assert "Plotting triggered an exception in `postprocess`" in caplog.text
@@ -0,0 +1,58 @@
+import json
+import os
+import time
+import tracemalloc
+from pathlib import Path
+from unittest.mock import Mock
+
+import numpy as np
+
+from liveplot.plot_watcher import PlotWatcher
+from liveplot.profiling import Profiler
+
+# pylint: disable=missing-docstring
+
+
+def test_stages_are_grouped_by_refresh(tmp_dir):
+    stats_file = Path(tmp_dir) / "stats.jsonl"
+    profiler = Profiler(stats_file=stats_file, profile_dir=Path(tmp_dir) / "prof")
+
+    with profiler.refresh(Path("script.py")):
+        with profiler.stage("fast"):
+            pass
+        with profiler.stage("slow"):
+            data = np.ones(10**6)
+            time.sleep(0.01)
+            with profiler.stage("nested"):
+                pass
+    del data
+    tracemalloc.stop()
+
+    (record,) = profiler.refreshes
+    assert [stage["name"] for stage in record["stages"]] == ["fast", "nested", "slow"]
+    fast, _, slow = record["stages"]
+    assert slow["wall"] >= 0.01 > fast["wall"]
+    assert slow["peak_memory"] >= 8 * 10**6
+    assert json.loads(stats_file.read_text())["script"] == "script.py"
+    assert os.listdir(Path(tmp_dir) / "prof") == ["0-slow.prof"]
+    assert "slow" in profiler.summary()
+
+
+def test_plot_watcher_stages(make_module):
+    filepath = make_module("def load_data():\n    return 1")
+    profiler = Profiler(track_memory=False)
+    watcher = PlotWatcher.from_path(filepath, Mock(), profiler=profiler)
+
+    watcher.refresh()
+
+    (record,) = profiler.refreshes
+    assert [stage["name"] for stage in record["stages"]] == [
+        "load_module",
+        "hash",
+        "load_data",
+        "postprocess",
+        "settings",
+        "make_figure",
+        "draw",
+    ]
+    watcher.plt_interface.draw.assert_called_with(only_animated=False, sync=True)
@@ -0,0 +1,139 @@
+import sys
+import textwrap
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from liveplot import cache as disk
+from liveplot.snapshot import restore_snapshot, save_snapshot
+
+# pylint: disable=missing-docstring
+
+SCRIPT = textwrap.dedent(
+    """
+    import numpy as np
+
+    def load_data():
+        return np.arange(10)
+
+    def postprocess(data):
+        return data * {factor}
+
+    def make_figure(fig, data):
+        fig.my_data = data
+    """
+)
+
+
+def test_restore_runs_only_the_figure(make_module, tmp_dir, make_watcher, called):
+    filepath = make_module(SCRIPT.format(factor=2))
+    watcher = make_watcher(filepath)
+    watcher.refresh()
+    save_snapshot(Path(tmp_dir) / "snapshot", [watcher])
+
+    restored = make_watcher(filepath)
+    restore_snapshot(Path(tmp_dir) / "snapshot", [restored])
+    restored.refresh()
+    assert called(restored) == ["settings", "make_figure"]
+    assert isinstance(restored.data, np.memmap)
+    assert np.array_equal(restored.plt_interface.fig.my_data, np.arange(10) * 2)
+
+
+def test_restore_runs_the_changed_functions(make_module, tmp_dir, make_watcher, called):
+    filepath = make_module(SCRIPT.format(factor=2))
+    watcher = make_watcher(filepath)
+    watcher.refresh()
+    save_snapshot(Path(tmp_dir) / "snapshot", [watcher])
+
+    make_module(SCRIPT.format(factor=3), filepath)
+    restored = make_watcher(filepath)
+    restore_snapshot(Path(tmp_dir) / "snapshot", [restored])
+    restored.refresh()
+    assert called(restored) == ["postprocess", "settings", "make_figure"]
+    assert np.array_equal(restored.plt_interface.fig.my_data, np.arange(10) * 3)
+
+
+def test_restore_stages(make_module, tmp_dir, make_watcher, called):
+    script = textwrap.dedent(
+        """
+        from liveplot import stage
+
+        @stage
+        def raw():
+            return [3, 1, 2]
+
+        @stage
+        def ordered(raw):
+            return sorted(raw{reverse})
+
+        def make_figure(fig, data):
+            fig.my_data = data
+        """
+    )
+    filepath = make_module(script.format(reverse=""))
+    watcher = make_watcher(filepath)
+    watcher.refresh()
+    save_snapshot(Path(tmp_dir) / "snapshot", [watcher])
+
+    make_module(script.format(reverse=", reverse=True"), filepath)
+    restored = make_watcher(filepath)
+    restore_snapshot(Path(tmp_dir) / "snapshot", [restored])
+    restored.refresh()
+    assert called(restored) == ["ordered", "settings", "make_figure"]
+    assert restored.plt_interface.fig.my_data == {
+        "raw": [3, 1, 2],
+        "ordered": [3, 2, 1],
+    }
+
+
+@pytest.mark.skipif(
+    not hasattr(sys, "addaudithook"), reason="Recording needs audit hooks"
+)
+def test_changed_data_files_are_read_again(make_module, tmp_dir, make_watcher):
+    log = Path(tmp_dir) / "train.log"
+    log.write_text("1\n")
+    filepath = make_module(
+        textwrap.dedent(
+            f"""
+            def load_data():
+                with open({str(log)!r}, encoding="utf8") as file:
+                    return file.read().split()
+
+            def make_figure(fig, data):
+                fig.my_data = data
+            """
+        )
+    )
+    watcher = make_watcher(filepath)
+    watcher.refresh()
+    save_snapshot(Path(tmp_dir) / "snapshot", [watcher])
+
+    log.write_text("1\n2\n")
+    restored = make_watcher(filepath)
+    restore_snapshot(Path(tmp_dir) / "snapshot", [restored])
+    restored.refresh()
+    assert restored.plt_interface.fig.my_data == ["1", "2"]
+
+
+def test_missing_snapshot_starts_from_scratch(
+    make_module, tmp_dir, caplog, make_watcher, called
+):
+    watcher = make_watcher(make_module(SCRIPT.format(factor=2)))
+    restore_snapshot(Path(tmp_dir) / "missing", [watcher])
+    watcher.refresh()
+    assert "Could not read the snapshot" in caplog.text
+    assert called(watcher)[:2] == ["load_data", "postprocess"]
+
+
+def test_shared_and_compressed_arrays(tmp_dir):
+    array = np.arange(1000)
+    disk.dump({"a": array, "b": array}, Path(tmp_dir))
+    assert sorted(path.name for path in Path(tmp_dir).glob("*.np*")) == ["0.npy"]
+
+    compressed = Path(tmp_dir) / "compressed"
+    compressed.mkdir()
+    disk.dump({"a": array}, compressed, compress=True)
+    restored = disk.load(compressed)["a"]
+    assert not isinstance(restored, np.memmap)
+    assert np.array_equal(restored, array)
@@ -0,0 +1,55 @@
+import textwrap
+import time
+from unittest.mock import Mock
+
+import pytest
+
+from liveplot.background import BACKGROUND_MODES, make_runner
+from liveplot.plot_watcher import PlotWatcher
+
+# pylint: disable=missing-docstring
+
+streaming_script = textwrap.dedent(
+    """
+    import time
+
+    def load_data():
+        for i in range(3):
+            time.sleep(0.3)
+            yield i
+
+    def postprocess_chunk(chunk):
+        return 10 * chunk
+
+    def combine(data, chunk):
+        return chunk if data is None else data + chunk
+
+    def postprocess(data):
+        return data + 1
+    """
+)
+
+
+def test_streaming_load_data(make_module):
+    watcher = PlotWatcher.from_path(make_module(streaming_script), Mock())
+    watcher.refresh()
+
+    assert watcher.data == 30
+    assert watcher.data_post == 31
+    assert watcher.plt_interface.draw.call_count > 1
+
+
+@pytest.mark.parametrize("mode", BACKGROUND_MODES)
+def test_streaming_load_data_in_background(mode, make_module):
+    filepath = make_module(streaming_script)
+    watcher = PlotWatcher.from_path(filepath, Mock(), runner=make_runner(mode))
+    watcher.refresh()
+
+    start = time.monotonic()
+    while watcher.busy and time.monotonic() - start < 10:
+        watcher.poll_background()
+        time.sleep(0.01)
+
+    assert watcher.data == 30
+    assert watcher.data_post == 31
+    assert watcher.plt_interface.draw.call_count > 1
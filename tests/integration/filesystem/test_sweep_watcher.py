@@ -0,0 +1,143 @@
+import concurrent.futures
+import os
+import textwrap
+from pathlib import Path
+
+import pytest
+
+from liveplot.cache import DataCache
+from liveplot.sweep import SweepWatcher, make_executor
+
+# pylint: disable=missing-docstring
+
+SCRIPT = """
+import os
+
+def sweep():
+    return {grid}
+
+def load_data(seed):
+    with open(os.path.join({log!r}, f"load-{{seed}}"), "a") as file:
+        file.write("x")
+    return [seed] * 3
+
+def make_figure(fig, data, scale):
+    fig.add_subplot(111).plot([x * scale for x in data])
+"""
+
+
+def write_script(make_module, filepath, tmp_dir, grid):
+    make_module(textwrap.dedent(SCRIPT.format(grid=grid, log=str(tmp_dir))), filepath)
+    # Newer than the last load, without waiting
+    mtime = os.path.getmtime(filepath) + 10 * len(grid)
+    os.utime(filepath, (mtime, mtime))
+
+
+def loads(tmp_dir):
+    return {path.name: path.stat().st_size for path in Path(tmp_dir).glob("load-*")}
+
+
+@pytest.fixture
+def executor():
+    with concurrent.futures.ThreadPoolExecutor(2) as pool:
+        yield pool
+
+
+def test_renders_every_variant_loading_once_per_data(make_module, tmp_dir, executor):
+    filepath = Path(tmp_dir) / "script.py"
+    write_script(make_module, filepath, tmp_dir, '{"seed": [0, 1], "scale": [1, 2]}')
+    output = Path(tmp_dir) / "gallery"
+    SweepWatcher(filepath, output, executor).refresh()
+
+    assert sorted(path.name for path in output.iterdir()) == [
+        "seed=0,scale=1.png",
+        "seed=0,scale=2.png",
+        "seed=1,scale=1.png",
+        "seed=1,scale=2.png",
+    ]
+    assert loads(tmp_dir) == {"load-0": 1, "load-1": 1}
+
+
+def test_only_changed_variants_are_rendered(make_module, tmp_dir, executor):
+    filepath = Path(tmp_dir) / "script.py"
+    write_script(make_module, filepath, tmp_dir, '{"seed": [0, 1], "scale": [1]}')
+    output = Path(tmp_dir) / "gallery"
+    watcher = SweepWatcher(filepath, output, executor)
+    watcher.refresh()
+    kept = output / "seed=0,scale=1.png"
+    os.utime(kept, (0, 0))
+
+    write_script(make_module, filepath, tmp_dir, '{"seed": [0, 2], "scale": [1]}')
+    watcher.refresh()
+
+    assert sorted(path.name for path in output.iterdir()) == [
+        "seed=0,scale=1.png",
+        "seed=2,scale=1.png",
+    ]
+    assert kept.stat().st_mtime == 0
+    assert loads(tmp_dir) == {"load-0": 1, "load-1": 1, "load-2": 1}
+
+
+def test_contact_sheet_and_cache(make_module, tmp_dir):
+    filepath = Path(tmp_dir) / "script.py"
+    write_script(make_module, filepath, tmp_dir, '{"seed": [0, 1], "scale": [1, 2]}')
+    cache = DataCache(Path(tmp_dir) / "cache")
+    sheet = Path(tmp_dir) / "sheet.png"
+    with make_executor(2) as pool:
+        SweepWatcher(filepath, sheet, pool, cache=cache).refresh()
+        assert sheet.is_file()
+        assert len(list((Path(tmp_dir) / "sheet.variants").iterdir())) == 4
+
+        # A new session restores the data from the cache
+        (Path(tmp_dir) / "sheet.variants" / "seed=0,scale=1.png").unlink()
+        SweepWatcher(filepath, sheet, pool, cache=cache).refresh()
+    assert loads(tmp_dir) == {"load-0": 1, "load-1": 1}
+
+
+def test_errors_are_reported_per_variant(make_module, tmp_dir, executor, caplog):
+    filepath = make_module(
+        textwrap.dedent(
+            """
+            def sweep():
+                return [{"n": 1}, {"n": 0}]
+
+            def make_figure(fig, data, n):
+                fig.add_subplot(111).set_title(str(1 / n))
+            """
+        )
+    )
+    output = Path(tmp_dir) / "gallery"
+    SweepWatcher(filepath, output, executor).refresh()
+    assert [path.name for path in output.iterdir()] == ["n=1.png"]
+    assert "Could not render n=0.png" in caplog.text
+    assert "ZeroDivisionError" in caplog.text
+
+
+CHUNKED_SCRIPT = """
+def sweep():
+    return {{"seed": [1]}}
+
+def load_data(seed):
+    yield from [seed, seed]
+
+def combine(data, chunk):
+    return [chunk] if data is None else data + [{factor} * chunk]
+
+def make_figure(fig, data):
+    with open({log!r}, "w") as file:
+        file.write(repr(data))
+"""
+
+
+def test_edit_of_combine_renders_again(make_module, tmp_dir, executor):
+    filepath = Path(tmp_dir) / "script.py"
+    log = Path(tmp_dir) / "figure.txt"
+    cache = DataCache(Path(tmp_dir) / "cache")
+    watcher = SweepWatcher(filepath, Path(tmp_dir) / "gallery", executor, cache=cache)
+    for factor in (1, 10):
+        code = CHUNKED_SCRIPT.format(factor=factor, log=str(log))
+        make_module(textwrap.dedent(code), filepath)
+        mtime = os.path.getmtime(filepath) + 10 * factor
+        os.utime(filepath, (mtime, mtime))
+        watcher.refresh()
+        assert log.read_text() == repr([1, factor])
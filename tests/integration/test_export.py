@@ -0,0 +1,141 @@
+import matplotlib.image
+import numpy as np
+import pytest
+from matplotlib.figure import Figure
+
+from liveplot.export import (
+    POOL_MIN_RENDERINGS,
+    Exporter,
+    ExportFormat,
+    group_formats,
+    parse_formats,
+    render,
+)
+
+
+def make_figure(animated=False):
+    fig = Figure(figsize=(2, 1.5), dpi=50)
+    ax = fig.add_subplot(111)
+    (line,) = ax.plot([0, 1], [0, 1], color="red", linewidth=8, animated=animated)
+    return fig, line
+
+
+def test_parse_formats():
+    assert parse_formats("png@150, PNG@300,pdf,svg,pdf") == [
+        ExportFormat("png", 150),
+        ExportFormat("png", 300),
+        ExportFormat("pdf"),
+        ExportFormat("svg"),
+    ]
+    with pytest.raises(ValueError, match="Unsupported"):
+        parse_formats("png,docx")
+    with pytest.raises(ValueError, match="dpi"):
+        parse_formats("png@high")
+    with pytest.raises(ValueError, match="dpi"):
+        parse_formats("png@0")
+
+
+def test_file_names():
+    assert ExportFormat("pdf").file_name("plot") == "plot.pdf"
+    assert ExportFormat("png", 300).file_name("plot") == "plot-300dpi.png"
+    assert ExportFormat("png", 72.5).file_name("plot") == "plot-72.5dpi.png"
+
+
+def test_raster_formats_of_same_dpi_are_grouped():
+    formats = parse_formats("png@300,pdf,jpg@300,png,svg")
+    assert group_formats(formats) == [
+        [ExportFormat("png", 300), ExportFormat("jpg", 300)],
+        [ExportFormat("pdf")],
+        [ExportFormat("png")],
+        [ExportFormat("svg")],
+    ]
+
+
+def test_shared_rendering_matches_savefig():
+    fig, _ = make_figure()
+    shared = render(fig, parse_formats("png@100,jpg@100"))
+    alone = render(fig, parse_formats("png@100"))
+    assert shared["{stem}-100dpi.png"] == alone["{stem}-100dpi.png"]
+    assert shared["{stem}-100dpi.jpg"].startswith(b"\xff\xd8")
+    assert fig.dpi == 50
+
+
+def test_animated_artists_are_exported(tmp_path):
+    fig, line = make_figure(animated=True)
+    Exporter(tmp_path, parse_formats("png")).export(fig, "plot")
+    pixels = matplotlib.image.imread(str(tmp_path / "plot.png"))
+    red = (pixels[..., 0] > 0.9) & (pixels[..., 1] < 0.1)
+    assert red.any()
+    assert line.get_animated()
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_export(tmp_path, workers):
+    fig, _ = make_figure()
+    exporter = Exporter(
+        tmp_path / "out", parse_formats("png@20,png@40,pdf,svg"), workers
+    )
+    try:
+        exporter.export(fig, "plot")
+        exporter.wait()
+    finally:
+        exporter.close()
+    names = sorted(path.name for path in (tmp_path / "out").iterdir())
+    assert names == ["plot-20dpi.png", "plot-40dpi.png", "plot.pdf", "plot.svg"]
+    small = matplotlib.image.imread(str(tmp_path / "out" / "plot-20dpi.png"))
+    large = matplotlib.image.imread(str(tmp_path / "out" / "plot-40dpi.png"))
+    assert (small.shape[:2], large.shape[:2]) == ((30, 40), (60, 80))
+    assert (tmp_path / "out" / "plot.pdf").read_bytes().startswith(b"%PDF")
+
+
+def test_figure_that_cannot_be_pickled_is_exported_in_process(tmp_path):
+    fig, _ = make_figure()
+    fig.axes[0].xaxis.set_major_formatter(lambda x, pos: f"{x:.1f}")
+    exporter = Exporter(tmp_path, parse_formats("png,pdf,svg,eps"), workers=2)
+    try:
+        exporter.export(fig, "plot")
+        exporter.wait()
+    finally:
+        exporter.close()
+    assert np.asarray(matplotlib.image.imread(str(tmp_path / "plot.png"))).size
+    assert (tmp_path / "plot.svg").exists()
+
+
+def test_few_renderings_are_made_in_process(tmp_path):
+    formats = parse_formats("png@50,png@100,svg")
+    assert len(group_formats(formats)) < POOL_MIN_RENDERINGS
+    exporter = Exporter(tmp_path, formats, workers=2)
+    try:
+        assert exporter._executor is None  # pylint: disable=protected-access
+        exporter.export(make_figure()[0], "plot")
+    finally:
+        exporter.close()
+    assert (tmp_path / "plot-100dpi.png").exists()
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_workers_render_with_the_rc_params(tmp_path, workers):
+    rc_params = {
+        "savefig.facecolor": "blue",
+        "savefig.bbox": "tight",
+        "savefig.pad_inches": 0.5,
+    }
+    with matplotlib.rc_context(rc_params):
+        fig, _ = make_figure()
+        exporter = Exporter(
+            tmp_path, parse_formats("png@50,pdf,svg,eps"), workers=workers
+        )
+        try:
+            exporter.export(fig, "plot")
+            exporter.wait()
+        finally:
+            exporter.close()
+        expected = render(fig, [ExportFormat("png", 50)])["{stem}-50dpi.png"]
+
+    (tmp_path / "expected.png").write_bytes(expected)
+    image = matplotlib.image.imread(str(tmp_path / "plot-50dpi.png"))
+    assert np.array_equal(
+        image, matplotlib.image.imread(str(tmp_path / "expected.png"))
+    )
+    assert image.shape[:2] != (75, 100)
+    assert tuple(image[0, 0, :3]) == (0, 0, 1)
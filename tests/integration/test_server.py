@@ -0,0 +1,95 @@
+import gzip
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from liveplot.server import FigureServer, ServedInterface
+
+
+@pytest.fixture
+def server():
+    figure_server = FigureServer(0)
+    figure_server.start()
+    yield figure_server
+    figure_server.close()
+
+
+def get(server, path, headers=None):
+    request = urllib.request.Request(server.url + path, headers=headers or {})
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, dict(response.headers), response.read()
+    except urllib.error.HTTPError as error:
+        return error.code, dict(error.headers), error.read()
+
+
+def test_index(server):
+    status, headers, body = get(server, "")
+    assert status == 200
+    assert headers["Content-Type"] == "text/html"
+    assert b"figures?since=" in body
+
+
+def test_etag(server):
+    server.publish("plot.png", b"first", "image/png")
+    status, headers, body = get(server, "figures/plot.png")
+    assert (status, body) == (200, b"first")
+    etag = headers["ETag"]
+
+    status, _, body = get(server, "figures/plot.png", {"If-None-Match": etag})
+    assert (status, body) == (304, b"")
+
+    server.publish("plot.png", b"second", "image/png")
+    status, headers, body = get(server, "figures/plot.png", {"If-None-Match": etag})
+    assert (status, body) == (200, b"second")
+    assert headers["ETag"] != etag
+
+
+def test_missing_figure(server):
+    assert get(server, "figures/plot.png")[0] == 404
+    assert get(server, "other")[0] == 404
+
+
+def test_only_changed_frames_are_published(server):
+    assert server.publish("plot.png", b"image", "image/png")
+    assert not server.publish("plot.png", b"image", "image/png")
+    _, _, body = get(server, "figures?since=-1")
+    assert json.loads(body)["version"] == 1
+
+
+def test_long_poll_returns_on_change(server):
+    server.publish("plot.png", b"first", "image/png")
+    _, _, body = get(server, "figures?since=-1")
+    state = json.loads(body)
+
+    timer = threading.Timer(0.2, server.publish, ("plot.png", b"second", "image/png"))
+    timer.start()
+    _, _, body = get(server, f"figures?since={state['version']}")
+    timer.join()
+    new_state = json.loads(body)
+    assert new_state["version"] > state["version"]
+    assert new_state["figures"]["plot.png"] != state["figures"]["plot.png"]
+
+
+def test_served_interface(server):
+    plt_interface = ServedInterface(server, "script", "svg")
+    plt_interface.new_figure()
+    plt_interface.fig.add_subplot(111).plot([1, 2, 3])
+    plt_interface.draw()
+    assert get(server, "figures?since=-1")[2].count(b"script.svg") == 1
+
+    status, headers, body = get(
+        server, "figures/script.svg", {"Accept-Encoding": "gzip"}
+    )
+    assert status == 200
+    assert headers["Content-Type"] == "image/svg+xml"
+    assert headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(body).startswith(b"<?xml")
+
+    # Drawing the same figure again does not make a new frame
+    plt_interface.draw()
+    assert json.loads(get(server, "figures?since=-1")[2])["version"] == 1
+    plt_interface.plt.close(plt_interface.fig)
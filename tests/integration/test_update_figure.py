@@ -0,0 +1,189 @@
+import textwrap
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from liveplot.plt_interface import BlitManager
+from liveplot.update_figure import data_artists, static_state
+
+# pylint: disable=missing-docstring
+
+
+SCRIPT = textwrap.dedent(
+    """
+    from pathlib import Path
+
+    def load_data():
+        return [0, 1, {value}]
+
+    def make_figure(fig, data):
+        ax = fig.add_subplot(111)
+        ax.set_ylim(0, 10)
+        return ax.plot(data, color="{color}")
+
+    def update_figure(fig, data, lines):
+        lines[0].set_ydata(data)
+    """
+)
+
+
+def figure_interface():
+    plt_interface = Mock()
+    plt_interface.fig = Figure()
+    plt_interface.clear = plt_interface.fig.clear
+    return plt_interface
+
+
+def edit(make_module, mock_stat, watcher, code):
+    filepath = watcher.plt_module.file_path
+    make_module(code, filepath=filepath)
+    watcher.plt_module.call.reset_mock()
+    with patch.object(Path, "stat", return_value=mock_stat(filepath)):
+        watcher.refresh()
+
+
+def test_data_change_updates_in_place(make_module, mock_stat, make_watcher, called):
+    watcher = make_watcher(
+        make_module(SCRIPT.format(value=2, color="k")),
+        figure_interface(),
+        incremental=True,
+    )
+    watcher.refresh()
+    line = watcher.interactive_elements[0]
+
+    edit(make_module, mock_stat, watcher, SCRIPT.format(value=5, color="k"))
+
+    assert called(watcher) == ["load_data", "postprocess", "update_figure"]
+    assert watcher.plt_interface.fig.axes[0].lines[0] is line
+    assert list(line.get_ydata()) == [0, 1, 5]
+    watcher.plt_interface.draw.assert_called_with(only_animated=True, sync=False)
+
+
+def test_make_figure_change_rebuilds(make_module, mock_stat, make_watcher, called):
+    watcher = make_watcher(
+        make_module(SCRIPT.format(value=2, color="k")),
+        figure_interface(),
+        incremental=True,
+    )
+    watcher.refresh()
+    line = watcher.interactive_elements[0]
+
+    edit(make_module, mock_stat, watcher, SCRIPT.format(value=2, color="r"))
+
+    assert called(watcher) == ["make_figure"]
+    assert watcher.interactive_elements[0] is not line
+    assert watcher.interactive_elements[0].get_color() == "r"
+
+
+def test_update_figure_change_is_drawn(make_module, mock_stat, make_watcher, called):
+    watcher = make_watcher(
+        make_module(SCRIPT.format(value=2, color="k")),
+        figure_interface(),
+        incremental=True,
+    )
+    watcher.refresh()
+
+    edit(
+        make_module,
+        mock_stat,
+        watcher,
+        SCRIPT.format(value=2, color="k").replace("set_ydata(data)", "set_ydata([3])"),
+    )
+
+    assert called(watcher) == ["update_figure"]
+
+
+def test_without_update_figure_rebuilds(make_module, mock_stat, make_watcher, called):
+    script = SCRIPT.split("def update_figure")[0]
+    watcher = make_watcher(
+        make_module(script.format(value=2, color="k")),
+        figure_interface(),
+        incremental=True,
+    )
+    watcher.refresh()
+    line = watcher.interactive_elements[0]
+
+    edit(make_module, mock_stat, watcher, script.format(value=5, color="k"))
+
+    assert called(watcher)[-1] == "make_figure"
+    assert watcher.interactive_elements[0] is not line
+
+
+def test_static_state_ignores_data():
+    fig = Figure()
+    ax = fig.add_subplot(111)
+    (line,) = ax.plot([0, 1], [0, 1])
+    scatter = ax.scatter([0, 1], [0, 1])
+    ax.set_xticks([0, 1])
+    ax.set_xticklabels(["a", "b"])
+    ax.set_title("title")
+    before = static_state(fig)
+
+    line.set_ydata([1, 0])
+    scatter.set_offsets([[0, 1], [1, 0]])
+
+    assert static_state(fig) == before
+    assert len(data_artists(fig)) == 2
+
+
+def test_blit_manager_redraws_animated_artists():
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    (line,) = fig.add_subplot(111).plot([0, 1], [0, 1])
+    manager = BlitManager(fig.canvas)
+    manager.set_artists(data_artists(fig))
+    assert line.get_animated()
+    assert not manager.update()  # No background before the first draw
+
+    fig.canvas.draw()
+    line.set_ydata([1, 0])
+    with patch.object(fig.canvas, "blit") as blit:
+        assert manager.update()
+    blit.assert_called_once_with(fig.axes[0].bbox)
+
+    manager.disconnect()
+    assert not line.get_animated()
+
+
+def test_decimated_line_is_updated_in_place(
+    make_module, mock_stat, make_watcher, called
+):
+    script = textwrap.dedent(
+        """
+        import numpy as np
+
+        def load_data():
+            return np.linspace(0, 1, 100_000)
+
+        def postprocess(data):
+            return data, data ** {power}
+
+        def make_figure(fig, data):
+            return fig.add_subplot(111).plot(*data)
+
+        def update_figure(fig, data, lines):
+            lines[0].set_data(*data)
+        """
+    )
+    watcher = make_watcher(
+        make_module(script.format(power=1)),
+        figure_interface(),
+        incremental=True,
+        decimate="minmax",
+    )
+    watcher.refresh()
+    line = watcher.interactive_elements[0]
+    assert len(line.get_xdata()) < 100_000
+
+    edit(make_module, mock_stat, watcher, script.format(power=2))
+
+    assert called(watcher) == ["postprocess", "update_figure"]
+    assert watcher.interactive_elements[0] is line
+    assert len(line.get_xdata()) < 100_000
+    line.axes.set_xlim(0.5, 0.501)
+    x, y = line.get_data()
+    assert np.all((0.499 <= x) & (x <= 0.502))
+    assert np.allclose(y, x**2)
@@ -0,0 +1,90 @@
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from liveplot import tail, watch
+from liveplot.data_files import only_appended, recording, signatures
+
+# pylint: disable=missing-docstring
+
+needs_audit_hooks = pytest.mark.skipif(
+    not hasattr(sys, "addaudithook"), reason="Recording needs audit hooks"
+)
+
+
+@needs_audit_hooks
+def test_records_the_files_read(tmp_dir):
+    text = Path(tmp_dir) / "runs.csv"
+    text.write_text("1,2\n")
+    array = Path(tmp_dir) / "runs.npy"
+    np.save(array, np.arange(3))
+    declared = Path(tmp_dir) / "runs.h5"
+    declared.write_bytes(b"")
+
+    with recording() as files:
+        np.loadtxt(text, delimiter=",")
+        np.load(array)
+        with open(Path(tmp_dir) / "out.txt", "w", encoding="utf8") as file:
+            file.write("written, not read")
+        assert watch(str(declared)) == str(declared)
+
+    assert set(files) == {text, array, declared}
+    assert files == signatures(files)
+
+
+def test_only_appended(tmp_dir):
+    path = Path(tmp_dir) / "train.log"
+    path.write_text("1\n")
+    before = signatures([path])
+
+    with open(path, "a", encoding="utf8") as file:
+        file.write("2\n")
+    assert only_appended(before, signatures([path]))
+
+    grown = signatures([path])
+    path.write_text("3\n")
+    assert not only_appended(grown, signatures([path]))
+
+    replaced = signatures([path])
+    other = Path(tmp_dir) / "train.log.new"
+    other.write_text("3\n4\n")
+    os.replace(other, path)
+    assert not only_appended(replaced, signatures([path]))
+
+
+def test_read_appended_lines_and_records(tmp_dir):
+    path = Path(tmp_dir) / "train.log"
+    path.write_text("1,2\n3,")
+
+    lines, offset = tail.read_lines(path)
+    assert lines == ["1,2"]
+    with open(path, "a", encoding="utf8") as file:
+        file.write("4\n5,6\n")
+    lines, offset = tail.read_lines(path, offset)
+    assert lines == ["3,4", "5,6"]
+    assert tail.read_lines(path, offset) == ([], offset)
+
+    binary = Path(tmp_dir) / "losses.bin"
+    np.arange(3, dtype=np.float32).tofile(binary)
+    records, offset = tail.read_records(binary, np.float32)
+    with open(binary, "ab") as file:
+        np.arange(3, 5, dtype=np.float32).tofile(file)
+        file.write(b"\0")  # Part of a record
+    new, offset = tail.read_records(binary, np.float32, offset)
+    np.testing.assert_array_equal(tail.extend(records, new), np.arange(5))
+    assert offset == 20
+
+
+def test_extend():
+    data = {"step": np.arange(2), "runs": ([1], np.zeros((1, 2)))}
+    new = {"step": np.arange(2, 3), "runs": ([2], np.ones((1, 2)))}
+
+    extended = tail.extend(data, new)
+
+    np.testing.assert_array_equal(extended["step"], np.arange(3))
+    assert extended["runs"][0] == [1, 2]
+    assert extended["runs"][1].shape == (2, 2)
+    assert tail.extend(None, new) is new
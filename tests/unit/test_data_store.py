@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from liveplot.data_store import DataStore, freeze
+
+# pylint: disable=missing-docstring
+
+
+def test_freeze_nested_arrays():
+    data = {"x": np.zeros(3), "runs": [np.ones(2), (np.ones(1), "name")]}
+    assert freeze(data) is data
+    for array in (data["x"], data["runs"][0], data["runs"][1][0]):
+        with pytest.raises(ValueError):
+            array[0] = 1
+
+
+def test_identical_results_are_stored_once():
+    store = DataStore()
+    first = store.put("a", "key", np.zeros(3))
+    second = store.put("b", "key", np.zeros(3))
+
+    assert second is first
+    assert len(store) == 1
+    assert not first.flags.writeable
+
+
+def test_entries_are_dropped_when_released():
+    store = DataStore()
+    store.put("a", "key", [1])
+    store.acquire("b", "key")
+
+    store.release("a")
+    assert "key" in store
+    store.put("b", "other", [2])
+    assert "key" not in store
+    assert "other" in store
+    store.release("b")
+    assert len(store) == 0
+
+    with pytest.raises(KeyError):
+        store.acquire("a", "key")
+
+
+def test_replace_entry_held_by_one_owner():
+    store = DataStore()
+    store.put("a", "key", np.zeros(3))
+    assert store.held("a") == "key"
+    assert not store.is_shared("key")
+    store.acquire("b", "key")
+    assert store.is_shared("key")
+
+    store.replace("key", np.ones(3))
+    assert not store.acquire("a", "key").flags.writeable
+    np.testing.assert_array_equal(store.acquire("b", "key"), np.ones(3))
+    with pytest.raises(KeyError):
+        store.replace("other", [1])
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+from matplotlib.axes import Axes
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from liveplot.decimation import decimating, lttb, minmax, thin_points
+
+# pylint: disable=missing-docstring
+
+
+def noisy_sine(n=100_000):
+    x = np.linspace(0, 1, n)
+    return x, np.sin(20 * x) + np.random.default_rng(0).normal(size=n)
+
+
+def test_minmax_keeps_extremes_of_each_bin():
+    x, y = noisy_sine()
+    keep = minmax(x, y, 100)
+
+    assert np.all(np.diff(keep) > 0)
+    assert keep[0] == 0 and keep[-1] == len(x) - 1
+    assert len(keep) <= 4 * 100
+    bins = np.minimum((x * 100).astype(int), 99)
+    for b in (0, 50, 99):
+        in_bin = np.flatnonzero(bins == b)
+        assert np.argmin(y[in_bin]) + in_bin[0] in keep
+        assert np.argmax(y[in_bin]) + in_bin[0] in keep
+
+
+def test_lttb():
+    x, y = noisy_sine()
+    keep = lttb(x, y, 500)
+
+    assert len(keep) == 500
+    assert np.all(np.diff(keep) > 0)
+    assert keep[0] == 0 and keep[-1] == len(x) - 1
+    assert np.array_equal(lttb(x[:10], y[:10], 500), np.arange(10))
+
+
+def test_thin_points_keeps_the_top_point_per_pixel():
+    offsets = np.array([[0.1, 0.1], [0.1, 0.1], [0.9, 0.9]] * 10)
+    keep = thin_points(offsets, (0, 1), (0, 1), (2, 2))
+    assert list(keep) == [len(offsets) - 2, len(offsets) - 1]
+
+
+def make_figure(fig, x, y):
+    ax = fig.add_subplot()
+    (line,) = ax.plot(x, y)
+    scatter = ax.scatter(x, y, c=y)
+    return line, scatter
+
+
+def test_decimating_and_zoom():
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    x, y = noisy_sine()
+    plot = Axes.plot
+    with decimating("minmax"):
+        line, scatter = make_figure(fig, x, y)
+    assert Axes.plot is plot
+    n_pixels = int(fig.axes[0].bbox.width)
+    assert len(line.get_xdata()) <= 4 * n_pixels
+    assert len(scatter.get_offsets()) < len(x)
+    assert len(scatter.get_array()) == len(scatter.get_offsets())
+    assert fig.axes[0].get_ylim()[1] >= y.max()
+
+    fig.axes[0].set_xlim(0.5, 0.51)
+    in_view = x[(x >= 0.5) & (x <= 0.51)]
+    assert np.all(np.isin(in_view, line.get_xdata()))
+
+
+def test_small_and_unsorted_lines_are_not_decimated():
+    fig = Figure()
+    x, y = noisy_sine()
+    with decimating():
+        (small,) = fig.add_subplot().plot([0, 1], [0, 1])
+        (unsorted,) = fig.axes[0].plot(x[::-1], y)
+    assert len(small.get_xdata()) == 2
+    assert len(unsorted.get_xdata()) == len(x)
+
+
+def test_unknown_method():
+    with pytest.raises(ValueError):
+        with decimating("unknown"):
+            pass
@@ -0,0 +1,30 @@
+import numpy as np
+
+from liveplot.memory import MemoryBudget, resident_size
+
+# pylint: disable=missing-docstring
+
+
+def test_resident_size_counts_shared_memory_once(tmp_dir):
+    array = np.zeros(1000)
+    assert resident_size(array, [array[:10], {"a": array}]) == 8000
+
+    spilled = MemoryBudget(0, directory=tmp_dir).spill({"a": array})
+    assert isinstance(spilled["a"], np.memmap)
+    assert resident_size(spilled) == 0
+    np.testing.assert_array_equal(spilled["a"], array)
+
+
+def test_fit_spills_until_under_budget(tmp_dir):
+    budget = MemoryBudget(10000, directory=tmp_dir)
+    results = {"load_data": np.ones(1000), "postprocess": np.ones(1000)}
+    mapped = {"postprocess": lambda: "from cache"}
+
+    fitted = budget.fit(results, mapped)
+
+    assert fitted["postprocess"] == "from cache"
+    assert fitted["load_data"] is results["load_data"]
+    assert budget.fit(fitted) == fitted
+
+    fitted = MemoryBudget(0, directory=tmp_dir).fit(results)
+    assert resident_size(*fitted.values()) == 0
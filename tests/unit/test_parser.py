@@ -24,3 +24,72 @@ def test_new_script_filename():
     assert not args.debug
     assert args.new is True
     assert str(args.script) == "file.py"
+
+
+def test_cache_options():
+    args = make_parser().parse_args(
+        shlex.split("file.py --no-cache --cache-dir somedir --cache-size 10")
+    )
+    assert args.no_cache is True
+    assert args.clear_cache is False
+    assert str(args.cache_dir) == "somedir"
+    assert args.cache_size == 10
+
+
+def test_decimate_option():
+    assert make_parser().parse_args(["file.py"]).decimate is None
+    args = make_parser().parse_args(shlex.split("--decimate lttb file.py"))
+    assert args.decimate == "lttb"
+
+
+def test_several_scripts():
+    args = make_parser().parse_args(shlex.split("a.py b.py 'figures/*.py'"))
+    assert args.script == Path("a.py")
+    assert args.more_scripts == [Path("b.py"), Path("figures/*.py")]
+
+
+def test_jobs_option():
+    assert make_parser().parse_args(["file.py"]).jobs is None
+    assert make_parser().parse_args(shlex.split("-j 1 file.py")).jobs == 1
+
+
+def test_serve_options():
+    args = make_parser().parse_args(["file.py"])
+    assert args.serve is None
+    assert args.serve_host == "127.0.0.1"
+    assert args.serve_format == "png"
+    args = make_parser().parse_args(shlex.split("--serve 8000 --serve-format svg f.py"))
+    assert args.serve == 8000
+    assert args.serve_format == "svg"
+
+
+def test_sweep_option():
+    assert make_parser().parse_args(["file.py"]).sweep is None
+    args = make_parser().parse_args(shlex.split("--sweep gallery file.py"))
+    assert args.sweep == Path("gallery")
+
+
+def test_scheduling_options():
+    args = make_parser().parse_args(["file.py"])
+    assert args.max_fps is None
+    args = make_parser().parse_args(shlex.split("--debounce 0.5 --max-fps 4 f.py"))
+    assert (args.debounce, args.max_fps) == (0.5, 4)
+
+
+def test_snapshot_options():
+    args = make_parser().parse_args(shlex.split("--snapshot s --restore s f.py"))
+    assert args.snapshot == args.restore == Path("s")
+    assert args.snapshot_compress is False
+
+
+def test_export_options():
+    args = make_parser().parse_args(["file.py"])
+    assert (args.export, args.export_formats, args.once) == (None, "png,pdf,svg", False)
+    args = make_parser().parse_args(
+        shlex.split("--export out --export-formats png@300,pdf --once f.py")
+    )
+    assert (args.export, args.export_formats, args.once) == (
+        Path("out"),
+        "png@300,pdf",
+        True,
+    )
@@ -0,0 +1,138 @@
+import threading
+
+import pytest
+
+from liveplot import stage
+from liveplot.pipeline import (
+    Pipeline,
+    is_stage,
+    run_order,
+    runs_in_process,
+    stage_inputs,
+)
+
+# pylint: disable=missing-docstring
+
+
+def test_stage_inputs_are_the_parameters_without_default():
+    @stage
+    def fit(filtered, grid, degree=3):  # pylint: disable=unused-argument
+        return None
+
+    assert is_stage(fit)
+    assert not is_stage(lambda: None)
+    assert stage_inputs(fit) == ["filtered", "grid"]
+    assert not runs_in_process(fit)
+
+    @stage(process=True)
+    def simulate():
+        return None
+
+    assert is_stage(simulate)
+    assert runs_in_process(simulate)
+
+
+def test_run_order():
+    graph = {"fit": ["filtered"], "filtered": ["raw"], "raw": [], "grid": []}
+    assert run_order(graph) == ["raw", "filtered", "fit", "grid"]
+
+    with pytest.raises(ValueError, match="unknown stage raw"):
+        run_order({"filtered": ["raw"]})
+    with pytest.raises(ValueError, match="a -> b -> a"):
+        run_order({"a": ["b"], "b": ["a"]})
+
+
+def test_only_stages_downstream_of_a_change_run_again():
+    def raw():
+        return [3, 1, 2]
+
+    def ordered(raw):  # pylint: disable=redefined-outer-name
+        return sorted(raw)
+
+    def top(ordered):  # pylint: disable=redefined-outer-name
+        return ordered[-1]
+
+    stages = {"raw": raw, "ordered": ordered, "top": top}
+    hashes = {"raw": "1", "ordered": "1", "top": "1"}
+    ran = []
+
+    def compute(name, key, inputs):  # pylint: disable=unused-argument
+        ran.append(name)
+        return stages[name](*inputs)
+
+    pipeline = Pipeline()
+    plan = Pipeline.plan(stages, hashes.get)
+    assert pipeline.run(plan, compute) == {
+        "raw": [3, 1, 2],
+        "ordered": [1, 2, 3],
+        "top": 3,
+    }
+    assert pipeline.is_current(plan)
+
+    hashes["ordered"] = "2"
+    plan = Pipeline.plan(stages, hashes.get)
+    assert not pipeline.is_current(plan)
+    pipeline.run(plan, compute)
+    assert ran == ["raw", "ordered", "top", "ordered", "top"]
+
+    del stages["top"]
+    plan = Pipeline.plan(stages, hashes.get)
+    assert not pipeline.is_current(plan)
+    assert list(pipeline.run(plan, compute)) == ["raw", "ordered"]
+    assert pipeline.names == ["raw", "ordered"]
+
+
+def test_independent_stages_run_at_the_same_time():
+    # Each of the two loaders waits for the other, and settings for both
+    started = threading.Barrier(3, timeout=10)
+    graph = {"left": [], "right": [], "both": ["left", "right"]}
+    threads = {}
+
+    def compute(name, key, inputs):  # pylint: disable=unused-argument
+        threads[name] = threading.current_thread()
+        if name == "both":
+            return inputs
+        started.wait()
+        return name
+
+    plan = [(name, inputs, name) for name, inputs in graph.items()]
+    results = Pipeline().run(plan, compute, workers=4, meanwhile=started.wait)
+
+    assert results == {"left": "left", "right": "right", "both": ["left", "right"]}
+    assert threads["left"] is not threads["right"]
+    assert threading.main_thread() not in threads.values()
+
+
+def test_concurrent_stage_errors_are_raised():
+    def compute(name, key, inputs):  # pylint: disable=unused-argument
+        if name == "bad":
+            raise RuntimeError("bad stage")
+        return name
+
+    plan = [("good", [], "1"), ("bad", [], "1"), ("after", ["bad"], "1")]
+    pipeline = Pipeline()
+    with pytest.raises(RuntimeError, match="bad stage"):
+        pipeline.run(plan, compute, workers=2)
+    assert "bad" not in pipeline.names
+
+
+def test_keyboard_interrupt_does_not_wait_for_stages():
+    release = threading.Event()
+    ran = []
+
+    def compute(name, key, inputs):  # pylint: disable=unused-argument
+        ran.append(name)
+        release.wait(timeout=10)
+        return name
+
+    def interrupt():
+        raise KeyboardInterrupt
+
+    plan = [("slow", [], "1"), ("other", [], "1"), ("after", ["slow"], "1")]
+    try:
+        with pytest.raises(KeyboardInterrupt):
+            Pipeline().run(plan, compute, workers=2, meanwhile=interrupt)
+        assert not release.is_set()
+        assert "after" not in ran
+    finally:
+        release.set()
@@ -5,6 +5,9 @@ from liveplot.plot_watcher import PlotWatcher
 
 def test_loading():
     plt_code = Mock()
+    plt_code.stages.return_value = {}
+    plt_code.defines.return_value = False
+    plt_code.func_hash.return_value = "hash"
     plt_interface = Mock()
 
     watcher = PlotWatcher(plt_code, plt_interface)
@@ -15,6 +18,9 @@ def test_loading():
 
 def test_one_pass():
     plt_code = Mock()
+    plt_code.stages.return_value = {}
+    plt_code.defines.return_value = False
+    plt_code.func_hash.return_value = "hash"
     plt_interface = Mock()
 
     watcher = PlotWatcher(plt_code, plt_interface)
@@ -28,3 +34,21 @@ def test_one_pass():
     ]
 
     plt_code.assert_has_calls(expected_calls, any_order=False)
+
+
+def test_export_after_redraw():
+    plt_code = Mock()
+    plt_code.stages.return_value = {}
+    plt_code.defines.return_value = False
+    plt_code.func_hash.return_value = "hash"
+    plt_code.file_path.stem = "plot"
+    plt_interface = Mock()
+    exporter = Mock()
+
+    watcher = PlotWatcher(plt_code, plt_interface, exporter=exporter)
+    watcher.refresh()
+    exporter.export.assert_called_once_with(plt_interface.fig, "plot")
+
+    plt_code.func_has_changed.return_value = False
+    watcher.refresh()
+    exporter.export.assert_called_once()
@@ -0,0 +1,94 @@
+import time
+from unittest.mock import Mock
+
+from liveplot.scheduler import Scheduler
+
+# pylint: disable=missing-docstring
+
+
+def make_watcher(name, calls, duration=0.0):
+    watcher = Mock(busy=False, data_files=set())
+    watcher.plt_module.dependency_files.return_value = set()
+    watcher.needs_refresh.return_value = True
+
+    def refresh():
+        calls.append(name)
+        time.sleep(duration)
+
+    watcher.refresh.side_effect = refresh
+    return watcher
+
+
+def test_cheapest_refresh_first():
+    calls = []
+    slow = make_watcher("slow", calls, duration=0.05)
+    fast = make_watcher("fast", calls)
+    file_watcher = Mock()
+    file_watcher.poll.return_value = False
+    scheduler = Scheduler(file_watcher)
+
+    scheduler.step([slow, fast])
+    assert calls == ["slow", "fast"]
+
+    file_watcher.poll.side_effect = [True, False, False]
+    scheduler.step([slow, fast])
+    assert calls == ["slow", "fast", "fast", "slow"]
+
+
+def test_changes_during_refresh_are_collapsed():
+    calls = []
+    first = make_watcher("first", calls)
+    second = make_watcher("second", calls)
+    file_watcher = Mock()
+    # Changes after the refresh of the first: both need a refresh again
+    file_watcher.poll.side_effect = [False, True, False, False, False]
+    scheduler = Scheduler(file_watcher)
+    scheduler.step([first, second])
+    assert calls.count("second") == 1
+    assert calls.count("first") == 2
+
+
+def test_max_fps_defers_refreshes():
+    calls = []
+    watcher = make_watcher("watcher", calls)
+    file_watcher = Mock()
+    file_watcher.poll.return_value = False
+    scheduler = Scheduler(file_watcher, max_fps=10)
+    scheduler.step([watcher])
+
+    file_watcher.poll.return_value = True
+    scheduler.step([watcher])
+    assert calls == ["watcher"]
+    assert scheduler.pending == [watcher]
+
+    time.sleep(0.1)
+    file_watcher.poll.return_value = False
+    scheduler.step([watcher])
+    assert calls == ["watcher", "watcher"]
+
+
+def test_background_results_are_drawn_between_refreshes():
+    calls = []
+    busy = make_watcher("busy", calls)
+    busy.needs_refresh.return_value = False
+    busy.busy = True
+    busy.poll_background.side_effect = lambda: calls.append("poll") or True
+    other = make_watcher("other", calls)
+    file_watcher = Mock()
+    file_watcher.poll.return_value = False
+    Scheduler(file_watcher).step([busy, other])
+    assert calls == ["poll", "other", "poll"]
+
+
+def test_closed_watchers_are_forgotten():
+    calls = []
+    closed = make_watcher("closed", calls)
+    file_watcher = Mock()
+    file_watcher.poll.return_value = False
+    scheduler = Scheduler(file_watcher, max_fps=1)
+    scheduler.step([closed])
+    file_watcher.poll.return_value = True
+    scheduler.step([closed])
+    assert scheduler.pending == [closed]
+    scheduler.step([])
+    assert scheduler.pending == []
@@ -0,0 +1,74 @@
+import pytest
+
+from liveplot.module_loader import (
+    PlottingModuleError,
+    dummy_combine,
+    dummy_postprocess_chunk,
+)
+from liveplot.streaming import Throttle, consume, is_stream
+
+# pylint: disable=missing-docstring
+
+
+def chunks():
+    yield 1
+    yield 2
+    yield 3
+
+
+def test_is_stream():
+    assert is_stream(chunks())
+    assert is_stream(chunk for chunk in [1, 2])
+    assert not is_stream([1, 2])
+    assert not is_stream(None)
+
+
+def test_other_iterators_are_not_streams(tmp_path):
+    assert not is_stream(iter([1, 2]))
+    assert not is_stream(map(abs, [-1, 2]))
+    assert not is_stream(zip([1], [2]))
+    (tmp_path / "data.txt").write_text("1\n2\n")
+    with open(tmp_path / "data.txt", encoding="utf8") as file:
+        assert not is_stream(file)
+
+
+def test_consume_default_collects_chunks():
+    assert consume(chunks(), dummy_postprocess_chunk, dummy_combine) == [1, 2, 3]
+
+
+def test_consume_with_postprocess_chunk_and_combine():
+    def combine(data, chunk):
+        return chunk if data is None else data + chunk
+
+    assert consume(chunks(), lambda chunk: 10 * chunk, combine) == 60
+
+
+def test_consume_empty_stream():
+    assert consume(iter([]), dummy_postprocess_chunk, dummy_combine) is None
+
+
+def test_consume_reports_partial_data():
+    partials = []
+    consume(
+        chunks(),
+        dummy_postprocess_chunk,
+        lambda data, chunk: (data or 0) + chunk,
+        on_partial=partials.append,
+        interval=0,
+    )
+    assert partials == [1, 3, 6]
+
+
+def test_consume_wraps_errors():
+    def failing():
+        yield 1
+        raise KeyError("not_k")
+
+    with pytest.raises(PlottingModuleError):
+        consume(failing(), dummy_postprocess_chunk, dummy_combine)
+
+
+def test_throttle():
+    throttle = Throttle(interval=60)
+    assert throttle.ready()
+    assert not throttle.ready()
@@ -0,0 +1,43 @@
+import inspect
+
+import pytest
+
+from liveplot.sweep import arguments, parameter_sets, variant_name
+
+# pylint: disable=missing-docstring
+
+
+def test_grid_gives_every_combination():
+    assert parameter_sets({"seed": range(2), "lr": [0.1, 0.01]}) == [
+        {"seed": 0, "lr": 0.1},
+        {"seed": 0, "lr": 0.01},
+        {"seed": 1, "lr": 0.1},
+        {"seed": 1, "lr": 0.01},
+    ]
+
+
+def test_list_of_parameter_sets():
+    sets = [{"seed": 0}, {"seed": 1, "lr": 0.1}]
+    assert parameter_sets(sets) == sets
+    with pytest.raises(ValueError):
+        parameter_sets([0, 1])
+
+
+def test_variant_name():
+    assert variant_name({"seed": 0, "lr": 0.1}) == "seed=0,lr=0.1"
+    assert variant_name({"path": "a/b c"}) == "path=a_b_c"
+    assert variant_name({}) == "default"
+
+
+def test_arguments_named_by_the_function():
+    params = {"seed": 0, "lr": 0.1}
+
+    def load_data(seed):  # pylint: disable=unused-argument
+        pass
+
+    def make_figure(fig, data, **kwargs):  # pylint: disable=unused-argument
+        pass
+
+    assert arguments(inspect.signature(load_data), params) == {"seed": 0}
+    assert arguments(inspect.signature(make_figure), params) == params
+    assert arguments(inspect.signature(lambda: None), params) == {}